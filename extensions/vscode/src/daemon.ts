@@ -0,0 +1,151 @@
+import * as childProcess from 'child_process';
+
+export interface Position {
+  /** Starting from 0 */
+  line: number;
+  /** In code points (not UTF-16 code units), starting from 0 */
+  column: number;
+}
+
+/** Replacement for a single string literal */
+export interface Edit {
+  start: Position;
+  end: Position;
+  text: string;
+}
+
+export interface FormatResult {
+  /** The formatted code. Not set if edits were requested */
+  source?: string;
+  /** Edits that format the code. Only set if they were requested and the daemon supports them */
+  edits?: Edit[];
+  changed: boolean;
+}
+
+interface Response extends Partial<FormatResult> {
+  id?: number;
+  ready?: boolean;
+  error?: string;
+}
+
+/**
+ * Client for a long-lived `string-fixer-daemon` process, which keeps the library loaded between
+ * formats so that each one doesn't pay for interpreter startup.
+ *
+ * Requests and responses are newline-delimited JSON sent over the process' stdin/stdout.
+ */
+export class StringFixerDaemon {
+  private process: childProcess.ChildProcessWithoutNullStreams;
+  private pending = new Map<
+    number,
+    { resolve: (r: FormatResult) => void; reject: (e: Error) => void }
+  >();
+  private nextId = 0;
+  private buffer = '';
+  private alive = true;
+  /** Resolves to whether the daemon started successfully */
+  readonly ready: Promise<boolean>;
+
+  constructor(
+    readonly python: string,
+    cwd: string,
+  ) {
+    this.process = childProcess.spawn(python, ['-m', 'string_fixer.daemon'], {
+      cwd,
+    });
+    this.ready = new Promise((resolve) => {
+      this.process.stdout.on('data', (chunk: Buffer) =>
+        this.onData(chunk, resolve),
+      );
+      this.process.on('error', () => this.onExit(resolve));
+      this.process.on('exit', () => this.onExit(resolve));
+    });
+  }
+
+  get isAlive() {
+    return this.alive;
+  }
+
+  private onData(chunk: Buffer, ready: (value: boolean) => void) {
+    this.buffer += chunk.toString('utf-8');
+    let newline: number;
+    while ((newline = this.buffer.indexOf('\n')) !== -1) {
+      const line = this.buffer.slice(0, newline);
+      this.buffer = this.buffer.slice(newline + 1);
+      if (!line.trim()) {
+        continue;
+      }
+      const response: Response = JSON.parse(line);
+      if (response.ready) {
+        ready(true);
+        continue;
+      }
+      const request =
+        response.id === undefined ? undefined : this.pending.get(response.id);
+      if (!request) {
+        continue;
+      }
+      this.pending.delete(response.id!);
+      if (response.error !== undefined) {
+        request.reject(new Error(response.error));
+      } else {
+        request.resolve({
+          source: response.source,
+          edits: response.edits,
+          changed: response.changed!,
+        });
+      }
+    }
+  }
+
+  private onExit(ready: (value: boolean) => void) {
+    this.alive = false;
+    ready(false);
+    for (const request of this.pending.values()) {
+      request.reject(new Error('string-fixer daemon exited'));
+    }
+    this.pending.clear();
+  }
+
+  /**
+   * Format some source code
+   * @param source the code to format
+   * @param root the folder to load the config from
+   * @param path the file the source code belongs to
+   * @param edits request the edits needed to format the code, rather than the formatted code.
+   *  Older daemons ignore this and return the formatted code anyway
+   * @param lineRanges only format strings within these inclusive line ranges, starting from 1
+   */
+  format(
+    source: string,
+    root: string,
+    path?: string,
+    edits = false,
+    lineRanges?: [number, number][],
+  ): Promise<FormatResult> {
+    return new Promise((resolve, reject) => {
+      if (!this.alive) {
+        reject(new Error('string-fixer daemon is not running'));
+        return;
+      }
+      const id = this.nextId++;
+      this.pending.set(id, { resolve, reject });
+      this.process.stdin.write(
+        JSON.stringify({
+          id,
+          source,
+          root,
+          path,
+          edits,
+          line_ranges: lineRanges,
+        }) + '\n',
+        'utf-8',
+      );
+    });
+  }
+
+  dispose() {
+    this.alive = false;
+    this.process.kill();
+  }
+}
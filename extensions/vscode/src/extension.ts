@@ -3,6 +3,7 @@ import * as childProcess from 'child_process';
 import { PythonExtension } from '@vscode/python-extension';
 import { promisify } from 'util';
 import * as path from 'path';
+import { Edit, FormatResult, StringFixerDaemon } from './daemon';
 
 const execFile = promisify(childProcess.execFile);
 
@@ -105,12 +106,217 @@ async function runStringFixer(cmdArgs?: string[]) {
   });
 }
 
+let daemon: StringFixerDaemon | undefined;
+/** Interpreters that the daemon failed to start with, so we don't keep retrying */
+const daemonUnavailable = new Set<string>();
+
+async function getDaemon(
+  python: string,
+  execFolder: string,
+): Promise<StringFixerDaemon | undefined> {
+  if (daemon?.isAlive && daemon.python === python) {
+    return daemon;
+  }
+  daemon?.dispose();
+  daemon = undefined;
+  if (daemonUnavailable.has(python)) {
+    return;
+  }
+
+  logger?.info(`starting string-fixer daemon with ${python}`);
+  const newDaemon = new StringFixerDaemon(python, execFolder);
+  const timeout = new Promise<boolean>((r) =>
+    setTimeout(() => r(false), 10000),
+  );
+  if (!(await Promise.race([newDaemon.ready, timeout]))) {
+    logger?.warn('string-fixer daemon unavailable. Falling back to CLI');
+    daemonUnavailable.add(python);
+    newDaemon.dispose();
+    return;
+  }
+  daemon = newDaemon;
+  return daemon;
+}
+
+/** Get the lines covered by a range, in the `[start, end]` format used by `--line-ranges` */
+function toLineRange(range: vscode.Range): [number, number] {
+  // a selection ending at the start of a line doesn't include that line
+  const end =
+    range.end.character === 0 && range.end.line > range.start.line
+      ? range.end.line - 1
+      : range.end.line;
+  return [range.start.line + 1, end + 1];
+}
+
+/**
+ * Format a document in-memory using the string-fixer daemon
+ * @param lineRange only format strings within these lines. See {@link toLineRange}
+ * @returns the edits that format the document, or undefined if the daemon couldn't handle
+ *  the request
+ */
+async function formatWithDaemon(
+  document: vscode.TextDocument,
+  lineRange?: [number, number],
+): Promise<vscode.TextEdit[] | undefined> {
+  if (!getConfig().get('useDaemon')) {
+    return;
+  }
+  let execFolder: string;
+  let python: string;
+  try {
+    execFolder = getExecFolder();
+    python = await getPythonExe();
+  } catch (err) {
+    return;
+  }
+  const client = await getDaemon(python, execFolder);
+  if (!client) {
+    return;
+  }
+
+  const source = document.getText();
+  let result: FormatResult;
+  try {
+    result = await client.format(
+      source,
+      execFolder,
+      document.fileName,
+      true,
+      lineRange && [lineRange],
+    );
+  } catch (err) {
+    if (!client.isAlive) {
+      return;
+    }
+    const message = err instanceof Error ? err.message : err;
+    const msg = `Error when running string-fixer: ${message}`;
+    logger?.error(msg);
+    vscode.window.showErrorMessage(msg);
+    return [];
+  }
+  if (!result.changed) {
+    return [];
+  }
+  if (result.edits) {
+    return toTextEdits(document, result.edits);
+  }
+  if (lineRange) {
+    // the daemon is too old to support edits, so it won't have stuck to the range either
+    return;
+  }
+  return replaceDocument(document, source, result.source!);
+}
+
+/**
+ * Format a document in-memory by piping it through the CLI's `--stdin-filename` mode
+ * @param lineRange only format strings within these lines. See {@link toLineRange}
+ * @returns the edits that format the document, or undefined if the CLI couldn't handle
+ *  the request
+ */
+async function formatWithStdin(
+  document: vscode.TextDocument,
+  lineRange?: [number, number],
+): Promise<vscode.TextEdit[] | undefined> {
+  let execFolder: string;
+  let python: string;
+  try {
+    execFolder = getExecFolder();
+    python = await getPythonExe();
+  } catch (err) {
+    return;
+  }
+
+  const source = document.getText();
+  const args = ['-m', 'string_fixer', '--stdin-filename', document.fileName];
+  if (lineRange) {
+    args.push('--line-ranges', `${lineRange[0]}-${lineRange[1]}`);
+  }
+  logger?.info(`running string-fixer with args: ${args}`);
+  let formatted: string;
+  try {
+    const process = execFile(python, args, {
+      cwd: execFolder,
+      maxBuffer: 64 * 1024 * 1024,
+    });
+    process.child.stdin?.end(source, 'utf-8');
+    formatted = (await process).stdout;
+  } catch (err) {
+    // argparse exits with 2 on unknown args, meaning string-fixer is too old for stdin mode
+    if ((err as { code?: number }).code === 2) {
+      const arg = lineRange ? '--line-ranges' : '--stdin-filename';
+      logger?.warn(`string-fixer does not support ${arg}`);
+      return;
+    }
+    const message = (err as { stderr?: string }).stderr || err;
+    const msg = `Error when running string-fixer: ${message}`;
+    logger?.error(msg);
+    vscode.window.showErrorMessage(msg);
+    return [];
+  }
+  if (formatted === source) {
+    return [];
+  }
+  return replaceDocument(document, source, formatted);
+}
+
+/** Convert edits from string-fixer, which count columns in code points, to VSCode's UTF-16 ones */
+function toTextEdits(
+  document: vscode.TextDocument,
+  edits: Edit[],
+): vscode.TextEdit[] {
+  const position = ({ line, column }: Edit['start']) => {
+    const text = line < document.lineCount ? document.lineAt(line).text : '';
+    const character = Array.from(text).slice(0, column).join('').length;
+    return new vscode.Position(line, character);
+  };
+  return edits.map((edit) =>
+    vscode.TextEdit.replace(
+      new vscode.Range(position(edit.start), position(edit.end)),
+      edit.text,
+    ),
+  );
+}
+
+/** Replace the entire contents of a document that was formatted from `source` */
+function replaceDocument(
+  document: vscode.TextDocument,
+  source: string,
+  formatted: string,
+): vscode.TextEdit[] {
+  return [
+    vscode.TextEdit.replace(
+      new vscode.Range(
+        document.positionAt(0),
+        document.positionAt(source.length),
+      ),
+      formatted,
+    ),
+  ];
+}
+
+/** Apply edits to a document straight away, rather than returning them from a formatter */
+async function applyEdits(
+  document: vscode.TextDocument,
+  edits: vscode.TextEdit[],
+) {
+  if (edits.length === 0) {
+    return;
+  }
+  const edit = new vscode.WorkspaceEdit();
+  edit.set(document.uri, edits);
+  await vscode.workspace.applyEdit(edit);
+}
+
 enum FormatterOpts {
   RUFF = 'ruff',
   BLACK = 'black',
 }
 
-async function runPreFormatter() {
+/**
+ * Run the configured pre-formatter, if any
+ * @returns whether the document was passed to a pre-formatter
+ */
+async function runPreFormatter(): Promise<boolean> {
   const config = getConfig();
   const preFormatter: FormatterOpts | undefined = config.get('preFormatter');
   logger?.info(`pre-formatter: ${preFormatter}`);
@@ -123,6 +329,7 @@ async function runPreFormatter() {
     } else {
       logger?.info('running ruff.executeFormat');
       await vscode.commands.executeCommand('ruff.executeFormat');
+      return true;
     }
   } else if (preFormatter === FormatterOpts.BLACK) {
     const blackFormatter = 'ms-python.black-formatter';
@@ -157,8 +364,10 @@ async function runPreFormatter() {
         vscode.ConfigurationTarget.Workspace,
         true,
       );
+      return true;
     }
   }
+  return false;
 }
 
 let logger: vscode.LogOutputChannel | undefined;
@@ -167,6 +376,8 @@ export function activate(context: vscode.ExtensionContext) {
   context.subscriptions.push({
     dispose: () => {
       logger = undefined;
+      daemon?.dispose();
+      daemon = undefined;
     },
   });
 
@@ -187,9 +398,22 @@ export function activate(context: vscode.ExtensionContext) {
   vscode.languages.registerDocumentFormattingEditProvider('python', {
     async provideDocumentFormattingEdits(
       document: vscode.TextDocument,
-    ): Promise<undefined> {
-      await runPreFormatter();
+    ): Promise<vscode.TextEdit[] | undefined> {
+      const preFormatted = await runPreFormatter();
       await new Promise((r) => setTimeout(r, 100));
+      // format in-memory via the daemon if we can, avoiding the save/reload round trip
+      const edits =
+        (await formatWithDaemon(document)) ??
+        (await formatWithStdin(document));
+      if (edits) {
+        if (!preFormatted) {
+          return edits;
+        }
+        // VSCode discards the edits returned from here if the document was changed by
+        // another formatter in the meantime, so apply them ourselves instead
+        await applyEdits(document, edits);
+        return;
+      }
       // save doc before running so that process can read the current file version
       await document.save();
       // I tried submitting TextEdits like you're supposed to but they wouldn't apply
@@ -201,6 +425,21 @@ export function activate(context: vscode.ExtensionContext) {
       );
     },
   });
+
+  vscode.languages.registerDocumentRangeFormattingEditProvider('python', {
+    async provideDocumentRangeFormattingEdits(
+      document: vscode.TextDocument,
+      range: vscode.Range,
+    ): Promise<vscode.TextEdit[] | undefined> {
+      // pre-formatters would format the whole document, so they're skipped here. Unlike
+      // formatting the whole document, there's no falling back to saving and running the CLI
+      const lineRange = toLineRange(range);
+      return (
+        (await formatWithDaemon(document, lineRange)) ??
+        (await formatWithStdin(document, lineRange))
+      );
+    },
+  });
 }
 
 // This method is called when your extension is deactivated
@@ -0,0 +1,3 @@
+'''
+Benchmarks for string-fixer. Run the full suite with `python -m benchmarks`
+'''
@@ -0,0 +1,305 @@
+'''
+Benchmark suite. Generates a corpus (see `benchmarks.corpus`), times each stage of formatting it
+and reports throughput and peak memory. Results can be saved as JSON and compared against a
+previous run to spot regressions.
+
+Usage: python -m benchmarks [--output results.json] [--compare old.json]
+'''
+
+import argparse
+import io
+import json
+import os
+import platform
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, cast
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+import libcst as cst
+
+from string_fixer import QuoteTransformer, replace_quotes
+from string_fixer._version import __version__
+from string_fixer.batch import format_sources
+from string_fixer.config import (
+    DEFAULT_CONFIG,
+    Config,
+    ConfigResolver,
+    load_config_from_dir,
+)
+
+from .corpus import write_corpus
+
+LIB_DIR = (Path(__file__).parent / '..').resolve()
+
+# a benchmark returns a function that runs it once, and the number of files and bytes it covers.
+# The setup for each run (eg: copying files) is done by an optional function that isn't timed
+Run = Callable[[], object]
+Benchmark = Tuple[Run, Optional[Callable[[], object]], int, int]
+
+
+def bench_replace_quotes(files: List[Path], engine: str) -> Benchmark:
+    sources = [file.read_text() for file in files]
+
+    def run():
+        for source in sources:
+            replace_quotes(source, target_python='3.8', engine=engine)
+
+    return run, None, len(sources), sum(len(s.encode()) for s in sources)
+
+
+def bench_line_ranges(files: List[Path], lines: int = 20) -> Benchmark:
+    '''Format a few lines in the middle of each file, as an editor would for a selection'''
+    sources = [file.read_text() for file in files]
+
+    def run():
+        for source in sources:
+            middle = source.count('\n') // 2
+            replace_quotes(
+                source, target_python='3.8', line_ranges=[(middle, middle + lines)]
+            )
+
+    return run, None, len(sources), sum(len(s.encode()) for s in sources)
+
+
+def bench_format_sources(files: List[Path]) -> Benchmark:
+    sources = [file.read_text() for file in files]
+    config = cast(Config, {**DEFAULT_CONFIG, 'target_version': '3.8'})
+
+    def run():
+        for _ in format_sources(sources, config):
+            pass
+
+    return run, None, len(sources), sum(len(s.encode()) for s in sources)
+
+
+def bench_transformer(files: List[Path]) -> Benchmark:
+    sources = [file.read_text() for file in files]
+    # only the transform and code generation are timed, not parsing
+    modules = [cst.parse_module(source) for source in sources]
+
+    def run():
+        for module in modules:
+            module.visit(QuoteTransformer(target_python='3.8')).code
+
+    return run, None, len(sources), sum(len(s.encode()) for s in sources)
+
+
+def bench_config(root: Path) -> Benchmark:
+    directories = sorted({path for path in root.rglob('*') if path.is_dir()})
+
+    def run():
+        # resolve configs the same way the CLI does during a walk
+        resolver = ConfigResolver(None, root)
+        for directory in directories:
+            resolver.get(directory)
+
+    return run, load_config_from_dir.cache_clear, len(directories), 0
+
+
+def bench_cli(root: Path, files: List[Path], workdir: Path) -> Benchmark:
+    target = workdir / 'cli'
+
+    def setup():
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.copytree(root, target)
+        load_config_from_dir.cache_clear()
+
+    def run():
+        argv = sys.argv
+        sys.argv = [
+            'string_fixer',
+            '--target',
+            str(target),
+            '--no-cache',
+            '--jobs',
+            '1',
+        ]
+        try:
+            with redirect_stdout(io.StringIO()):
+                runpy.run_module('string_fixer', run_name='__main__')
+        except SystemExit:
+            pass
+        finally:
+            sys.argv = argv
+
+    return run, setup, len(files), sum(file.stat().st_size for file in files)
+
+
+def bench_startup(workdir: Path, *args: str, stdin: str = '') -> Benchmark:
+    '''
+    Time a fresh interpreter running the CLI, which is most of the latency for editor-on-save
+    use. Catches anything that makes importing string-fixer slower (eg: importing libcst eagerly)
+    '''
+    env = {**os.environ, 'PYTHONPATH': str(LIB_DIR)}
+
+    def run():
+        subprocess.run(
+            [sys.executable, *args],
+            cwd=workdir,
+            input=stdin.encode(),
+            env=env,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+
+    return run, None, 1, len(stdin.encode())
+
+
+def measure(benchmark: Benchmark, repeat: int) -> Dict[str, Optional[float]]:
+    '''
+    Time a benchmark (best of `repeat` runs), then run it once more under tracemalloc to get the
+    peak memory, since tracing slows everything down
+    '''
+    run, setup, files, size = benchmark
+    best = float('inf')
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'seconds': best,
+        'files': files,
+        'bytes': size,
+        'files_per_s': files / best,
+        'mb_per_s': size / 2**20 / best if size else None,
+        'peak_memory_mb': peak / 2**20,
+    }
+
+
+def print_results(results: Dict[str, dict], previous: Optional[Dict[str, dict]] = None):
+    header = f'{"benchmark":<36}{"seconds":>9}{"files/s":>10}{"MB/s":>8}{"peak MB":>9}'
+    if previous is not None:
+        header += f'{"vs prev":>9}'
+    print(header)
+    for name, result in results.items():
+        mb_per_s = result['mb_per_s']
+        line = (
+            f'{name:<36}{result["seconds"]:>9.3f}{result["files_per_s"]:>10.1f}'
+            f'{mb_per_s if mb_per_s is not None else float("nan"):>8.2f}'
+            f'{result["peak_memory_mb"]:>9.1f}'
+        )
+        if previous is not None:
+            if name in previous:
+                # >1 means this run was slower
+                line += f'{result["seconds"] / previous[name]["seconds"]:>8.2f}x'
+            else:
+                line += f'{"-":>9}'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        'benchmarks', description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument('--files', type=int, default=10, help='Files of each shape')
+    parser.add_argument('--lines', type=int, default=300, help='Lines per file')
+    parser.add_argument(
+        '--large-files', type=int, default=1, help='Number of large files'
+    )
+    parser.add_argument(
+        '--large-lines', type=int, default=10_000, help='Lines per large file'
+    )
+    parser.add_argument(
+        '--seed', type=int, default=0, help='Random seed for the corpus'
+    )
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark')
+    parser.add_argument(
+        '--only', nargs='+', help='Only run benchmarks whose names start with these'
+    )
+    parser.add_argument(
+        '--output', type=Path, help='Write the results to this JSON file'
+    )
+    parser.add_argument(
+        '--compare', type=Path, help='Compare against results from a previous run'
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        root = workdir / 'corpus'
+        files = write_corpus(
+            root, args.files, args.lines, args.large_files, args.large_lines, args.seed
+        )
+        by_shape: Dict[str, List[Path]] = {}
+        for file in files:
+            by_shape.setdefault(file.relative_to(root).parts[0], []).append(file)
+
+        benchmarks: Dict[str, Callable[[], Benchmark]] = {}
+        for engine in ('libcst', 'tokenize'):
+            for shape, shape_files in by_shape.items():
+                benchmarks[f'replace_quotes.{engine}.{shape}'] = (
+                    lambda e=engine, f=shape_files: bench_replace_quotes(f, e)
+                )
+        benchmarks['line_ranges'] = lambda: bench_line_ranges(
+            by_shape.get('large', files)
+        )
+        benchmarks['format_sources'] = lambda: bench_format_sources(files)
+        benchmarks['QuoteTransformer'] = lambda: bench_transformer(files)
+        benchmarks['config'] = lambda: bench_config(root)
+        benchmarks['cli'] = lambda: bench_cli(root, files, workdir)
+        benchmarks['startup.interpreter'] = lambda: bench_startup(workdir, '-c', 'pass')
+        benchmarks['startup.import'] = lambda: bench_startup(
+            workdir, '-c', 'import string_fixer.__main__'
+        )
+        benchmarks['startup.version'] = lambda: bench_startup(
+            workdir, '-m', 'string_fixer', '--version'
+        )
+        # an already formatted file, as an editor would send on save
+        benchmarks['startup.stdin'] = lambda: bench_startup(
+            workdir,
+            '-m',
+            'string_fixer',
+            '--stdin-filename',
+            'file.py',
+            stdin=replace_quotes(files[0].read_text(), target_python='3.8'),
+        )
+
+        results = {}
+        for name, benchmark in benchmarks.items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            results[name] = measure(benchmark(), args.repeat)
+
+    previous = None
+    if args.compare:
+        previous = json.loads(args.compare.read_text())['results']
+    print_results(results, previous)
+
+    if args.output:
+        report = {
+            'version': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'corpus': {
+                'files': args.files,
+                'lines': args.lines,
+                'large_files': args.large_files,
+                'large_lines': args.large_lines,
+                'seed': args.seed,
+            },
+            'results': results,
+        }
+        args.output.write_text(json.dumps(report, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
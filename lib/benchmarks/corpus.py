@@ -0,0 +1,162 @@
+'''
+Generates reproducible corpora of Python files for benchmarking. Each shape stresses a different
+part of string-fixer, and the same seed always produces the same files.
+'''
+
+import random
+from pathlib import Path
+from typing import Callable, Dict, List
+
+WORDS = [
+    'alpha',
+    'beta',
+    'gamma',
+    'delta',
+    'quote',
+    'escape',
+    'string',
+    'value',
+    'name',
+]
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(4, 12))]
+    # sprinkle in some quotes for the formatter to deal with
+    if rng.random() < 0.5:
+        words[rng.randrange(len(words))] = '"quoted"'
+    if rng.random() < 0.3:
+        words[rng.randrange(len(words))] = "isn't"
+    return ' '.join(words)
+
+
+def docstrings(rng: random.Random, lines: int) -> str:
+    '''Functions with long, triple-quoted docstrings'''
+    output: List[str] = []
+    while len(output) < lines:
+        body = [f'    {_sentence(rng)}' for _ in range(rng.randint(5, 30))]
+        output += [
+            f'def func_{len(output)}(a, b=\"default\"):',
+            '    """',
+            *body,
+            '    """',
+            '    return a + "b"',
+            '',
+        ]
+    return '\n'.join(output) + '\n'
+
+
+def escapes(rng: random.Random, lines: int) -> str:
+    '''Strings full of escaped quotes and backslashes, including SQL-style literals'''
+    atoms = ['text', ' ', "\\'", '\\"', "'", '\\\\', '\\n', "it\\'s"]
+    output: List[str] = []
+    for i in range(lines):
+        if rng.random() < 0.3:
+            output.append(
+                f'sql_{i} = \"SELECT * FROM t WHERE name = \'{rng.choice(WORDS)}\''
+                f' AND value LIKE \'%{rng.choice(WORDS)}%\'\"'
+            )
+        else:
+            text = ''.join(rng.choice(atoms) for _ in range(rng.randint(2, 20)))
+            output.append(f'x_{i} = \"{text}\"')
+    return '\n'.join(output) + '\n'
+
+
+def rstrings(rng: random.Random, lines: int) -> str:
+    '''Raw strings and bytes, which can't have their escapes changed'''
+    patterns = ['\\d+', '\\s*', "'x'", '[a-z]+', '\\\\', '\\w\\"?']
+    output: List[str] = []
+    for i in range(lines):
+        prefix = rng.choice(['r', 'R', 'rb', 'br'])
+        text = ''.join(rng.choice(patterns) for _ in range(rng.randint(1, 6)))
+        output.append(f'pattern_{i} = {prefix}\"{text}\"')
+    return '\n'.join(output) + '\n'
+
+
+def fstrings(rng: random.Random, lines: int) -> str:
+    '''F-strings nested up to 4 deep, using quotes valid on all supported python versions'''
+    quotes = ["'''", '"""', "'", '"']
+    output: List[str] = []
+    for i in range(lines):
+        depth = rng.randint(1, 4)
+        quote_order = quotes[4 - depth :]
+        expressions = ['x', 'y!r', 'z:>10', 'd[0]']
+        if depth == 1:
+            # nested strings can't reuse any quote characters from the enclosing f-strings
+            expressions.append("d['key']")
+        text = rng.choice(expressions)
+        for quote in reversed(quote_order):
+            text = f'f{quote}{rng.choice(WORDS)} {{{text}}}{quote}'
+        output.append(f'message_{i} = {text}')
+    return '\n'.join(output) + '\n'
+
+
+def large(rng: random.Random, lines: int) -> str:
+    '''A long module mixing every other shape'''
+    output = []
+    per_chunk = 200
+    shapes = [docstrings, escapes, rstrings, fstrings]
+    for chunk in range(0, lines, per_chunk):
+        code = rng.choice(shapes)(rng, min(per_chunk, lines - chunk))
+        # keep names unique-ish between chunks
+        output.append(code.replace('_', f'_{chunk}_'))
+    return ''.join(output)
+
+
+SHAPES: Dict[str, Callable[[random.Random, int], str]] = {
+    'docstrings': docstrings,
+    'escapes': escapes,
+    'rstrings': rstrings,
+    'fstrings': fstrings,
+}
+
+PYPROJECT = '''\
+[tool.string-fixer]
+target_version = "3.8"
+ignore = ["./ignored/**"]
+'''
+
+GITIGNORE = '''\
+*.pyc
+build/
+'''
+
+
+def write_corpus(
+    directory: Path,
+    files: int = 10,
+    lines: int = 300,
+    large_files: int = 1,
+    large_lines: int = 10_000,
+    seed: int = 0,
+) -> List[Path]:
+    '''
+    Write a corpus to a directory, along with a `pyproject.toml` and `.gitignore`
+
+    Args:
+        directory: where to write the corpus
+        files: number of files of each shape
+        lines: approximate number of lines per file
+        large_files: number of large files, mixing all shapes
+        large_lines: approximate number of lines per large file
+        seed: random seed
+
+    Returns:
+        list of the Python files written
+    '''
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / 'pyproject.toml').write_text(PYPROJECT)
+    (directory / '.gitignore').write_text(GITIGNORE)
+
+    written: List[Path] = []
+    shapes = [(name, generate, files, lines) for name, generate in SHAPES.items()]
+    shapes.append(('large', large, large_files, large_lines))
+    for name, generate, count, size in shapes:
+        for index in range(count):
+            rng = random.Random(f'{seed}-{name}-{index}')
+            # nest files a couple of levels deep so that there are directories to walk
+            file = directory / name / f'group_{index % 3}' / f'module_{index}.py'
+            file.parent.mkdir(parents=True, exist_ok=True)
+            file.write_text(generate(rng, size))
+            written.append(file)
+    return written
@@ -0,0 +1,104 @@
+'''
+Micro-benchmark for re-quoting string literals, comparing `QuoteStyle._requote` against the
+original implementation, which made separate regex passes to unescape, escape (twice) and count
+escapes (twice).
+
+Usage: python benchmarks/escapes.py [--number N]
+'''
+
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer.quotes import QuoteStyle, string_prefix, string_quote
+
+LITERALS = {
+    'short': '"hello world"',
+    'escaped': '"it\'s a \\"quoted\\" \'string\'"',
+    'docstring': '"""\n'
+    + '    Some documentation that mentions "quotes" and isn\'t short.\n' * 40
+    + '"""',
+    'sql': "\"SELECT * FROM users WHERE name = 'x' AND email LIKE '%@example.com' "
+    + "AND id IN (SELECT user_id FROM orders WHERE status = 'open') " * 10
+    + '"',
+}
+
+
+class LegacyQuoteStyle(QuoteStyle):
+    '''The regex-per-pass implementation that `_scan_escapes` replaced'''
+
+    def _escape_quotes(self, text: str, quote_re: str, quote_len: int):
+        return re.sub(
+            r'(\\*)([%s]{%d,})' % (quote_re, quote_len),
+            self._escape_quote_sub,
+            text,
+            flags=re.MULTILINE,
+        )
+
+    def _unescape_quote_sub(self, match: re.Match) -> str:
+        escapes, quote = match.groups()
+        if len(escapes) % 2 == 0:
+            return escapes + quote
+        return escapes[:-1] + quote
+
+    def _unescape_quotes(self, text: str, quote_re: str, quote_len: int):
+        return re.sub(
+            r'(\\*)([%s]{1,%d})' % (quote_re, quote_len),
+            self._unescape_quote_sub,
+            text,
+            flags=re.MULTILINE,
+        )
+
+    def _count_escapes(self, text: str):
+        return len([i for i in re.findall(r'(\\*)["\']', text) if len(i) % 2 != 0])
+
+    def _requote(self, value, quote_override=None):
+        quote = quote_override or self._get_quote()[0]
+        anti = "'" if quote[0] == '"' else '"'
+        prefix = string_prefix(value)
+        old_quote = string_quote(value)
+        quote_len = max(len(quote), len(old_quote))
+        if anti not in old_quote:
+            return value
+        text = value[len(old_quote) + len(prefix) : -len(old_quote)]
+        new_quote = quote[0] * quote_len
+        text = orig_text = self._unescape_quotes(text, quote + anti, quote_len)
+        text = self._escape_quotes(text, quote, quote_len)
+        if self.prefer_least_escapes:
+            old_style = self._escape_quotes(orig_text, anti, quote_len)
+            if self._count_escapes(text) > self._count_escapes(old_style):
+                text = old_style
+                new_quote = anti[0] * quote_len
+        return f'{prefix}{new_quote}{text}{new_quote}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=20_000, help='Calls per literal')
+    args = parser.parse_args()
+
+    legacy, current = LegacyQuoteStyle(), QuoteStyle()
+    print(f'{"literal":<12}{"legacy (us)":>14}{"current (us)":>14}{"speedup":>10}')
+    for name, literal in LITERALS.items():
+        assert legacy._requote(literal) == current._requote(literal)
+        times = [
+            min(
+                timeit.repeat(
+                    lambda: style._requote(literal), number=args.number, repeat=5
+                )
+            )
+            / args.number
+            * 1e6
+            for style in (legacy, current)
+        ]
+        print(
+            f'{name:<12}{times[0]:>14.2f}{times[1]:>14.2f}{times[0] / times[1]:>9.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
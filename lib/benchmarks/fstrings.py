@@ -0,0 +1,63 @@
+'''
+Benchmark for transforming nested f-strings with libcst. Times the transform separately from
+parsing, for files with an increasing number of nested f-strings and (on python 3.12+) increasingly
+deeply nested f-strings. Time per f-string should stay roughly flat as the input grows.
+
+Usage: python benchmarks/fstrings.py
+'''
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+import libcst as cst
+
+from string_fixer import QuoteTransformer
+
+
+def many_fstrings(count: int) -> str:
+    '''Module with `count` lines, each with an f-string nested 3 deep (4 f-strings per line)'''
+    line = 'v = f"a{f\'b{f"""c{x}"""}\'}d{d[f"k{y}"]}"\n'
+    return line * count
+
+
+def deep_fstring(depth: int) -> str:
+    '''Module with 10 lines, each with f-strings nested `depth` deep (PEP 701 syntax)'''
+    text = 'x'
+    for _ in range(depth):
+        text = f'f\"a{{{text}}}b\"'
+    return f'v = {text}\n' * 10
+
+
+def measure(code: str, target_python: str):
+    start = time.perf_counter()
+    module = cst.parse_module(code)
+    parsed = time.perf_counter()
+    module.visit(QuoteTransformer(target_python=target_python))
+    return parsed - start, time.perf_counter() - parsed
+
+
+def report(label: str, size: int, fstrings: int, code: str, target_python: str):
+    parse, transform = measure(code, target_python)
+    print(
+        f'{label:<8}{size:>8}{parse * 1000:>12.1f}{transform * 1000:>16.1f}'
+        f'{transform / fstrings * 1e6:>18.2f}'
+    )
+
+
+def main():
+    print(
+        f'{"input":<8}{"size":>8}{"parse (ms)":>12}{"transform (ms)":>16}'
+        f'{"us per f-string":>18}'
+    )
+    for count in (500, 1000, 2000, 4000):
+        report('count', count, count * 4, many_fstrings(count), '3.8')
+    if sys.version_info >= (3, 12):
+        for depth in (10, 20, 40, 80):
+            report('depth', depth, depth * 10, deep_fstring(depth), '3.12')
+
+
+if __name__ == '__main__':
+    main()
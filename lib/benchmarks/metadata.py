@@ -0,0 +1,70 @@
+'''
+Benchmark comparing wall time and peak memory for transforming a large module with and without
+resolving position metadata first, as `QuoteTransformer` used to.
+
+Usage: python benchmarks/metadata.py [--copies N]
+'''
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+import libcst as cst
+from libcst.metadata import MetadataWrapper, PositionProvider
+
+from string_fixer import QuoteTransformer
+
+SOURCE_DIR = Path(__file__).parent / '..' / 'string_fixer'
+
+
+class PositionTransformer(QuoteTransformer):
+    '''Requires the position metadata that `QuoteTransformer` used to depend on'''
+
+    METADATA_DEPENDENCIES = (PositionProvider,)
+
+
+def measure(code: str, metadata: bool):
+    '''
+    Returns:
+        the time taken to parse and transform the code, and the peak memory allocated by the
+        transform on top of the parsed module
+    '''
+    start = time.perf_counter()
+    module = cst.parse_module(code)
+    tracemalloc.start()
+    if metadata:
+        MetadataWrapper(module).visit(PositionTransformer())
+    else:
+        module.visit(QuoteTransformer())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    elapsed = time.perf_counter() - start
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--copies',
+        type=int,
+        default=3,
+        help='Copies of the string_fixer source to format',
+    )
+    args = parser.parse_args()
+
+    code = ''.join(file.read_text() for file in sorted(SOURCE_DIR.glob('*.py')))
+    code *= args.copies
+    print(f'{len(code.splitlines())} lines')
+    print(f'{"mode":<12}{"time (s)":>10}{"transform peak (MiB)":>22}')
+    for metadata in (True, False):
+        elapsed, peak = measure(code, metadata)
+        label = 'positions' if metadata else 'no metadata'
+        print(f'{label:<12}{elapsed:>10.2f}{peak / 2**20:>22.1f}')
+
+
+if __name__ == '__main__':
+    main()
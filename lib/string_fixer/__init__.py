@@ -1,337 +1,424 @@
+import ast
 import os
-import re
-import sys
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Literal, Optional, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    TypedDict,
+)
+
+from .cache import Cache
+from .chunks import select_lines, split_code
+from .config import Config
+from .diff import apply_edits, print_diff, string_edits
+from .ignore import file_is_ignored as file_is_ignored
+from .limits import LimitExceeded, check_size, code_size, time_limit
+from .prefilter import may_change
+from .profiling import stage
+from .quotes import QuoteStyle
+from .quotes import version_lt as version_lt
+from .tokenize_engine import TokenizeEngine, UnsupportedSyntax
 
-import libcst as cst
-from libcst import FormattedString, parse_module
-from libcst.metadata import PositionProvider, MetadataWrapper
+if TYPE_CHECKING:
+    import libcst as cst
 
-from .config import Config
+    from .transformer import QuoteChecker, QuoteTransformer
 
 
-def version_lt(a: str, b: str):
-    '''
-    Minimal version check for python versions
+def __getattr__(name: str):
+    # libcst is slow to import, so the transformers are only loaded when they're first used
+    if name in ('QuoteTransformer', 'QuoteChecker'):
+        from . import transformer
+
+        return getattr(transformer, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-    Returns:
-        a < b
-    '''
-    return int(a.replace('.', '')) < int(b.replace('.', ''))
 
+class Formatter:
+    '''
+    Formats code with a fixed set of options. The transformers are only created once, so this is
+    cheaper than calling `replace_quotes` repeatedly when formatting lots of code. Not thread safe
 
-class QuoteTransformer(cst.CSTTransformer):
-    METADATA_DEPENDENCIES = (PositionProvider,)
+    libcst isn't imported until some code actually needs parsing, so creating a formatter is cheap
+    and code that is skipped by the prefilter never pays for the import
+    '''
 
     def __init__(
         self,
-        target_python: Optional[str] = None,
-        prefer_least_escapes=True,
-        quote_style: Literal['single', 'double'] = 'single',
+        prefilter: bool = True,
+        engine: Literal['libcst', 'tokenize'] = 'libcst',
+        chunk_lines: Optional[int] = None,
+        max_file_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        line_ranges: Optional[Sequence[Tuple[int, int]]] = None,
+        **kwargs,
     ):
         '''
         Args:
-            target_python: which version of python to target. Defaults to current version
-        '''
-        self._target_python = (
-            target_python or f'{sys.version_info.major}.{sys.version_info.minor}'
-        )
-        self.prefer_least_escapes = prefer_least_escapes
-        self.quote_style = quote_style
-
-    def _escape_quote_sub(self, match: re.Match) -> str:
+            prefilter: scan the code's tokens first and skip parsing it entirely if no strings
+                would be changed
+            engine: which engine to transform the code with. The tokenize engine is faster but
+                falls back to libcst for any code it can't safely handle
+            chunk_lines: split code longer than this many lines into chunks at top-level
+                statements, and format each chunk separately. This lowers the peak memory used
+                for very large modules and gives identical output. See `split_code`
+            max_file_size: raise `LimitExceeded` for code larger than this many bytes
+            timeout: raise `LimitExceeded` if formatting takes longer than this many seconds.
+                See `time_limit` for caveats
+            line_ranges: only rewrite strings that overlap these inclusive `(start, end)` line
+                ranges, with lines starting from 1. Top-level statements outside of the ranges
+                aren't parsed at all. See `select_lines`
+            **kwargs: passed to `QuoteTransformer`
         '''
-        Handle quotes, check if they're escaped, escape them if not
+        if engine not in ('libcst', 'tokenize'):
+            raise ValueError(f'unknown engine: {engine!r}')
+        self.prefilter = prefilter
+        self.engine = engine
+        self.chunk_lines = chunk_lines
+        self.max_file_size = max_file_size
+        self.timeout = timeout
+        self.line_ranges = line_ranges
+        self._kwargs = kwargs
+        # make sure the options are valid up front, rather than when libcst is first needed
+        self._quote_style = QuoteStyle(**kwargs).quote_style
+        self._tokenize = TokenizeEngine(**kwargs) if engine == 'tokenize' else None
+        self._transformers: Optional[Tuple['QuoteTransformer', 'QuoteChecker']] = None
+        self._metadata = False
+
+    def _libcst(self) -> Tuple['QuoteTransformer', 'QuoteChecker']:
+        '''Get the libcst transformer and checker, importing libcst the first time'''
+        if self._transformers is None:
+            from .transformer import QuoteChecker, QuoteTransformer
+
+            transformer = QuoteTransformer(**self._kwargs)
+            self._transformers = (transformer, QuoteChecker(**self._kwargs))
+            # only pay for resolving metadata if something actually needs it
+            self._metadata = bool(transformer.get_inherited_dependencies())
+        return self._transformers
+
+    def _parse(self, code: str) -> 'cst.Module':
+        from libcst import parse_module
+
+        with stage('parse'):
+            return parse_module(code)
+
+    def _visit(self, module: 'cst.Module', visitor: 'QuoteTransformer') -> 'cst.Module':
+        if self._metadata:
+            from libcst.metadata import MetadataWrapper
+
+            return MetadataWrapper(module).visit(visitor)
+        return module.visit(visitor)
+
+    @contextmanager
+    def _limits(self, code: str) -> Iterator[None]:
+        if self.max_file_size is not None:
+            check_size(code_size(code, self.max_file_size), self.max_file_size)
+        with time_limit(self.timeout):
+            yield
+
+    def _chunks(self, code: str) -> Optional[List[str]]:
+        if not self.chunk_lines:
+            return None
+        with stage('split'):
+            chunks = split_code(code, self.chunk_lines)
+        return chunks if len(chunks) > 1 else None
+
+    def _skipped(self, chunks: List[str]) -> List[bool]:
         '''
-        escapes, quote = match.groups()
-        if len(escapes) % 2 == 1:
-            # quote is escaped. Do nothing
-            return escapes + quote
-        # quote is not escaped. Escape it
-        return escapes + (('\\' + quote[0]) * len(quote))
-
-    def _escape_quotes(self, text: str, quote_re: str, quote_len: int):
-        return re.sub(
-            r'(\\*)([%s]{%d,})' % (quote_re, quote_len),
-            self._escape_quote_sub,
-            text,
-            flags=re.MULTILINE,
-        )
-
-    def _unescape_quote_sub(self, match: re.Match) -> str:
-        escapes, quote = match.groups()
-        if not quote:
-            return escapes + quote
-        if len(escapes) % 2 == 0:
-            # quote is unescaped. Do nothing
-            return escapes + quote
-        # quote is escaped. Unescape it
-        return escapes[:-1] + quote
-
-    def _unescape_quotes(self, text: str, quote_re: str, quote_len: int):
-        return re.sub(
-            r'(\\*)([%s]{1,%d})' % (quote_re, quote_len),
-            self._unescape_quote_sub,
-            text,
-            flags=re.MULTILINE,
-        )
-
-    def _count_escapes(self, text: str):
-        return len([i for i in re.findall(r'(\\*)["\']', text) if len(i) % 2 != 0])
-
-    def _get_quote(self):
-        return ("'", '"') if self.quote_style == 'single' else ('"', "'")
-
-    def leave_SimpleString(
-        self,
-        original_node: cst.SimpleString,
-        updated_node: cst.SimpleString,
-        quote_override: Optional[str] = None,
-    ) -> cst.SimpleString:
-        '''
-        Args:
-            original_node: the node being visited
-            updated_node: a deep clone of `original_node` where transformations can be applied
-            quote_override: override what kind of quote we are assigning to the string. Useful for
-                nested f-strings where quote re-use is not allowed
+        Work out which chunks the prefilter can skip. Without chunking, the whole file is parsed
+        if any of it could change, so in that case the skipped chunks are syntax checked as
+        well, to make sure that invalid code still fails.
+
+        Raises:
+            SyntaxError: if a skipped chunk is invalid and other chunks need parsing
         '''
-        quote = quote_override or self._get_quote()[0]
-        anti = "'" if quote[0] == '"' else '"'
-        prefix = original_node.prefix
-        quote_len = max(len(quote), len(updated_node.quote))
-
-        if anti not in original_node.quote:
-            return updated_node
-
-        # remove start and end quotes
-        text = updated_node.value[
-            len(updated_node.quote) + len(prefix) : -len(updated_node.quote)
-        ]
-        new_quote = quote[0] * quote_len
-
-        if 'r' in prefix:
-            if quote in text:
-                # we can't add/remove escapes from rstrings
-                return original_node
-            # if the target quote isn't in the rstring then we can do a simple quote swap
-        else:
-            # unescape as many internal quotes as possible
-            text = orig_text = self._unescape_quotes(text, quote + anti, quote_len)
-            # escape the quotes we want to wrap the string with
-            text = self._escape_quotes(text, quote, quote_len)
-
-            if self.prefer_least_escapes:
-                # escape the current quotes wrapping the string
-                old_style = self._escape_quotes(orig_text, anti, quote_len)
-
-                # if changing quote style would result in more escapes
-                if self._count_escapes(text) > self._count_escapes(old_style):
-                    # set everything back to the old style
-                    text = old_style
-                    new_quote = anti[0] * quote_len
-
-        return updated_node.with_changes(value=f'{prefix}{new_quote}{text}{new_quote}')
-
-    def leave_FormattedString(
-        self,
-        original_node: cst.FormattedString,
-        updated_node: cst.FormattedString,
-        depth=1,
-        meta: Optional[dict] = None,
-    ) -> cst.BaseExpression:
+        if not self.prefilter:
+            return [False] * len(chunks)
+        with stage('prefilter'):
+            skipped = [not may_change(chunk, self._quote_style) for chunk in chunks]
+        if not all(skipped):
+            with stage('parse'):
+                for chunk, skip in zip(chunks, skipped):
+                    if skip:
+                        compile(chunk, '<chunk>', 'exec', ast.PyCF_ONLY_AST)
+        return skipped
+
+    def format(self, code: str) -> str:
+        '''Transform some code. See `replace_quotes`'''
+        with self._limits(code):
+            if self.line_ranges:
+                return self._format_lines(code, self.line_ranges)
+            return self._format_chunks(code)
+
+    def _format_lines(self, code: str, line_ranges: Sequence[Tuple[int, int]]) -> str:
         '''
-        Args:
-            original_node: the node being visited
-            updated_node: a deep clone of `original_node` where transformations can be applied
-            depth: current recursion depth
-            meta: dict used to keep track of info across recursions (eg: max recursion depth)
-                without corrupting the return signature
+        Format the top-level statements that overlap the line ranges, then only keep the edits
+        to strings within the ranges
         '''
-        meta = meta if meta is not None else {}
-        meta['max_depth'] = max(meta.get('max_depth', 1), depth)
-        meta['multiline_depths'] = meta.get('multiline_depths', [])
-
-        metadata = self.get_metadata(PositionProvider, original_node)
-        if len(original_node.quote) == 3 and metadata.start.line < metadata.end.line:
-            meta['multiline_depths'].append(depth)
-
-        def get_quote(depth):
-            '''Get appropriate quote given the f-string nest depth'''
-            quote, anti = self._get_quote()
-
-            if not version_lt(self._target_python, '3.12'):
-                return quote * 3 if depth in meta['multiline_depths'] else quote
-
-            if meta['multiline_depths']:
-                multiline_order = [quote * 3, anti * 3]
-                single_order = [quote, anti]
-                quote_order = []
-                for i in range(0, meta['max_depth']):
-                    if i + 1 in meta['multiline_depths']:
-                        quote_order.append(multiline_order.pop(0))
-                    else:
-                        quote_order.append(single_order.pop(0))
-            else:
-                if meta['max_depth'] <= 2:
-                    quote_order = [quote, anti]
-                elif meta['max_depth'] == 3:
-                    quote_order = [quote * 3, quote, anti]
-                else:
-                    quote_order = [quote * 3, anti * 3, quote, anti]
-
-            return quote_order[depth - 1]
-
-        if version_lt(self._target_python, '3.12') and depth > 4:
-            # quit after 4 levels on <=3.11 because you can't reuse quotes in f-string expressions.
-            # since there are only 4 kinds of quotes (single, double and triple versions of each)
-            # there can only be 4 levels (see also point 3 in https://peps.python.org/pep-0701/#rationale)
-            return super().leave_FormattedString(original_node, updated_node)
-
-        new_parts = []
-        has_expressions = False
-        for part in original_node.parts:
-            # it would be better to split this block into the corresponding `leave_<NodeType>`.
-            # Each nested fstring gets visited separately before the top-level one, meaning we will
-            # traverse it multiple times. However, we may lose the depth tracking info that way.
-            # Performance not critical atm since I haven't tested a large file. Something to look into
-            if isinstance(part, cst.FormattedStringText):
-                value = re.sub(
-                    r'(\\*)(["\']{%d,})' % 1,
-                    self._escape_quote_sub,
-                    part.value,
-                    flags=re.MULTILINE,
-                )
-                new_parts.append(part.with_changes(value=value))
-            elif isinstance(part, cst.FormattedStringExpression):
-                has_expressions = True
-                expression = part.expression
-                if isinstance(expression, FormattedString):
-                    new_parts.append(
-                        part.with_changes(
-                            expression=self.leave_FormattedString(
-                                expression, expression.deep_clone(), depth + 1, meta
-                            )
-                        )
-                    )
-                elif isinstance(expression, cst.Subscript):
-                    new_slices = []
-                    for slice in expression.slice:
-                        if not isinstance(slice.slice, cst.Index):
-                            new_slices.append(slice)
-                            continue
-
-                        value = slice.slice.value
-                        new_value = value
-                        if isinstance(value, cst.SimpleString):
-                            # bump max_depth because simple string is another layer
-                            meta['max_depth'] = max(meta.get('max_depth', 1), depth + 1)
-                            new_value = self.leave_SimpleString(
-                                value, value.deep_clone(), get_quote(depth + 1)
-                            )
-                        elif isinstance(value, FormattedString):
-                            new_value = self.leave_FormattedString(
-                                value, value.deep_clone(), depth + 1, meta
-                            )
-
-                        new_slices.append(
-                            slice.with_changes(
-                                slice=slice.slice.with_changes(value=new_value)
-                            )
-                        )
-                    new_parts.append(
-                        part.with_changes(
-                            expression=expression.with_changes(slice=new_slices)
-                        )
-                    )
-                elif isinstance(expression, cst.SimpleString):
-                    # bump max_depth because simple string is another layer
-                    meta['max_depth'] = max(meta.get('max_depth', 1), depth + 1)
-                    if len(expression.quote) == 3:
-                        meta['multiline_depths'].append(depth + 1)
-                    new_parts.append(
-                        part.with_changes(
-                            expression=self.leave_SimpleString(
-                                expression,
-                                expression.deep_clone(),
-                                get_quote(depth + 1),
-                            )
-                        )
+        with stage('split'):
+            sections = select_lines(code, line_ranges)
+        output: List[str] = []
+        for first, section, selected in sections:
+            if not selected:
+                output.append(section)
+                continue
+            formatted = self._format_chunks(section)
+            with stage('edits'):
+                edits = [
+                    edit
+                    for edit in string_edits(section, formatted)
+                    if any(
+                        a <= first + edit['end']['line']
+                        and b >= first + edit['start']['line']
+                        for a, b in line_ranges
                     )
-                else:
-                    new_parts.append(part)
-            else:
-                has_expressions = True
-                new_parts.append(part)
-
-        quote = get_quote(depth)
-        if not has_expressions:
-            prefix = original_node.prefix.replace('f', '')
-            text = ''.join(part.value for part in new_parts)
-            return cst.SimpleString(
-                f'{prefix}{quote}{text}{quote}',
-                lpar=original_node.lpar,
-                rpar=original_node.rpar,
-            )
-
-        return updated_node.with_changes(
-            parts=new_parts, start=f'{original_node.prefix}{quote}', end=quote
-        )
-
-
-def replace_quotes(code: str, **kwargs) -> str:
-    module = MetadataWrapper(parse_module(code))
-    transformer = QuoteTransformer(**kwargs)
-    modified_module = module.visit(transformer)
-    return modified_module.code
-
-
-def process_file(file: Path, config: Config, base_dir: Optional[Path] = None):
-    assert file.is_file()
+                ]
+                output.append(apply_edits(section, edits))
+        return ''.join(output)
+
+    def _format_chunks(self, code: str) -> str:
+        if (chunks := self._chunks(code)) is not None:
+            try:
+                skipped = self._skipped(chunks)
+                return ''.join(
+                    chunk if skip else self._transform(chunk)
+                    for chunk, skip in zip(chunks, skipped)
+                )
+            except LimitExceeded:
+                raise
+            except Exception:
+                # fall back to formatting the whole thing, so that any errors are the same
+                pass
+        return self._format(code)
+
+    def _format(self, code: str) -> str:
+        if self.prefilter:
+            with stage('prefilter'):
+                if not may_change(code, self._quote_style):
+                    return code
+        return self._transform(code)
+
+    def _transform(self, code: str) -> str:
+        if self._tokenize is not None:
+            try:
+                with stage('tokenize'):
+                    return self._tokenize.transform(code)
+            except UnsupportedSyntax:
+                pass
+        transformer = self._libcst()[0]
+        module = self._parse(code)
+        with stage('transform'):
+            modified_module = self._visit(module, transformer)
+        with stage('codegen'):
+            return modified_module.code
+
+    def would_change(self, code: str) -> bool:
+        '''Check whether `format` would change some code. See `would_change`'''
+        if self.line_ranges:
+            # strings outside the ranges could change, so this can't stop at the first one
+            return self.format(code) != code
+        with self._limits(code):
+            if (chunks := self._chunks(code)) is not None:
+                try:
+                    skipped = self._skipped(chunks)
+                    # every chunk is checked, rather than stopping at the first that changes,
+                    # so that syntax errors later on are still found
+                    changed = [
+                        not skip and self._check(chunk)
+                        for chunk, skip in zip(chunks, skipped)
+                    ]
+                    return any(changed)
+                except LimitExceeded:
+                    raise
+                except Exception:
+                    pass
+            return self._would_change(code)
+
+    def _would_change(self, code: str) -> bool:
+        if self.prefilter:
+            with stage('prefilter'):
+                if not may_change(code, self._quote_style):
+                    return False
+        return self._check(code)
+
+    def _check(self, code: str) -> bool:
+        if self._tokenize is not None:
+            try:
+                with stage('tokenize'):
+                    return self._tokenize.would_change(code)
+            except UnsupportedSyntax:
+                pass
+        from .transformer import _Changed
+
+        checker = self._libcst()[1]
+        module = self._parse(code)
+        try:
+            with stage('transform'):
+                self._visit(module, checker)
+        except _Changed:
+            return True
+        return False
+
+
+def replace_quotes(
+    code: str,
+    prefilter: bool = True,
+    engine: Literal['libcst', 'tokenize'] = 'libcst',
+    **kwargs,
+) -> str:
+    '''
+    Args:
+        code: the code to transform
+        prefilter: scan the code's tokens first and skip parsing it entirely if no strings
+            would be changed
+        engine: which engine to transform the code with. The tokenize engine is faster but
+            falls back to libcst for any code it can't safely handle
+        **kwargs: passed to `Formatter` (eg: `chunk_lines`) and `QuoteTransformer`
+    '''
+    return Formatter(prefilter, engine, **kwargs).format(code)
+
+
+def would_change(
+    code: str,
+    prefilter: bool = True,
+    engine: Literal['libcst', 'tokenize'] = 'libcst',
+    **kwargs,
+) -> bool:
+    '''
+    Check whether `replace_quotes` would change some code. Stops as soon as the first string that
+    would be changed is found, without generating the rest of the output.
+
+    Args:
+        code: the code to check
+        prefilter: scan the code's tokens first and skip parsing it entirely if no strings
+            would be changed
+        engine: which engine to check the code with. See `replace_quotes`
+        **kwargs: passed to `Formatter` and `QuoteTransformer`
+    '''
+    return Formatter(prefilter, engine, **kwargs).would_change(code)
+
+
+def _options(config: Config) -> Dict[str, Any]:
+    return {
+        'target_python': config['target_version'],
+        'prefer_least_escapes': config['prefer_least_escapes'],
+        'quote_style': config['quote_style'],
+        'engine': config['engine'],
+        'chunk_lines': config.get('chunk_lines'),
+        'max_file_size': config.get('max_file_size'),
+        'timeout': config.get('timeout'),
+        'max_fstring_depth': config.get('max_fstring_depth'),
+        'line_ranges': config.get('line_ranges'),
+    }
+
+
+def format_code(code: str, config: Config) -> str:
+    '''
+    Transform some code according to the formatting options in a config
+    '''
+    return replace_quotes(code, **_options(config))
+
+
+def check_code(code: str, config: Config) -> bool:
+    '''
+    Check whether `format_code` would change some code. See `would_change`
+    '''
+    return would_change(code, **_options(config))
+
+
+class ProcessResult(TypedDict):
+    changed: bool
+    # whether the file was found in the cache. None if no cache was used
+    cache_hit: Optional[bool]
+
+
+def _write_file(file: Path, content: str):
+    with open(file, 'w') as f:
+        f.write(content)
+
+
+def process_file(
+    file: Path,
+    config: Config,
+    base_dir: Optional[Path] = None,
+    cache: Optional[Cache] = None,
+    code: Optional[str] = None,
+    write: Callable[[Path, str], None] = _write_file,
+    update: Optional[Callable[[Path, str], None]] = None,
+) -> ProcessResult:
+    '''
+    Args:
+        file: the file to format
+        config: the config for the file
+        base_dir: the directory being formatted, which `file` is relative to when writing to the
+            `output` directory
+        cache: cache used to skip files that are already formatted
+        code: the contents of the file, if they've already been read
+        write: function used to write the result. Can be used to defer writing (eg: to another
+            thread)
+        update: function used to write the result back to `file` itself, rather than to the
+            `output` directory. Defaults to `write`
+    '''
+    assert code is not None or file.is_file()
     base_dir = base_dir or file.parent
-    print('Processing:', file)
-    with open(file) as f:
-        code = f.read()
-
-    modified = replace_quotes(
-        code,
-        target_python=config['target_version'],
-        prefer_least_escapes=config['prefer_least_escapes'],
-        quote_style=config['quote_style'],
-    )
-
-    if config.get('dry_run', False):
+    if config.get('line_ranges'):
+        # only part of the file gets formatted, so it can't be marked as clean
+        cache = None
+    if not config.get('diff'):
+        # keep the output limited to the diff
+        print('Processing:', file)
+    if code is None:
+        # check the size before reading the file, so huge files are never loaded into memory
+        check_size(file.stat().st_size, config.get('max_file_size'))
+        with stage('read'), open(file) as f:
+            code = f.read()
+
+    cache_hit = None
+    if cache is not None:
+        with stage('cache'):
+            cache_hit = cache.is_clean(cache.key(code, config))
+
+    if config.get('check', False) and not config.get('diff'):
+        changed = not cache_hit and check_code(code, config)
+        if changed:
+            print('Would change:', file)
+        elif cache is not None and not cache_hit:
+            with stage('cache'):
+                cache.mark_clean(cache.key(code, config))
+        return {'changed': changed, 'cache_hit': cache_hit}
+
+    if cache_hit:
+        modified = code
+    else:
+        modified = format_code(code, config)
+        if cache is not None:
+            with stage('cache'):
+                cache.mark_clean(cache.key(modified, config))
+
+    if diff := config.get('diff'):
+        print_diff(file, code, modified, diff)
+    elif config.get('dry_run', False):
         print('---')
         print(modified)
         print('---')
-    else:
-        if config['output']:
-            file = Path(config['output']).joinpath(*file.parts[len(base_dir.parts) :])
-            print('Writing to:', file)
-            os.makedirs(file.parent, exist_ok=True)
-        with open(file, 'w') as f:
-            f.write(modified)
-
-
-def file_is_ignored(
-    file: Path, ignore: Optional[List[Path]], include: Optional[List[Path]]
-):
-    file = file.absolute()
-    is_ignored = False
-    is_included = False
-
-    if ignore:
-        for ignore_path in ignore:
-            ignore_path = ignore_path.absolute()
-            if ignore_path == file or ignore_path in file.parents:
-                is_ignored = True
-                break
-
-    if include:
-        for include_path in include:
-            include_path = include_path.absolute()
-            if include_path == file or include_path in file.parents:
-                is_included = True
-                break
-
-    return is_ignored and not is_included
+    elif config['output']:
+        file = Path(config['output']).joinpath(*file.parts[len(base_dir.parts) :])
+        print('Writing to:', file)
+        os.makedirs(file.parent, exist_ok=True)
+        with stage('write'):
+            write(file, modified)
+    elif modified != code:
+        # only write if needed, so that unchanged files keep their mtime
+        with stage('write'):
+            (update or write)(file, modified)
+
+    return {'changed': modified != code, 'cache_hit': cache_hit}
@@ -1,17 +1,120 @@
 import argparse
+import json
 import os
 import sys
 from pathlib import Path
+from typing import Iterator, List, Optional, Set, Tuple
 
-from . import file_is_ignored, process_file
+from . import check_code, file_is_ignored, format_code, process_file
 from ._version import __version__
-from .config import load_config_from_dir, merge_with_cli_args
+from .cache import Cache
+from .config import (
+    ConfigResolver,
+    load_config_from_dir,
+    merge_configs,
+    merge_with_cli_args,
+    parse_cli_args,
+)
+from .diff import print_diff, string_edits
+from .git import GitError, changed_files, process_staged_file, staged_files
+from .ignore import walk, with_gitignores
+from .limits import LimitExceeded
+from .profiling import Profiler, activate, stage
+from .runner import Job, print_summary, process_files
+
+
+def read_file_list(source: str) -> List[Path]:
+    '''
+    Read a list of paths from a file, or from stdin if `source` is `-`. Paths are separated by
+    newlines, or by NUL characters if there are any (eg: from `git ls-files -z`)
+    '''
+    if source == '-':
+        data = sys.stdin.read()
+    else:
+        with open(source) as f:
+            data = f.read()
+    lines = data.split('\0') if '\0' in data else data.splitlines()
+    return [Path(line) for line in lines if line]
+
+
+def parse_line_range(value: str) -> Tuple[int, int]:
+    '''Parse a `START-END` line range, where lines start from 1 and both ends are inclusive'''
+    start, sep, end = value.partition('-')
+    try:
+        line_range = (int(start), int(end))
+    except ValueError:
+        line_range = None
+    if not sep or line_range is None or not 1 <= line_range[0] <= line_range[1]:
+        raise argparse.ArgumentTypeError(f'invalid line range: {value!r}')
+    return line_range
+
+
+def add_boolean_argument(parser: argparse.ArgumentParser, *flags: str, help: str):
+    '''
+    Add a `--flag` arg along with a `--no-flag` arg to turn it off. Equivalent to
+    `argparse.BooleanOptionalAction`, which needs python 3.9+
+    '''
+    long_flag = next(flag for flag in flags if flag.startswith('--'))
+    dest = long_flag[2:].replace('-', '_')
+    parser.add_argument(
+        *flags, action='store_true', dest=dest, help=help, default=argparse.SUPPRESS
+    )
+    parser.add_argument(
+        f'--no-{long_flag[2:]}',
+        action='store_false',
+        dest=dest,
+        help=f'Opposite of {long_flag}',
+        default=argparse.SUPPRESS,
+    )
+
+
+def find_files(
+    directory: Path, resolver: ConfigResolver, limit: Optional[Path]
+) -> Iterator[Job]:
+    '''
+    Walk a directory for Python files that aren't ignored, along with the config for each one
+
+    Args:
+        directory: the directory to walk
+        resolver: used to get the config for each directory
+        limit: don't look for `.gitignore` files higher than this dir
+    '''
+
+    def rules(path: Path):
+        with stage('config'):
+            config = resolver.get(path)
+        with stage('ignore'):
+            ignore = with_gitignores(config['ignore'], path, limit)
+        return ignore, config['include']
+
+    # ignored directories are pruned, so the walk never descends into them
+    with stage('walk'):
+        for root, files in walk(directory, rules, suffix='.py'):
+            config = resolver.get(root)
+            for file in files:
+                yield (file, config, directory)
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         'string-fixer',
         description='Simple tool to replace "double quotes" with \'single quotes\' in Python files',
     )
+    parser.add_argument(
+        'paths',
+        nargs='*',
+        help='Files and directories to format. Directories are searched for .py files, and any'
+        ' files that are ignored are skipped. Configs are loaded from the closest pyproject.toml'
+        ' to each file',
+    )
+    parser.add_argument(
+        '--files-from',
+        type=str,
+        metavar='FILE',
+        help='Read more paths to format from a file, or from stdin if "-". Paths are separated by'
+        ' newlines or NUL characters',
+        default=argparse.SUPPRESS,
+    )
     parser.add_argument(
         '-t',
         '--target',
@@ -19,11 +122,33 @@ if __name__ == '__main__':
         help='File or directory of Python files to format. Only .py files will be included. (default: ./)',
         default=argparse.SUPPRESS,
     )
-    parser.add_argument(
+    add_boolean_argument(
+        parser,
         '-d',
         '--dry-run',
-        action=argparse.BooleanOptionalAction,
         help="Show planned changes but don't modify any files",
+    )
+    add_boolean_argument(
+        parser,
+        '--check',
+        help="Don't modify any files, but exit with status 1 if any of them would be changed",
+    )
+    parser.add_argument(
+        '--diff',
+        nargs='?',
+        const='full',
+        choices=['full', 'summary'],
+        help="Don't modify any files, but print a unified diff of each file that would change."
+        ' With "summary", only list the files and how many strings in each would change',
+        default=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '--edits-json',
+        action='store_const',
+        const='edits',
+        dest='diff',
+        help="Don't modify any files, but print the edits that would be made to each file as JSON"
+        ' lines. With --stdin-filename, a list of edits is printed instead of the formatted code',
         default=argparse.SUPPRESS,
     )
     parser.add_argument(
@@ -46,11 +171,10 @@ if __name__ == '__main__':
         help='Python version to target for compatibility',
         default=argparse.SUPPRESS,
     )
-    parser.add_argument(
+    add_boolean_argument(
+        parser,
         '--prefer-least-escapes',
-        action=argparse.BooleanOptionalAction,
         help='Try to produce strings with the least number of escapes, even if that means deviating from the quote style',
-        default=argparse.SUPPRESS,
     )
     parser.add_argument(
         '--quote-style',
@@ -58,6 +182,112 @@ if __name__ == '__main__':
         choices=['single', 'double'],
         default=argparse.SUPPRESS
     )
+    parser.add_argument(
+        '--engine',
+        help='Engine used to rewrite strings. The tokenize engine avoids parsing the full syntax'
+        ' tree and falls back to libcst (default) for any code it cannot handle',
+        choices=['libcst', 'tokenize'],
+        default=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '--chunk-lines',
+        type=int,
+        metavar='N',
+        help='Split files longer than N lines into chunks at top-level statements and format'
+        ' them separately, which lowers peak memory for very large files',
+        default=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '--max-file-size',
+        type=int,
+        metavar='BYTES',
+        help='Skip files larger than this, leaving them unchanged',
+        default=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        metavar='SECONDS',
+        help='Skip files that take longer than this to format, leaving them unchanged.'
+        ' Only supported on platforms with SIGALRM',
+        default=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '--max-fstring-depth',
+        type=int,
+        metavar='N',
+        help='Skip files with f-strings nested more than N levels deep, leaving them unchanged',
+        default=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '--line-ranges',
+        type=parse_line_range,
+        action='append',
+        metavar='START-END',
+        help='Only format strings that overlap these lines (eg: 10-20). Can be given more than'
+        ' once. Only supported when formatting a single file',
+        default=argparse.SUPPRESS,
+    )
+    add_boolean_argument(
+        parser,
+        '--cache',
+        help='Skip files that are already formatted, based on a hash of their contents',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        help='Directory to store the cache in (default: the user cache directory, eg:'
+        ' ~/.cache/string-fixer)',
+        default=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        help='Number of worker processes to format files with (default: CPU count, or 1 when'
+        ' formatting fewer than 32 files)',
+        default=None,
+    )
+    parser.add_argument(
+        '--stdin-filename',
+        type=str,
+        help='Read source code from stdin and write the result to stdout. The path is only used'
+        ' to find the config and check whether the file is ignored',
+        default=argparse.SUPPRESS,
+    )
+    git_mode = parser.add_mutually_exclusive_group()
+    git_mode.add_argument(
+        '--changed-since',
+        type=str,
+        metavar='REF',
+        help='Only format files that differ from this git ref, plus untracked files',
+        default=argparse.SUPPRESS,
+    )
+    git_mode.add_argument(
+        '--staged',
+        action='store_true',
+        help='Only format files with staged changes. The staged content is formatted and the'
+        ' result written back to the git index (and the working copy, if it has no unstaged'
+        ' changes)',
+        default=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '--profile',
+        type=int,
+        nargs='?',
+        const=10,
+        metavar='N',
+        help='Time each stage of the run and print the totals, along with the N slowest files'
+        ' (default: 10)',
+        default=None,
+    )
+    parser.add_argument(
+        '--profile-json',
+        type=Path,
+        metavar='PATH',
+        help='Time each stage of the run and write the results to a JSON file',
+        default=None,
+    )
     parser.add_argument(
         '--version',
         action='store_true',
@@ -70,43 +300,170 @@ if __name__ == '__main__':
         print(__version__)
         sys.exit(0)
 
-    config = merge_with_cli_args(load_config_from_dir(Path('./')), args)
-
-    target = Path(config['target'])
-    if 'config_root' in args and args.config_root:
-        config_root = Path(args.config_root).absolute()
-        assert config_root.exists(), 'config root must exist'
-        assert (
-            config_root in target.parents
-        ), 'config root must be a parent of the target'
-    else:
-        config_root = target
-
-    assert target.exists(), 'target must exist'
-
-    if target.is_file():
-        process_file(
-            target,
-            (
-                config
-                if 'config_root' not in args
-                else merge_with_cli_args(
-                    load_config_from_dir(target, limit=config_root), args
+    if 'stdin_filename' in args:
+        file = Path(args.stdin_filename).absolute()
+        if 'config_root' in args and args.config_root:
+            config_root = Path(args.config_root).absolute()
+        else:
+            config_root = Path.cwd()
+        limit = config_root if config_root in file.parents else None
+        config = merge_with_cli_args(load_config_from_dir(file.parent, limit), args)
+        # stdout is reserved for the output, and newlines are passed through untouched
+        sys.stdin.reconfigure(encoding='utf-8', newline='')  # type: ignore
+        sys.stdout.reconfigure(encoding='utf-8', newline='')  # type: ignore
+        code = original = sys.stdin.read()
+        changed = False
+        ignore = with_gitignores(config['ignore'], file.parent, limit)
+        if not file_is_ignored(file, ignore, config['include']):
+            try:
+                if config['check'] and not config['diff']:
+                    changed = check_code(code, config)
+                else:
+                    code = format_code(code, config)
+                    changed = config['check'] and code != original
+            except LimitExceeded as e:
+                # the code is echoed back unchanged, like an ignored file
+                print(f'Skipped {file}: {e}', file=sys.stderr)
+            except Exception as e:
+                print(
+                    f'Failed to process {file}: {type(e).__name__}: {e}',
+                    file=sys.stderr,
                 )
-            ),
-        )
-    else:
-        for root, _, files in os.walk(target):
-            root = Path(root)
-            config = merge_with_cli_args(
-                load_config_from_dir(root, limit=config_root), args
+                sys.exit(1)
+        if config['diff'] == 'edits':
+            sys.stdout.write(json.dumps(string_edits(original, code)))
+        elif config['diff']:
+            print_diff(file, original, code, config['diff'])
+        elif not config['check']:
+            sys.stdout.write(code)
+        sys.exit(1 if changed else 0)
+
+    profiler = Profiler() if args.profile is not None or args.profile_json else None
+    with activate(profiler), stage('config'):
+        # CLI args are only parsed once, then applied to every config found during the walk
+        overrides = parse_cli_args(args)
+        config = merge_configs(load_config_from_dir(Path('./')), overrides)
+
+    # an empty file list means there's nothing to do, rather than falling back to the target
+    explicit = bool(args.paths) or 'files_from' in args
+    if explicit:
+        if 'target' in args or 'changed_since' in args or 'staged' in args:
+            parser.error(
+                'paths cannot be combined with --target, --changed-since or --staged'
             )
-            if file_is_ignored(root, config['ignore'], config['include']):
-                continue
+        paths = [Path(path) for path in args.paths]
+        if 'files_from' in args:
+            paths.extend(read_file_list(args.files_from))
+        if 'config_root' in args and args.config_root:
+            config_root = Path(args.config_root).absolute()
+            assert config_root.exists(), 'config root must exist'
+        else:
+            config_root = Path.cwd()
+    else:
+        target = Path(config['target'])
+        if 'config_root' in args and args.config_root:
+            config_root = Path(args.config_root).absolute()
+            assert config_root.exists(), 'config root must exist'
+            assert (
+                config_root in target.parents
+            ), 'config root must be a parent of the target'
+        else:
+            config_root = target
+
+        assert target.exists(), 'target must exist'
+
+    if 'line_ranges' in args:
+        # the same lines in different files have nothing to do with each other
+        if explicit:
+            files = paths
+        else:
+            files = [] if 'changed_since' in args or 'staged' in args else [target]
+        if len(files) != 1 or not files[0].is_file():
+            parser.error('--line-ranges can only be used when formatting a single file')
+
+    jobs: List[Job] = []
+    # the walk is profiled here, while each file is profiled within its own job
+    with activate(profiler):
+        if explicit:
+            resolver = ConfigResolver(overrides, config_root)
+            seen: Set[Path] = set()
+            walked: List[Path] = []
+            for path in paths:
+                path = Path(os.path.abspath(path))
+                if not path.exists():
+                    parser.error(f'path does not exist: {path}')
+                if path.is_dir():
+                    # anything inside a directory that's already been walked has been found already
+                    if any(d == path or d in path.parents for d in walked):
+                        continue
+                    walked.append(path)
+                    found = find_files(path, resolver, config_root)
+                else:
+                    with stage('config'):
+                        file_config = resolver.get(path.parent)
+                    # listed files are still checked against the ignore rules, the same as in a
+                    # walk, so that eg: `git ls-files | string-fixer --files-from -` can be used
+                    with stage('ignore'):
+                        limit = config_root if config_root in path.parents else None
+                        ignore = with_gitignores(file_config['ignore'], path.parent, limit)
+                        if file_is_ignored(path, ignore, file_config['include']):
+                            continue
+                    found = iter([(path, file_config, None)])
+                for job in found:
+                    if job[0] not in seen:
+                        seen.add(job[0])
+                        jobs.append(job)
+        elif 'changed_since' in args or 'staged' in args:
+            try:
+                with stage('walk'):
+                    if 'staged' in args:
+                        files = staged_files(target)
+                    else:
+                        files = changed_files(args.changed_since, target)
+            except GitError as e:
+                parser.error(str(e))
+            limit = config_root if config_root.is_dir() else config_root.parent
+            resolver = ConfigResolver(overrides, limit)
             for file in files:
-                file = root / file
                 if not file.suffix == '.py':
                     continue
-                if file_is_ignored(file, config['ignore'], config['include']):
-                    continue
-                process_file(file, config, base_dir=target)
+                with stage('config'):
+                    file_config = resolver.get(file.parent)
+                with stage('ignore'):
+                    ignore = with_gitignores(file_config['ignore'], file.parent, limit)
+                    if file_is_ignored(file, ignore, file_config['include']):
+                        continue
+                jobs.append((file, file_config, target if target.is_dir() else None))
+        elif target.is_file():
+            file_config = config
+            with stage('config'):
+                if 'config_root' in args:
+                    file_config = merge_configs(
+                        load_config_from_dir(target, limit=config_root), overrides
+                    )
+            jobs.append((target, file_config, None))
+        else:
+            resolver = ConfigResolver(overrides, config_root)
+            jobs.extend(find_files(target, resolver, config_root))
+
+    # everything from here on uses the top-level config, not the config of any one file
+    cache = Cache(config['cache_dir']) if config['cache'] else None
+    summary = process_files(
+        jobs,
+        args.jobs,
+        cache,
+        process_staged_file if 'staged' in args else process_file,
+        profiler,
+    )
+    if config['diff'] != 'edits':
+        # keep the output parseable, one JSON object per line
+        # nothing is written by a dry run or check, so changes are only ever potential
+        check = config['check'] or config['dry_run'] or bool(config['diff'])
+        print_summary(summary, check=check)
+    if profiler is not None:
+        if args.profile is not None:
+            print(profiler.report(args.profile))
+        if args.profile_json:
+            profiler.write_json(args.profile_json)
+    if summary['failed'] or (config['check'] and summary['changed']):
+        sys.exit(1)
@@ -0,0 +1,154 @@
+'''
+Batch API for tools that embed string-fixer and need to format lots of code in one go (eg: hooks
+and linters). Transformers are created once per process and reused for every source.
+'''
+
+import multiprocessing
+import time
+import traceback
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TypedDict, Union, cast
+
+from . import Formatter, _options, format_code
+from .chunks import split_code
+from .config import DEFAULT_CONFIG, Config
+from .runner import default_jobs
+
+# a path to read source code from, or the source code itself
+Source = Union[Path, str]
+
+
+class SourceResult(TypedDict):
+    # the file the code was read from. None if the source code was given directly
+    file: Optional[Path]
+    # the formatted code. None if formatting failed or if only checking
+    output: Optional[str]
+    changed: bool
+    # time taken to read and format the source
+    seconds: float
+    # error message, if formatting failed
+    error: Optional[str]
+
+
+DEFAULT_CHUNK_LINES = 5000
+
+# each worker process creates its own formatter when it starts
+_formatter: Optional[Formatter] = None
+
+
+def _init_worker(options: dict):
+    global _formatter
+    _formatter = Formatter(**options)
+
+
+def _format_source(formatter: Formatter, source: Source, check: bool) -> SourceResult:
+    start = time.perf_counter()
+    file = source if isinstance(source, Path) else None
+    output = error = None
+    changed = False
+    try:
+        if isinstance(source, Path):
+            with open(source) as f:
+                code = f.read()
+        else:
+            code = source
+        if check:
+            changed = formatter.would_change(code)
+        else:
+            output = formatter.format(code)
+            changed = output != code
+    except Exception as e:
+        error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+    return {
+        'file': file,
+        'output': output,
+        'changed': changed,
+        'seconds': time.perf_counter() - start,
+        'error': error,
+    }
+
+
+def _format_in_worker(task: tuple) -> SourceResult:
+    assert _formatter is not None
+    return _format_source(_formatter, *task)
+
+
+def format_sources(
+    sources: Iterable[Source],
+    config: Optional[Config] = None,
+    check: Optional[bool] = None,
+    n_jobs: Optional[int] = 1,
+    chunksize: int = 16,
+) -> Iterator[SourceResult]:
+    '''
+    Format many sources with the same config. Files are never written to, the formatted code is
+    returned instead.
+
+    Errors are reported in the results rather than raised, so one bad source doesn't stop the rest.
+
+    Args:
+        sources: source code, or paths of files to read the source code from
+        config: formatting options. Defaults to `DEFAULT_CONFIG`
+        check: only check whether each source would change, without generating the output.
+            Defaults to the config's `check` setting
+        n_jobs: number of worker processes to spread the sources across. If None, uses the CPU
+            count. If 1, sources are formatted in the current process
+        chunksize: how many sources to send to a worker at once
+
+    Returns:
+        an iterator of results, in the same order as `sources`
+    '''
+    if config is None:
+        config = cast(Config, DEFAULT_CONFIG)
+    options = _options(config)
+    if check is None:
+        check = config['check']
+
+    if n_jobs == 1:
+        formatter = Formatter(**options)
+        for source in sources:
+            yield _format_source(formatter, source, check)
+        return
+
+    with multiprocessing.Pool(
+        n_jobs or default_jobs(), initializer=_init_worker, initargs=(options,)
+    ) as pool:
+        yield from pool.imap(
+            _format_in_worker,
+            ((source, check) for source in sources),
+            chunksize=chunksize,
+        )
+
+
+def format_large_source(
+    code: str,
+    config: Optional[Config] = None,
+    chunk_lines: Optional[int] = None,
+    n_jobs: Optional[int] = None,
+) -> str:
+    '''
+    Format one very large piece of code by splitting it into chunks at top-level statements (see
+    `split_code`) and spreading them across worker processes. The output is identical to
+    formatting it in one go.
+
+    Args:
+        code: the code to format
+        config: formatting options. Defaults to `DEFAULT_CONFIG`
+        chunk_lines: minimum number of lines per chunk. Defaults to the config's `chunk_lines`
+            setting, or `DEFAULT_CHUNK_LINES` if that isn't set
+        n_jobs: number of worker processes to use. If None, uses the CPU count
+    '''
+    if config is None:
+        config = cast(Config, DEFAULT_CONFIG)
+    chunk_lines = chunk_lines or config.get('chunk_lines') or DEFAULT_CHUNK_LINES
+    chunks = split_code(code, chunk_lines)
+    if len(chunks) > 1:
+        # chunks are already small enough, so don't let the workers split them again
+        options = cast(Config, {**config, 'chunk_lines': None})
+        results = list(
+            format_sources(chunks, options, check=False, n_jobs=n_jobs, chunksize=1)
+        )
+        if all(result['output'] is not None for result in results):
+            return ''.join(cast(str, result['output']) for result in results)
+    # fall back to formatting the whole thing, so that any errors are the same
+    return format_code(code, config)
@@ -0,0 +1,98 @@
+import hashlib
+import os
+from pathlib import Path
+
+from ._version import __version__
+from .config import Config
+
+
+class Cache:
+    '''
+    On-disk record of file contents that are already formatted, so that they can be skipped on
+    subsequent runs.
+
+    Each entry is an empty file named after a hash of the file contents, the config options that
+    affect formatting and the tool version. Entries are only ever created or touched, never
+    modified, so multiple processes can safely share the same cache directory.
+    '''
+
+    def __init__(self, path: Path, max_entries: int = 50_000):
+        '''
+        Args:
+            path: the directory to store cache entries in
+            max_entries: maximum number of entries to keep. Least recently used entries are
+                evicted when `prune` is called and there are more than this
+        '''
+        self.path = path
+        self.max_entries = max_entries
+
+    def key(self, code: str, config: Config) -> str:
+        hasher = hashlib.sha256()
+        for part in (
+            __version__,
+            config['quote_style'],
+            config['target_version'],
+            config['prefer_least_escapes'],
+            config['engine'],
+        ):
+            hasher.update(f'{part}\0'.encode())
+        hasher.update(code.encode())
+        return hasher.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.path / key[:2] / key
+
+    def is_clean(self, key: str) -> bool:
+        entry = self._entry(key)
+        try:
+            # bump the mtime so that recently used entries survive eviction
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            # the cache is read-only (eg: restored in CI). The entry is still valid, it just
+            # won't be protected from eviction
+            return entry.exists()
+        return True
+
+    def mark_clean(self, key: str):
+        entry = self._entry(key)
+        try:
+            if not self.path.exists():
+                os.makedirs(self.path, exist_ok=True)
+                # stop the cache from being committed
+                (self.path / '.gitignore').write_text('*\n')
+            os.makedirs(entry.parent, exist_ok=True)
+            entry.touch()
+        except OSError:
+            # caching is best-effort. A read-only or full disk shouldn't prevent formatting
+            pass
+
+    def prune(self):
+        '''
+        Evict the least recently used entries once the cache is over `max_entries`. Entries are
+        only counted (not stat-ed) unless the cache is over the limit, and 10% are left free when
+        evicting so that the next few runs don't have to evict again
+        '''
+        try:
+            shards = [shard for shard in os.scandir(self.path) if shard.is_dir()]
+            names = [(shard.path, os.listdir(shard.path)) for shard in shards]
+        except OSError:
+            return
+        if sum(len(entries) for _, entries in names) <= self.max_entries:
+            return
+        entries = []
+        for shard, shard_entries in names:
+            for name in shard_entries:
+                entry = Path(shard, name)
+                try:
+                    entries.append((entry.stat().st_mtime, entry))
+                except OSError:
+                    pass
+        entries.sort()
+        keep = self.max_entries - self.max_entries // 10
+        for _, entry in entries[: len(entries) - keep]:
+            try:
+                entry.unlink()
+            except OSError:
+                pass
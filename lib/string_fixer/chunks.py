@@ -0,0 +1,103 @@
+import io
+import tokenize
+from typing import Iterator, List, Sequence, Tuple
+
+# statements that continue the previous one, so code can't be split right before them
+_CONTINUATIONS = {'else', 'elif', 'except', 'finally'}
+
+
+def _statement_lines(code: str) -> Iterator[int]:
+    '''
+    Find the lines that top-level statements start on, where code could be split without changing
+    how it parses. A statement directly after a decorator, or which continues the previous
+    statement (eg: `else`), isn't a valid place to split.
+
+    Yields:
+        line numbers, starting from 1
+    '''
+    depth = 0
+    line_start = True
+    previous = None
+    for token in tokenize.generate_tokens(io.StringIO(code).readline):
+        if token.type == tokenize.INDENT:
+            depth += 1
+        elif token.type == tokenize.DEDENT:
+            depth -= 1
+        elif token.type == tokenize.NEWLINE:
+            line_start = True
+        elif token.type in (tokenize.NL, tokenize.COMMENT, tokenize.ENDMARKER):
+            continue
+        elif line_start:
+            line_start = False
+            if depth != 0:
+                continue
+            if (
+                previous is not None
+                and previous != '@'
+                and token.string not in _CONTINUATIONS
+            ):
+                yield token.start[0]
+            previous = token.string
+
+
+def split_code(code: str, chunk_lines: int) -> List[str]:
+    '''
+    Split code into chunks of at least `chunk_lines` lines, at top-level statement boundaries.
+    Each chunk can be parsed on its own, and joining them together gives the original code.
+
+    Code that can't be tokenized is never split.
+    '''
+    # split lines the same way that tokenize does, so that the line numbers match up
+    lines = io.StringIO(code).readlines()
+    if len(lines) <= chunk_lines:
+        return [code]
+
+    chunks: List[str] = []
+    start = 0
+    try:
+        for line in _statement_lines(code):
+            if line - 1 - start >= chunk_lines:
+                chunks.append(''.join(lines[start : line - 1]))
+                start = line - 1
+    except (tokenize.TokenError, SyntaxError):
+        return [code]
+    chunks.append(''.join(lines[start:]))
+    return chunks
+
+
+def select_lines(
+    code: str, line_ranges: Sequence[Tuple[int, int]]
+) -> List[Tuple[int, str, bool]]:
+    '''
+    Split code at top-level statement boundaries into sections that either do or don't overlap
+    any of the given line ranges. Like `split_code`, each section can be parsed on its own and
+    joining them together gives the original code.
+
+    Code that can't be tokenized is returned as a single selected section.
+
+    Args:
+        code: the code to split
+        line_ranges: inclusive `(start, end)` line ranges, with lines starting from 1
+
+    Returns:
+        list of tuples of the first line of each section, the section itself and whether it
+        overlaps any of the ranges
+    '''
+    lines = io.StringIO(code).readlines()
+    try:
+        boundaries = [1, *_statement_lines(code), len(lines) + 1]
+    except (tokenize.TokenError, SyntaxError):
+        return [(1, code, True)]
+
+    # merge neighbouring statements that are both selected, or both not
+    spans: List[Tuple[int, int, bool]] = []
+    for start, end in zip(boundaries, boundaries[1:]):
+        selected = any(a < end and b >= start for a, b in line_ranges)
+        if spans and spans[-1][2] == selected:
+            spans[-1] = (spans[-1][0], end, selected)
+        else:
+            spans.append((start, end, selected))
+    return [
+        (start, ''.join(lines[start - 1 : end - 1]), selected)
+        for start, end, selected in spans
+    ]
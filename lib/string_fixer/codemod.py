@@ -0,0 +1,104 @@
+'''
+`QuoteTransformer` as a libcst codemod, so it can run alongside other codemods without parsing and
+generating the code again. Run it with libcst's own tool:
+
+    python -m libcst.tool codemod --no-format -x string_fixer.codemod.FixQuotesCommand src/
+
+`--no-format` stops libcst from running black over the output afterwards, which would undo it.
+'''
+
+import argparse
+from pathlib import Path
+from typing import Literal, Optional
+
+import libcst as cst
+from libcst.codemod import CodemodContext, SkipFile, VisitorBasedCodemodCommand
+
+from .config import Config, load_config_from_dir
+from .limits import LimitExceeded
+from .quotes import QuoteStyle
+from .transformer import QuoteTransformer
+
+
+class FixQuotesCommand(QuoteTransformer, VisitorBasedCodemodCommand):
+    DESCRIPTION = 'Replace "double quotes" with \'single quotes\' in Python files'
+
+    def __init__(
+        self,
+        context: CodemodContext,
+        target_version: Optional[str] = None,
+        prefer_least_escapes: Optional[bool] = None,
+        quote_style: Optional[Literal['single', 'double']] = None,
+        max_fstring_depth: Optional[int] = None,
+    ):
+        '''
+        Options that aren't given are taken from the closest `pyproject.toml` to the working
+        directory, the same as the CLI. See `QuoteStyle` for what they do
+        '''
+        VisitorBasedCodemodCommand.__init__(self, context)
+        config = load_config_from_dir(Path.cwd())
+        QuoteStyle.__init__(
+            self,
+            target_python=target_version or config['target_version'],
+            prefer_least_escapes=(
+                config['prefer_least_escapes']
+                if prefer_least_escapes is None
+                else prefer_least_escapes
+            ),
+            quote_style=quote_style or config['quote_style'] or 'single',
+            max_fstring_depth=max_fstring_depth or config.get('max_fstring_depth'),
+        )
+
+    @classmethod
+    def from_config(cls, context: CodemodContext, config: Config) -> 'FixQuotesCommand':
+        '''Create the command with the formatting options from a config'''
+        return cls(
+            context,
+            target_version=config['target_version'],
+            prefer_least_escapes=config['prefer_least_escapes'],
+            quote_style=config['quote_style'],
+            max_fstring_depth=config.get('max_fstring_depth'),
+        )
+
+    def transform_module_impl(self, tree: cst.Module) -> cst.Module:
+        try:
+            return super().transform_module_impl(tree)
+        except LimitExceeded as e:
+            raise SkipFile(str(e))
+
+    @staticmethod
+    def add_args(arg_parser: argparse.ArgumentParser):
+        arg_parser.add_argument(
+            '--target-version',
+            type=str,
+            help='Python version to target for compatibility',
+            default=None,
+        )
+        arg_parser.add_argument(
+            '--prefer-least-escapes',
+            action='store_const',
+            const=True,
+            help='Try to produce strings with the least number of escapes, even if that means'
+            ' deviating from the quote style',
+            default=None,
+        )
+        arg_parser.add_argument(
+            '--no-prefer-least-escapes',
+            action='store_const',
+            const=False,
+            dest='prefer_least_escapes',
+            default=None,
+        )
+        arg_parser.add_argument(
+            '--quote-style',
+            help='Change the preferred quote style between single and double quotes',
+            choices=['single', 'double'],
+            default=None,
+        )
+        arg_parser.add_argument(
+            '--max-fstring-depth',
+            type=int,
+            metavar='N',
+            help='Skip files with f-strings nested more than N levels deep',
+            default=None,
+        )
@@ -1,42 +1,63 @@
 import argparse
-import glob as _glob
 import os
 import sys
 from copy import deepcopy
 from functools import lru_cache
 from pathlib import Path
-from typing import List, Literal, Optional, TypedDict, Union, cast
+from typing import Dict, List, Literal, Optional, Tuple, TypedDict, Union, cast
 
 import tomli
 
-
-def glob(pattern: str, root_dir: Path):
-    return (
-        root_dir / Path(i)
-        for i in _glob.glob(pattern, root_dir=root_dir, recursive=True)
-    )
+from .ignore import Rule, compile_rules
 
 
 class Config(TypedDict):
     target: Path
     dry_run: bool
+    check: bool
+    diff: Optional[Literal['full', 'summary', 'edits']]
     output: Optional[Path]
-    ignore: Optional[List[Path]]
-    include: Optional[List[Path]]
+    ignore: Optional[List[Rule]]
+    include: Optional[List[Rule]]
     extends: Optional[Path]
     target_version: Optional[str]
     prefer_least_escapes: bool
     quote_style: Optional[Literal['single', 'double']]
+    cache: bool
+    cache_dir: Path
+    engine: Literal['libcst', 'tokenize']
+    chunk_lines: Optional[int]
+    max_file_size: Optional[int]
+    timeout: Optional[float]
+    max_fstring_depth: Optional[int]
+    # only format strings within these inclusive line ranges (starting from 1). CLI only
+    line_ranges: Optional[List[Tuple[int, int]]]
 
 
 class UnparsedConfig(Config, TypedDict):
-    ignore: Optional[Union[List[Path], List[str]]]
-    include: Optional[Union[List[Path], List[str]]]
+    ignore: Optional[List[Union[str, Rule]]]
+    include: Optional[List[Union[str, Rule]]]
+
+
+def user_cache_dir() -> Path:
+    '''
+    Get the per-user cache directory for string-fixer, so that formatting a project doesn't leave a
+    cache directory behind inside it
+    '''
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local'
+    elif sys.platform == 'darwin':
+        base = Path.home() / 'Library' / 'Caches'
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'string-fixer'
 
 
 DEFAULT_CONFIG: UnparsedConfig = {
     'target': Path('./'),
     'dry_run': False,
+    'check': False,
+    'diff': None,
     'output': None,
     'ignore': [
         './**/.*',
@@ -51,7 +72,15 @@ DEFAULT_CONFIG: UnparsedConfig = {
     'extends': None,
     'target_version': f'{sys.version_info.major}.{sys.version_info.minor}',
     'prefer_least_escapes': True,
-    'quote_style': 'single'
+    'quote_style': 'single',
+    'cache': True,
+    'cache_dir': user_cache_dir(),
+    'engine': 'libcst',
+    'chunk_lines': None,
+    'max_file_size': None,
+    'timeout': None,
+    'max_fstring_depth': None,
+    'line_ranges': None,
 }
 
 
@@ -75,44 +104,17 @@ def parse_config(config: UnparsedConfig, file: Path, set_defaults=True) -> Confi
     if output := config.get('output'):
         config['output'] = (file.parent / output).resolve()
 
+    if cache_dir := config.get('cache_dir'):
+        config['cache_dir'] = (file.parent / cache_dir).resolve()
+
+    # patterns are compiled here but only matched against paths lazily, during the walk
     if 'ignore' in config and config['ignore']:
-        ignore = set()
-
-        # populate using config
-        for pattern in config['ignore'] + (DEFAULT_CONFIG['ignore'] or []):
-            if isinstance(pattern, Path):
-                ignore.add(pattern)
-            else:
-                # use glob module rather than pathlib glob because syntax is much more lenient
-                ignore.update(glob(pattern, file.parent))
-
-        # populate from local .gitignore
-        if (git_ignore := (file.parent / '.gitignore')).exists():
-            with open(git_ignore) as f:
-                for line in f.readlines():
-                    line = line.strip()
-                    if line.startswith('#') or not line:
-                        continue
-                    try:
-                        ignore.update(glob(line, file.parent))
-                    except ValueError as e:
-                        raise ValueError(
-                            f'error when parsing glob from gitignore: {line!r}'
-                            f', file: {git_ignore.absolute().relative_to(os.getcwd())}'
-                        ) from e
-
-        config['ignore'] = list(
-            {i for i in ignore if all(p not in ignore for p in i.parents)}
+        config['ignore'] = compile_rules(
+            config['ignore'] + (DEFAULT_CONFIG['ignore'] or []), file.parent
         )
 
     if 'include' in config and config['include']:
-        include = []
-        for pattern in config['include']:
-            if isinstance(pattern, Path):
-                include.append(pattern)
-            else:
-                include.extend(glob(pattern, file.parent))
-        config['include'] = include
+        config['include'] = compile_rules(config['include'], file.parent)
 
     if target_version := config.get('target_version', None):
         if not isinstance(target_version, str):
@@ -156,22 +158,75 @@ def load_config_from_dir(path: Path, limit: Optional[Path] = None) -> Config:
     return parse_config(DEFAULT_CONFIG, file)
 
 
-def merge_with_cli_args(config: Config, args: argparse.Namespace) -> Config:
+def parse_cli_args(args: argparse.Namespace) -> Config:
+    '''Parse CLI args into a partial config, for use with `merge_configs`'''
     # parse args relative to cwd so that any paths get fully expanded
-    cli_config = parse_config(
+    return parse_config(
         cast(UnparsedConfig, vars(args)), Path.cwd() / 'pyproject.toml', set_defaults=False
     )
-    for key, value in cli_config.items():
+
+
+def merge_configs(config: Config, overrides: Config) -> Config:
+    '''
+    Apply overrides (eg: from CLI args) on top of a config. Neither config is modified
+
+    Returns:
+        a new config
+    '''
+    merged = cast(Config, {**config})
+    for key, value in overrides.items():
         if key not in DEFAULT_CONFIG:
             continue
 
         if key == 'include' or key == 'ignore':
             if not value:
                 continue
-            if not config[key]:
-                config[key] = []
-            config[key].extend(value)  # type: ignore
-        elif value:
-            config[key] = value
+            merged[key] = [*(config[key] or []), *value]  # type: ignore
+        elif value is not None:
+            merged[key] = value  # type: ignore
+
+    return merged
+
+
+def merge_with_cli_args(config: Config, args: argparse.Namespace) -> Config:
+    return merge_configs(config, parse_cli_args(args))
 
-    return config
+
+class ConfigResolver:
+    '''
+    Resolves the config for each directory visited while walking a tree, merged with any overrides.
+
+    Each config file is only loaded and merged once, and directories without a config file of
+    their own share their parent's config. Returned configs are shared, so must not be modified.
+    '''
+
+    def __init__(self, overrides: Optional[Config] = None, limit: Optional[Path] = None):
+        '''
+        Args:
+            overrides: config to apply on top of every config file (see `parse_cli_args`)
+            limit: don't look for config files higher than this dir
+        '''
+        self.overrides = overrides
+        self.limit = limit
+        self._dirs: Dict[Path, Config] = {}
+
+    def get(self, path: Path) -> Config:
+        '''
+        Get the config for a file or directory. See `load_config_from_dir`
+        '''
+        if (config := self._dirs.get(path)) is not None:
+            return config
+        if path.is_file():
+            return self.get(path.parent)
+
+        file = path / 'pyproject.toml'
+        loaded = load_config_from_file(file)
+        if loaded is None and self.limit and path not in (self.limit, path.parent):
+            config = self.get(path.parent)
+        else:
+            if loaded is None:
+                loaded = parse_config(DEFAULT_CONFIG, file)
+            config = merge_configs(loaded, self.overrides) if self.overrides else loaded
+
+        self._dirs[path] = config
+        return config
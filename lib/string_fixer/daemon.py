@@ -0,0 +1,207 @@
+'''
+Long-lived formatting server, so that editors don't have to pay for interpreter startup, importing
+libcst and loading configs every time a file is formatted.
+
+Requests and responses are newline-delimited JSON objects, exchanged over stdin/stdout or a Unix
+socket. A `{"ready": true, "version": ...}` message is sent when the server starts. Requests take
+the form:
+
+    {"id": 1, "source": "x = \\"abc\\"\\n", "root": "/project", "path": "/project/file.py"}
+
+`root` is the directory to load the config from (defaults to the daemon's working directory) and
+`path` is the (optional) file that the source belongs to. If `path` is inside `root`, the closest
+config to `path` is used instead. If `path` is ignored, the source is returned unchanged.
+Responses echo the request ID:
+
+    {"id": 1, "source": "x = 'abc'\\n", "changed": true}
+    {"id": 1, "error": "..."}
+
+If the request has `"edits": true`, the response contains the edits needed to format the source
+(see `string_fixer.diff.string_edits`) rather than the formatted source:
+
+    {"id": 1, "edits": [{"start": {"line": 0, "column": 4}, "end": ..., "text": "'abc'"}], ...}
+
+Requests can also have `"line_ranges": [[start, end], ...]`, to only format strings within those
+inclusive line ranges (starting from 1), as with the `--line-ranges` CLI arg.
+'''
+
+import argparse
+import importlib
+import io
+import json
+import os
+import socketserver
+import sys
+from pathlib import Path
+from typing import IO, Dict, Optional, Tuple, cast
+
+from . import format_code
+from ._version import __version__
+from .config import Config, load_config_from_dir
+from .diff import string_edits
+from .ignore import file_is_ignored, load_gitignores, with_gitignores
+
+Stamp = Tuple[Optional[float], ...]
+
+
+def _mtime(file: Path) -> Optional[float]:
+    try:
+        return file.stat().st_mtime
+    except OSError:
+        return None
+
+
+class ConfigCache:
+    '''
+    Caches configs per directory, reloading them whenever any of the `pyproject.toml` or
+    `.gitignore` files they could have been loaded from are modified
+    '''
+
+    def __init__(self):
+        self._configs: Dict[
+            Tuple[Path, Optional[Path], Optional[Path]], Tuple[Config, Stamp]
+        ] = {}
+
+    @staticmethod
+    def _stamp(
+        path: Path, limit: Optional[Path], ignore_dir: Optional[Path], config: Config
+    ) -> Stamp:
+        dirs = [path]
+        while limit and path != limit:
+            path = path.parent
+            dirs.append(path)
+        if ignore_dir is not None:
+            dirs.append(ignore_dir)
+        if extends := config.get('extends'):
+            dirs.append(extends.parent if extends.is_file() else extends)
+        return tuple(
+            _mtime(folder / name)
+            for folder in dirs
+            for name in ('pyproject.toml', '.gitignore')
+        )
+
+    def get(
+        self, path: Path, limit: Optional[Path] = None, ignore_dir: Optional[Path] = None
+    ) -> Config:
+        '''
+        Get the config for a directory. See `load_config_from_dir`
+
+        Args:
+            path: the directory to load the config from
+            limit: don't look for config files higher than this dir
+            ignore_dir: another directory whose `.gitignore` file is used along with the config,
+                if it isn't between `path` and `limit`
+        '''
+        key = (path, limit, ignore_dir)
+        if cached := self._configs.get(key):
+            config, stamp = cached
+            if stamp == self._stamp(path, limit, ignore_dir, config):
+                return config
+            # configs can extend each other, so anything else cached could be stale too
+            load_config_from_dir.cache_clear()
+            load_gitignores.cache_clear()
+            self._configs.clear()
+
+        config = load_config_from_dir(path, limit)
+        self._configs[key] = (config, self._stamp(path, limit, ignore_dir, config))
+        return config
+
+
+class Daemon:
+    def __init__(self):
+        self.configs = ConfigCache()
+
+    def format(self, request: dict) -> dict:
+        root = Path(request.get('root') or os.getcwd()).absolute()
+        config_dir, limit, ignore_dir = root, None, None
+        if path := request.get('path'):
+            path = Path(path).absolute()
+            if root in path.parents:
+                config_dir, limit = path.parent, root
+            else:
+                ignore_dir = path.parent
+
+        config = self.configs.get(config_dir, limit, ignore_dir)
+        source = request['source']
+        if path:
+            # ignored files are passed back unchanged, the same as with `--stdin-filename`
+            ignore = with_gitignores(config['ignore'], path.parent, limit)
+            if file_is_ignored(path, ignore, config['include']):
+                if request.get('edits'):
+                    return {'edits': [], 'changed': False}
+                return {'source': source, 'changed': False}
+        if line_ranges := request.get('line_ranges'):
+            config = cast(
+                Config, {**config, 'line_ranges': [tuple(r) for r in line_ranges]}
+            )
+        output = format_code(source, config)
+        if request.get('edits'):
+            return {'edits': string_edits(source, output), 'changed': output != source}
+        return {'source': output, 'changed': output != source}
+
+    def handle(self, line: str) -> dict:
+        request: dict = {}
+        try:
+            request = json.loads(line)
+            response = self.format(request)
+        except Exception as e:
+            response = {'error': f'{type(e).__name__}: {e}'}
+        response['id'] = request.get('id') if isinstance(request, dict) else None
+        return response
+
+    def serve(self, rfile: IO[str], wfile: IO[str]):
+        '''Answer requests from `rfile` until it is closed'''
+        wfile.write(json.dumps({'ready': True, 'version': __version__}) + '\n')
+        wfile.flush()
+        for line in rfile:
+            if not line.strip():
+                continue
+            wfile.write(json.dumps(self.handle(line)) + '\n')
+            wfile.flush()
+
+
+def serve_socket(daemon: Daemon, path: str):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            daemon.serve(
+                io.TextIOWrapper(self.rfile, encoding='utf-8'),
+                io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True),
+            )
+
+    if os.path.exists(path):
+        os.unlink(path)
+    with socketserver.UnixStreamServer(path, Handler) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        'string-fixer-daemon',
+        description='Long-lived string-fixer server that answers formatting requests'
+        ' over stdin/stdout or a Unix socket',
+    )
+    parser.add_argument(
+        '--socket',
+        type=str,
+        help='Listen on this Unix socket rather than stdin/stdout',
+        default=None,
+    )
+    args = parser.parse_args()
+
+    # libcst is otherwise imported lazily, but the first request shouldn't have to wait for it
+    importlib.import_module('.transformer', __package__)
+    daemon = Daemon()
+    if args.socket:
+        serve_socket(daemon, args.socket)
+    else:
+        # don't let the platform's default encoding mangle any source code
+        sys.stdin.reconfigure(encoding='utf-8')  # type: ignore
+        sys.stdout.reconfigure(encoding='utf-8')  # type: ignore
+        daemon.serve(sys.stdin, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+'''
+Reporting planned changes to a file as a unified diff, a one line summary or a list of edits,
+rather than printing the whole formatted file.
+'''
+
+import difflib
+import io
+import json
+import tokenize
+from pathlib import Path
+from typing import List, Literal, Optional, Tuple, TypedDict
+
+from .prefilter import iter_string_spans, iter_strings
+
+DiffMode = Literal['full', 'summary', 'edits']
+
+
+class Position(TypedDict):
+    # starting from 0
+    line: int
+    # in characters (not bytes or UTF-16 code units), starting from 0
+    column: int
+
+
+class Edit(TypedDict):
+    start: Position
+    end: Position
+    # the text to replace the span with
+    text: str
+
+
+def _display_name(file: Path) -> str:
+    '''Path to show in diff headers. Relative to the cwd if possible, so that patches can be applied'''
+    try:
+        return file.absolute().relative_to(Path.cwd()).as_posix()
+    except ValueError:
+        return file.as_posix()
+
+
+def unified_diff(file: Path, before: str, after: str, context: int = 3) -> str:
+    '''
+    Create a git-style unified diff between two versions of a file. Returns an empty string if
+    they're the same
+    '''
+    name = _display_name(file)
+    output: List[str] = []
+    for line in difflib.unified_diff(
+        before.splitlines(keepends=True),
+        after.splitlines(keepends=True),
+        f'a/{name}',
+        f'b/{name}',
+        n=context,
+    ):
+        if line.endswith('\n'):
+            output.append(line)
+        else:
+            output.append(line + '\n\\ No newline at end of file\n')
+    return ''.join(output)
+
+
+def count_changed_strings(before: str, after: str) -> Optional[int]:
+    '''
+    Count how many string literals differ between two versions of some code. Formatting never adds
+    or removes strings, only rewrites them, so strings are compared pairwise.
+
+    Returns:
+        the number of changed strings, or None if the code can't be tokenized
+    '''
+    try:
+        return sum(a != b for a, b in zip(iter_strings(before), iter_strings(after)))
+    except (tokenize.TokenError, SyntaxError, ValueError):
+        return None
+
+
+def _position(line: int, column: int) -> Position:
+    return {'line': line, 'column': column}
+
+
+def _end_position(code: str) -> Position:
+    return _position(code.count('\n'), len(code) - code.rfind('\n') - 1)
+
+
+def apply_edits(code: str, edits: List[Edit]) -> str:
+    '''Apply a list of non-overlapping edits, sorted by position, to some code'''
+    offsets = [0]
+    for line in io.StringIO(code).readlines():
+        offsets.append(offsets[-1] + len(line))
+
+    def offset(position: Position) -> int:
+        return offsets[position['line']] + position['column']
+
+    output: List[str] = []
+    pos = 0
+    for edit in edits:
+        output.append(code[pos : offset(edit['start'])])
+        output.append(edit['text'])
+        pos = offset(edit['end'])
+    output.append(code[pos:])
+    return ''.join(output)
+
+
+def string_edits(before: str, after: str) -> List[Edit]:
+    '''
+    Get the edits that turn `before` into `after`, with one edit per string literal that changed.
+    Formatting never adds or removes strings, only rewrites them, so they're paired up by their
+    order in the token stream rather than by diffing the code.
+
+    If the strings can't be paired up (eg: the code can't be tokenized), a single edit replacing
+    the whole of `before` is returned instead.
+    '''
+    if before == after:
+        return []
+    try:
+        old: Optional[List[Tuple[Tuple[int, int], Tuple[int, int], str]]] = list(
+            iter_string_spans(before)
+        )
+        new = list(iter_strings(after))
+    except (tokenize.TokenError, SyntaxError, ValueError):
+        old = new = None
+    if old is not None and new is not None and len(old) == len(new):
+        edits: List[Edit] = [
+            {
+                'start': _position(start[0] - 1, start[1]),
+                'end': _position(end[0] - 1, end[1]),
+                'text': text,
+            }
+            for (start, end, string), text in zip(old, new)
+            if string != text
+        ]
+        # make sure that only the strings changed
+        if apply_edits(before, edits) == after:
+            return edits
+    return [{'start': _position(0, 0), 'end': _end_position(before), 'text': after}]
+
+
+def print_diff(file: Path, before: str, after: str, mode: DiffMode):
+    '''
+    Print the changes made to a file. Nothing is printed if the file is unchanged
+
+    Args:
+        file: the file that was formatted
+        before: the original code
+        after: the formatted code
+        mode: "full" prints a unified diff, "summary" prints the file and how many strings changed
+            and "edits" prints a JSON object with the file and its `string_edits`
+    '''
+    if before == after:
+        return
+    if mode == 'edits':
+        print(json.dumps({'file': str(file), 'edits': string_edits(before, after)}))
+    elif mode == 'summary':
+        count = count_changed_strings(before, after)
+        if count is None:
+            print(f'Would change: {file}')
+        else:
+            print(f'Would change: {file} ({count} string{"" if count == 1 else "s"})')
+    else:
+        print(unified_diff(file, before, after), end='')
@@ -0,0 +1,127 @@
+'''
+Helpers for only formatting the files touched by a change, as found by the local git repository
+'''
+
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+from . import ProcessResult, process_file
+from .cache import Cache
+from .config import Config
+from .limits import check_size
+from .profiling import stage
+
+# added, copied, modified, renamed or type-changed. Deleted files have nothing to format
+DIFF_FILTER = '--diff-filter=ACMRT'
+
+
+class GitError(Exception):
+    pass
+
+
+def _git(cwd: Path, *args: str, input: Optional[bytes] = None) -> bytes:
+    try:
+        result = subprocess.run(
+            ['git', *args], cwd=cwd, input=input, capture_output=True, check=True
+        )
+    except FileNotFoundError as e:
+        raise GitError('git executable not found') from e
+    except subprocess.CalledProcessError as e:
+        raise GitError(e.stderr.decode(errors='replace').strip()) from e
+    return result.stdout
+
+
+def repo_root(path: Path) -> Path:
+    '''Get the root of the git repository containing `path`'''
+    path = path.parent if path.is_file() else path
+    return Path(_git(path, 'rev-parse', '--show-toplevel').decode().strip())
+
+
+def _paths(root: Path, output: bytes) -> List[Path]:
+    return [root / name for name in output.decode().split('\0') if name]
+
+
+def changed_files(ref: str, target: Path) -> List[Path]:
+    '''
+    List files under `target` that differ from `ref` in the working tree, including untracked
+    files that aren't ignored by git
+    '''
+    root = repo_root(target)
+    pathspec = str(target.absolute())
+    changed = _git(root, 'diff', '--name-only', '-z', DIFF_FILTER, ref, '--', pathspec)
+    untracked = _git(
+        root,
+        'ls-files',
+        '-z',
+        '--others',
+        '--exclude-standard',
+        '--full-name',
+        '--',
+        pathspec,
+    )
+    return sorted(set(_paths(root, changed) + _paths(root, untracked)))
+
+
+def staged_files(target: Path) -> List[Path]:
+    '''List files under `target` with changes staged in the index'''
+    root = repo_root(target)
+    staged = _git(
+        root,
+        'diff',
+        '--cached',
+        '--name-only',
+        '-z',
+        DIFF_FILTER,
+        '--',
+        str(target.absolute()),
+    )
+    return sorted(_paths(root, staged))
+
+
+def process_staged_file(
+    file: Path,
+    config: Config,
+    base_dir: Optional[Path] = None,
+    cache: Optional[Cache] = None,
+) -> ProcessResult:
+    '''
+    Format the staged version of a file, rather than the working copy. Same as `process_file`,
+    except that changes are written back to the index. The working copy is only updated if it has
+    no unstaged changes, so that those are never overwritten.
+    '''
+    root = repo_root(file.parent)
+    name = file.relative_to(root).as_posix()
+    if (max_file_size := config.get('max_file_size')) is not None:
+        # check the size before reading the blob, so huge files are never loaded into memory
+        check_size(int(_git(root, 'cat-file', '-s', f':{name}')), max_file_size)
+    with stage('read'):
+        code = _git(root, 'cat-file', 'blob', f':{name}').decode('utf-8')
+    return process_file(
+        file,
+        config,
+        base_dir,
+        cache,
+        code=code,
+        update=lambda _, modified: _update_index(root, name, modified),
+    )
+
+
+def _update_index(root: Path, name: str, modified: str):
+    '''
+    Write new content for a file to the index, and to the working copy if it has no unstaged
+    changes
+    '''
+    unstaged = _git(root, 'diff', '--name-only', '--', name)
+    mode = _git(root, 'ls-files', '-s', '--', name).split()[0].decode()
+    sha = _git(
+        root,
+        'hash-object',
+        '-w',
+        '--stdin',
+        '--no-filters',
+        input=modified.encode('utf-8'),
+    )
+    _git(root, 'update-index', '--cacheinfo', f'{mode},{sha.decode().strip()},{name}')
+    if not unstaged:
+        _git(root, 'checkout-index', '-f', '--', name)
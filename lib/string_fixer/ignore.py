@@ -0,0 +1,338 @@
+'''
+Matching paths against ignore rules. Patterns follow `.gitignore` semantics and are compiled to
+regexes up front, then checked lazily against each path as the tree is walked, rather than being
+expanded into every matching path on disk.
+'''
+
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+
+class Pattern:
+    '''A gitignore-style pattern, matched against paths relative to the directory it belongs to'''
+
+    def __init__(self, pattern: str, base: Path, anchored: Optional[bool] = None):
+        '''
+        Args:
+            pattern: the pattern. A leading `!` negates it and a trailing `/` means it only
+                matches directories
+            base: the directory that the pattern is relative to
+            anchored: whether the pattern only matches paths directly relative to `base`. By
+                default, patterns are anchored if they contain a `/` anywhere but the end, and
+                otherwise match at any depth
+        '''
+        self.pattern = pattern
+        self.base = base.absolute()
+        self.negated = pattern.startswith('!')
+        if self.negated:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        if pattern.startswith('./'):
+            pattern = pattern[2:]
+        elif pattern == '.':
+            pattern = ''
+        if anchored is None:
+            anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        # the leading directories that the pattern spells out literally, which anything it matches
+        # must be inside. Unanchored patterns can match anywhere
+        self._literal: Optional[Path] = (
+            self.base.joinpath(*_literal_parts(pattern)) if anchored else None
+        )
+        regex = _translate(pattern)
+        try:
+            self._regex = re.compile(regex if anchored else f'(?:.*/)?{regex}')
+        except re.error as e:
+            raise ValueError(f'invalid pattern: {self.pattern!r}') from e
+        self._prefix = os.path.join(str(self.base), '')
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.pattern!r}, {str(self.base)!r})'
+
+    def match(self, path: Path, is_dir: Optional[bool] = None) -> bool:
+        '''
+        Check whether an absolute path matches this pattern, regardless of whether it's negated.
+        Parent directories are not checked.
+
+        Args:
+            path: the path to check
+            is_dir: whether the path is a directory. Only checked on disk if needed and not given
+        '''
+        name = str(path)
+        if name.startswith(self._prefix):
+            name = name[len(self._prefix) :]
+        elif name == str(self.base):
+            name = ''
+        else:
+            return False
+        if os.sep != '/':
+            name = name.replace(os.sep, '/')
+        if not self._regex.fullmatch(name):
+            return False
+        if self.dir_only:
+            return path.is_dir() if is_dir is None else is_dir
+        return True
+
+    def could_match_below(self, directory: Path) -> bool:
+        '''
+        Check whether this pattern could match anything inside a directory (an absolute path).
+        Only the literal start of the pattern is checked, so this can give false positives, but
+        never false negatives
+        '''
+        if self._literal is None:
+            return True
+        return (
+            directory == self._literal
+            or directory in self._literal.parents
+            or self._literal in directory.parents
+        )
+
+
+# a path to ignore, or a pattern matching paths to ignore
+Rule = Union[Path, Pattern]
+
+
+def _literal_parts(pattern: str) -> List[str]:
+    '''Get the path components at the start of a pattern that don't contain any wildcards'''
+    parts = []
+    for part in pattern.split('/'):
+        if any(char in part for char in '*?[\\'):
+            break
+        if part:
+            parts.append(part)
+    return parts
+
+
+def _translate(pattern: str) -> str:
+    '''Translate a gitignore-style glob into a regex, where `*` never matches a `/`'''
+    output: List[str] = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        i += 1
+        if char == '*':
+            start = i - 1
+            while i < n and pattern[i] == '*':
+                i += 1
+            # `**` is only special as a whole path component, where it matches any number of dirs
+            if (
+                i - start == 2
+                and (start == 0 or pattern[start - 1] == '/')
+                and (i == n or pattern[i] == '/')
+            ):
+                if i == n:
+                    output.append('.*')
+                else:
+                    output.append('(?:.*/)?')
+                    i += 1
+            else:
+                output.append('[^/]*')
+        elif char == '?':
+            output.append('[^/]')
+        elif char == '[':
+            end = i
+            if end < n and pattern[end] in '!^':
+                end += 1
+            if end < n and pattern[end] == ']':
+                end += 1
+            end = pattern.find(']', end)
+            if end == -1:
+                output.append(re.escape(char))
+                continue
+            body = pattern[i:end]
+            i = end + 1
+            negated = body[:1] in ('!', '^')
+            if negated:
+                body = body[1:]
+            body = re.sub(r'([\\\[&~|^])', r'\\\1', body)
+            output.append(f'[^/{body}]' if negated else f'(?!/)[{body}]')
+        elif char == '\\' and i < n:
+            output.append(re.escape(pattern[i]))
+            i += 1
+        else:
+            output.append(re.escape(char))
+    return ''.join(output)
+
+
+def compile_rules(rules: Iterable[Union[str, Rule]], base: Path) -> List[Rule]:
+    '''
+    Compile glob patterns from a config. Unlike those in `.gitignore` files, these are always
+    relative to `base`. Rules that are already compiled are passed through as-is.
+    '''
+    return [
+        Pattern(rule, base, anchored=True) if isinstance(rule, str) else rule
+        for rule in dict.fromkeys(rules)
+    ]
+
+
+def read_gitignore(file: Path) -> List[Pattern]:
+    patterns = []
+    with open(file) as f:
+        for line in f:
+            line = line.rstrip()
+            if line.startswith('#') or not line:
+                continue
+            try:
+                patterns.append(Pattern(line, file.parent))
+            except ValueError as e:
+                raise ValueError(
+                    f'error when parsing glob from gitignore: {line!r}, file: {file}'
+                ) from e
+    return patterns
+
+
+@lru_cache
+def load_gitignores(path: Path, limit: Optional[Path] = None) -> Tuple[Pattern, ...]:
+    '''
+    Loads the patterns from the `.gitignore` files in `path` and each of its parents, up to `limit`.
+
+    Args:
+        path: The dir to start from when loading `.gitignore` files
+        limit: Don't go higher than this dir
+
+    Returns:
+        The patterns, with those from outer directories first so that inner ones take precedence
+    '''
+    file = path / '.gitignore'
+    patterns = tuple(read_gitignore(file)) if file.is_file() else ()
+    if limit and path != limit and path.parent != path:
+        return load_gitignores(path.parent, limit) + patterns
+    return patterns
+
+
+def with_gitignores(
+    ignore: Optional[Sequence[Rule]], path: Path, limit: Optional[Path] = None
+) -> List[Rule]:
+    '''
+    Add the patterns from any `.gitignore` files that apply to the contents of `path` to the
+    ignore rules from a config. An empty `ignore` list disables `.gitignore` files as well.
+    '''
+    if not ignore:
+        return []
+    return [*ignore, *load_gitignores(path, limit)]
+
+
+def match(
+    rules: Sequence[Rule], path: Path, is_dir: Optional[bool] = None
+) -> Optional[bool]:
+    '''
+    Check a single path, but not its parents, against some rules. The last matching rule wins.
+
+    Returns:
+        True if the path matches, False if a negated pattern excludes it, None if nothing matches
+    '''
+    for rule in reversed(rules):
+        if isinstance(rule, Path):
+            if rule.absolute() == path:
+                return True
+        elif rule.match(path, is_dir):
+            return not rule.negated
+    return None
+
+
+def could_match_below(rules: Sequence[Rule], directory: Path) -> bool:
+    '''Check whether any of the (non-negated) rules could match something inside a directory'''
+    for rule in rules:
+        if isinstance(rule, Path):
+            if directory in rule.absolute().parents:
+                return True
+        elif not rule.negated and rule.could_match_below(directory):
+            return True
+    return False
+
+
+def _matches_lineage(rules: Sequence[Rule], file: Path) -> bool:
+    '''Check whether a path or any of its parents match some rules'''
+    # directories are checked outermost first, since nothing inside an ignored one can be re-included
+    for path in (*reversed(file.parents), file):
+        if match(rules, path, None if path is file else True):
+            return True
+    return False
+
+
+def file_is_ignored(
+    file: Path, ignore: Optional[Sequence[Rule]], include: Optional[Sequence[Rule]]
+) -> bool:
+    '''
+    Check whether a file is ignored. It is if it or any of its parents match `ignore`, unless it or
+    any of its parents match `include`.
+    '''
+    file = file.absolute()
+    if not ignore or not _matches_lineage(ignore, file):
+        return False
+    return not include or not _matches_lineage(include, file)
+
+
+def walk(
+    top: Path,
+    rules: Callable[[Path], Tuple[Optional[Sequence[Rule]], Optional[Sequence[Rule]]]],
+    suffix: Optional[str] = None,
+) -> Iterator[Tuple[Path, List[Path]]]:
+    '''
+    Walk a directory tree, skipping ignored files and not descending into ignored directories,
+    unless an include rule could match something inside them.
+
+    Args:
+        top: the directory to walk
+        rules: function returning the ignore and include rules for the contents of a directory
+        suffix: only yield files with this suffix
+
+    Yields:
+        each directory that isn't ignored, along with the files in it that aren't ignored
+    '''
+    top = top.absolute()
+    ignore, include = rules(top)
+    # directories that are explicitly included, along with everything inside them
+    included: Set[Path] = set()
+    # directories that are ignored, but still walked for anything inside them that is included
+    ignored: Set[Path] = set()
+    if file_is_ignored(top, ignore, include):
+        if not include or not could_match_below(include, top):
+            return
+        ignored.add(top)
+    elif include and _matches_lineage(include, top):
+        included.add(top)
+
+    for root, dirs, files in os.walk(top):
+        root = Path(root)
+        ignore, include = rules(root)
+        inside = root in included
+        inside_ignored = root in ignored
+
+        def keep(path: Path, is_dir: bool) -> bool:
+            if inside or (include and match(include, path, is_dir)):
+                if is_dir:
+                    included.add(path)
+                return True
+            if inside_ignored or (ignore and match(ignore, path, is_dir)):
+                if is_dir and include and could_match_below(include, path):
+                    ignored.add(path)
+                    return True
+                return False
+            return True
+
+        # prune ignored directories in place, so that os.walk never descends into them
+        dirs[:] = [name for name in dirs if keep(root / name, True)]
+        yield (
+            root,
+            [
+                root / name
+                for name in files
+                if (suffix is None or name.endswith(suffix))
+                and keep(root / name, False)
+            ],
+        )
@@ -0,0 +1,57 @@
+'''
+Guards against pathological inputs (eg: huge generated files or deeply nested f-strings), so that
+one bad file can't stall or exhaust the memory of a whole run.
+'''
+
+import signal
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+class LimitExceeded(Exception):
+    '''Raised when some code exceeds one of the configured resource limits'''
+
+
+def check_size(size: int, limit: Optional[int]):
+    '''Raise `LimitExceeded` if a file's size (in bytes) is over the limit'''
+    if limit is not None and size > limit:
+        raise LimitExceeded(f'file is larger than {limit} bytes')
+
+
+def code_size(code: str, limit: int) -> int:
+    '''
+    Get the size of some code in bytes, once encoded. Encoding is skipped when the length alone is
+    enough to compare it against `limit`, since each character is between 1 and 4 bytes
+    '''
+    if len(code) > limit or len(code) * 4 <= limit:
+        return len(code)
+    return len(code.encode('utf-8', 'surrogatepass'))
+
+
+@contextmanager
+def time_limit(seconds: Optional[float]) -> Iterator[None]:
+    '''
+    Raise `LimitExceeded` if the body takes longer than `seconds`.
+
+    This relies on `SIGALRM`, so it only has an effect in the main thread on platforms that support
+    it. Native code (eg: libcst's parser) can't be interrupted until it returns.
+    '''
+    if (
+        not seconds
+        or not hasattr(signal, 'setitimer')
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def handler(signum, frame):
+        raise LimitExceeded(f'took longer than {seconds}s')
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
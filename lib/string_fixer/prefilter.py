@@ -0,0 +1,153 @@
+import io
+import re
+import sys
+import tokenize
+from typing import Iterator, List, Tuple
+
+_STRING_RE = re.compile(r'^([a-zA-Z]*)(\'\'\'|"""|\'|")')
+
+if sys.version_info >= (3, 12):
+    FSTRING_START = tokenize.FSTRING_START
+    FSTRING_END = tokenize.FSTRING_END
+else:
+    # f-strings are tokenized as a single STRING token before 3.12
+    FSTRING_START = FSTRING_END = -1
+
+
+def _string_may_change(text: str, quote: str) -> bool:
+    '''
+    Check whether a single string literal could be modified by `QuoteTransformer`
+
+    Args:
+        text: the full source of the string, including prefix and quotes
+        quote: the preferred quote character
+    '''
+    match = _STRING_RE.match(text)
+    if match is None:
+        return True
+    prefix, delimiter = match.groups()
+
+    if 'f' not in prefix.lower():
+        # simple strings are left alone if they already use the preferred quote
+        return delimiter[0] != quote
+
+    # f-strings are rebuilt from scratch, so only rule out the simplest (and most common) case:
+    # single-line, preferred quotes, no quotes anywhere inside and at least one placeholder.
+    # Prefixes are also lowercased during the rebuild
+    if delimiter != quote or prefix != prefix.lower():
+        return True
+    body = text[len(prefix) + len(delimiter) : -len(delimiter)]
+    if '"' in body or "'" in body:
+        return True
+    # check for placeholders, making sure the braces are balanced while we're at it
+    depth = placeholders = i = 0
+    while i < len(body):
+        char = body[i]
+        if depth == 0 and body[i : i + 2] in ('{{', '}}'):
+            i += 2
+            continue
+        if char == '{':
+            depth += 1
+            placeholders += depth == 1
+        elif char == '}':
+            depth -= 1
+            if depth < 0:
+                return True
+        i += 1
+    return depth != 0 or placeholders == 0
+
+
+def _slice(lines: List[str], start: Tuple[int, int], end: Tuple[int, int]) -> str:
+    '''Get the source between two token positions'''
+    if start[0] == end[0]:
+        return lines[start[0] - 1][start[1] : end[1]]
+    return (
+        lines[start[0] - 1][start[1] :]
+        + ''.join(lines[start[0] : end[0] - 1])
+        + lines[end[0] - 1][: end[1]]
+    )
+
+
+def _end(start: Tuple[int, int], string: str) -> Tuple[int, int]:
+    '''
+    Get the end position of a token from its start and its source. `token.end` can't be trusted
+    for this, since some versions of Python (eg: 3.12.1) report the wrong end column for multiline
+    strings containing non-ASCII characters
+    '''
+    newlines = string.count('\n')
+    if not newlines:
+        return start[0], start[1] + len(string)
+    return start[0] + newlines, len(string) - string.rfind('\n') - 1
+
+
+def iter_string_spans(
+    code: str,
+) -> Iterator[Tuple[Tuple[int, int], Tuple[int, int], str]]:
+    '''
+    Find each string literal in some code, in order. F-strings are yielded as a whole, including
+    anything nested inside them.
+
+    Yields:
+        tuples of the start and end positions of the string (as `(line, column)`, with lines
+        starting from 1, the same as `tokenize`) and its source
+
+    Raises:
+        tokenize.TokenError, SyntaxError: if the code can't be tokenized
+        ValueError: if the code contains an error token, or the token positions don't match up
+            with the code
+    '''
+    # split lines the same way that tokenize does, so that the positions match up
+    lines = io.StringIO(code).readlines()
+    fstring_depth = 0
+    fstring_start = (0, 0)
+    fstring_prefix = ''
+    for token in tokenize.generate_tokens(io.StringIO(code).readline):
+        if token.type == FSTRING_START:
+            if fstring_depth == 0:
+                fstring_start, fstring_prefix = token.start, token.string
+            fstring_depth += 1
+        elif token.type == FSTRING_END:
+            fstring_depth -= 1
+            if fstring_depth == 0:
+                end = _end(token.start, token.string)
+                string = _slice(lines, fstring_start, end)
+                if not (
+                    string.startswith(fstring_prefix) and string.endswith(token.string)
+                ):
+                    raise ValueError(f'f-string at {fstring_start} is out of place')
+                yield fstring_start, end, string
+        elif fstring_depth:
+            # anything nested inside an f-string is part of the outermost one
+            continue
+        elif token.type == tokenize.STRING:
+            end = _end(token.start, token.string)
+            if _slice(lines, token.start, end) != token.string:
+                raise ValueError(f'string at {token.start} is out of place')
+            yield token.start, end, token.string
+        elif token.type == tokenize.ERRORTOKEN:
+            raise ValueError(f'error token at {token.start}: {token.string!r}')
+
+
+def iter_strings(code: str) -> Iterator[str]:
+    '''Yield the source of each string literal in some code. See `iter_string_spans`'''
+    for _, _, string in iter_string_spans(code):
+        yield string
+
+
+def may_change(code: str, quote_style: str = 'single') -> bool:
+    '''
+    Cheaply check whether `QuoteTransformer` could modify some code by scanning its tokens,
+    without having to parse it with libcst.
+
+    This errs on the side of caution, so a `True` result only means that the code might change.
+    Code that can't be tokenized is always reported as possibly changing.
+
+    Args:
+        code: the code to check
+        quote_style: the preferred quote style
+    '''
+    quote = "'" if quote_style == 'single' else '"'
+    try:
+        return any(_string_may_change(string, quote) for string in iter_strings(code))
+    except (tokenize.TokenError, SyntaxError, ValueError):
+        return True
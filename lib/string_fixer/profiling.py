@@ -0,0 +1,122 @@
+'''
+Lightweight instrumentation for finding out where the time goes during a run.
+
+Code is wrapped in `with stage('name'):` blocks. While no profiler is active these are a shared
+no-op context manager, so the overhead when profiling is disabled is negligible. Stage times are
+exclusive, meaning time spent in a nested stage isn't also counted towards the enclosing one.
+'''
+
+import json
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from time import perf_counter
+from typing import ContextManager, Dict, Iterator, List, Optional, TypedDict
+
+
+class FileProfile(TypedDict):
+    file: str
+    seconds: float
+    stages: Dict[str, float]
+
+
+class ProfileData(TypedDict):
+    stages: Dict[str, float]
+    files: List[FileProfile]
+
+
+class Profiler:
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.files: List[FileProfile] = []
+        # stack of (stage name, time it was last resumed)
+        self._stack: List[List] = []
+        self._file_stages: Optional[Dict[str, float]] = None
+
+    def _add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0) + seconds
+        if self._file_stages is not None:
+            self._file_stages[name] = self._file_stages.get(name, 0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        now = perf_counter()
+        if self._stack:
+            # pause the enclosing stage
+            parent = self._stack[-1]
+            self._add(parent[0], now - parent[1])
+        entry = [name, now]
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            now = perf_counter()
+            self._stack.pop()
+            self._add(name, now - entry[1])
+            if self._stack:
+                self._stack[-1][1] = now
+
+    @contextmanager
+    def file(self, file: Path) -> Iterator[None]:
+        '''Attribute any stages within this block to a file, as well as the overall totals'''
+        self._file_stages = stages = {}
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self._file_stages = None
+            self.files.append(
+                {'file': str(file), 'seconds': perf_counter() - start, 'stages': stages}
+            )
+
+    def merge(self, data: ProfileData):
+        '''Merge in data from another profiler (eg: from a worker process)'''
+        for name, seconds in data['stages'].items():
+            self.stages[name] = self.stages.get(name, 0) + seconds
+        self.files.extend(data['files'])
+
+    def data(self) -> ProfileData:
+        return {
+            'stages': dict(sorted(self.stages.items(), key=lambda i: -i[1])),
+            'files': sorted(self.files, key=lambda f: -f['seconds']),
+        }
+
+    def report(self, top: int = 10) -> str:
+        data = self.data()
+        total = sum(data['stages'].values()) or 1
+        lines = ['Stage totals:']
+        for name, seconds in data['stages'].items():
+            lines.append(f'  {name:<14}{seconds:>9.3f}s {seconds / total:>6.1%}')
+        lines.append(f'Slowest {min(top, len(data["files"]))} files:')
+        for file in data['files'][:top]:
+            stages = ', '.join(
+                f'{name} {seconds:.3f}s'
+                for name, seconds in sorted(file['stages'].items(), key=lambda i: -i[1])
+            )
+            lines.append(f'  {file["seconds"]:>9.3f}s  {file["file"]} ({stages})')
+        return '\n'.join(lines)
+
+    def write_json(self, path: Path):
+        with open(path, 'w') as f:
+            json.dump(self.data(), f, indent=2)
+
+
+_active: Optional[Profiler] = None
+_NULL_CONTEXT: ContextManager[None] = nullcontext()
+
+
+def stage(name: str) -> ContextManager[None]:
+    '''Time a block of code as part of the named stage, if a profiler is active'''
+    if _active is None:
+        return _NULL_CONTEXT
+    return _active.stage(name)
+
+
+@contextmanager
+def activate(profiler: Optional[Profiler]) -> Iterator[Optional[Profiler]]:
+    '''Make a profiler the active one for the duration of this block'''
+    global _active
+    previous, _active = _active, profiler
+    try:
+        yield profiler
+    finally:
+        _active = previous
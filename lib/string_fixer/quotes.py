@@ -0,0 +1,233 @@
+import re
+import sys
+from itertools import chain
+from typing import List, Literal, Optional, Tuple
+
+from .limits import LimitExceeded
+
+# a run of quotes and the backslashes directly preceding it
+QUOTE_RUN_RE = re.compile(r'(\\*)([\'"]+)')
+# a run of the same quote
+SAME_QUOTE_RE = re.compile(r'\'+|"+')
+
+
+def version_lt(a: str, b: str):
+    '''
+    Minimal version check for python versions
+
+    Returns:
+        a < b
+    '''
+    return int(a.replace('.', '')) < int(b.replace('.', ''))
+
+
+def string_prefix(value: str) -> str:
+    '''Get the (lowercased) prefix of a string literal, the same way libcst does'''
+    prefix = ''
+    for char in value:
+        if char in ('"', "'"):
+            break
+        prefix += char
+    return prefix.lower()
+
+
+def string_quote(value: str) -> str:
+    '''Get the quote used to denote a string literal, the same way libcst does'''
+    quote = ''
+    for char in value[len(string_prefix(value)) :]:
+        if char not in ('"', "'"):
+            break
+        if quote and char != quote[0]:
+            break
+        quote += char
+    if len(quote) == 2:
+        # empty string
+        quote = quote[:1]
+    elif 3 < len(quote) <= 6:
+        # eg: `""""foo"""` or `""""""`
+        quote = quote[:3]
+    return quote
+
+
+class QuoteStyle:
+    '''
+    Rules for re-quoting strings, independent of how the code is parsed. Shared between
+    `QuoteTransformer` and the tokenize engine so that both produce identical output
+    '''
+
+    def __init__(
+        self,
+        target_python: Optional[str] = None,
+        prefer_least_escapes=True,
+        quote_style: Literal['single', 'double'] = 'single',
+        max_fstring_depth: Optional[int] = None,
+    ):
+        '''
+        Args:
+            target_python: which version of python to target. Defaults to current version
+            max_fstring_depth: raise `LimitExceeded` for f-strings nested deeper than this
+        '''
+        self._target_python = (
+            target_python or f'{sys.version_info.major}.{sys.version_info.minor}'
+        )
+        # python 3.12 allowed quotes to be reused in nested f-strings (PEP 701)
+        self._reuse_quotes = not version_lt(self._target_python, '3.12')
+        self.prefer_least_escapes = prefer_least_escapes
+        self.quote_style = quote_style
+        self.max_fstring_depth = max_fstring_depth
+
+    def _check_fstring_depth(self, depth: int):
+        if self.max_fstring_depth is not None and depth > self.max_fstring_depth:
+            raise LimitExceeded(
+                f'f-strings are nested more than {self.max_fstring_depth} levels deep'
+            )
+
+    def _escape_quote_sub(self, match: re.Match) -> str:
+        '''
+        Handle quotes, check if they're escaped, escape them if not
+        '''
+        escapes, quote = match.groups()
+        if len(escapes) % 2 == 1:
+            # quote is escaped. Do nothing
+            return escapes + quote
+        # quote is not escaped. Escape it
+        return escapes + (('\\' + quote[0]) * len(quote))
+
+    def _scan_escapes(
+        self, text: str, quote: str, anti: str, quote_len: int
+    ) -> Tuple[str, int, str, int]:
+        '''
+        Re-render the body of a (non-raw) string literal for both the new and the old quote in a
+        single pass. All escaped quotes are unescaped, then any runs of at least `quote_len` of
+        the wrapping quote are escaped.
+
+        Args:
+            text: the body of the string literal
+            quote: the new quote character
+            anti: the old quote character
+            quote_len: length of the quotes wrapping the string
+
+        Returns:
+            tuple of the text for the new quote and the number of escapes it contains, followed
+            by the same for the old quote
+        '''
+        new: List[str] = []
+        old: List[str] = []
+        new_escapes = old_escapes = 0
+        pos = 0
+        # quote runs only separated by an escape will join together once it's removed
+        pending = ''
+        for match in chain(QUOTE_RUN_RE.finditer(text), (None,)):
+            if match is None:
+                chunk = text[pos:]
+            else:
+                escapes, run = match.groups()
+                # any quote preceded by an odd number of backslashes is escaped. Unescape it
+                chunk = text[pos : match.start()] + (
+                    escapes[:-1] if len(escapes) % 2 else escapes
+                )
+                pos = match.end()
+                if not chunk:
+                    pending += run
+                    continue
+
+            parts = (pending,) if len(pending) < 2 else SAME_QUOTE_RE.findall(pending)
+            for part in parts:
+                if len(part) < quote_len:
+                    new.append(part)
+                    old.append(part)
+                elif part[0] == quote:
+                    new.append(('\\' + quote) * len(part))
+                    old.append(part)
+                    new_escapes += len(part)
+                else:
+                    new.append(part)
+                    old.append(('\\' + anti) * len(part))
+                    old_escapes += len(part)
+            new.append(chunk)
+            old.append(chunk)
+            if match is not None:
+                pending = run
+
+        return ''.join(new), new_escapes, ''.join(old), old_escapes
+
+    def _get_quote(self):
+        return ("'", '"') if self.quote_style == 'single' else ('"', "'")
+
+    def _requote(self, value: str, quote_override: Optional[str] = None) -> str:
+        '''
+        Re-quote the source of a simple (non-f) string literal
+
+        Args:
+            value: the string literal, including prefix and quotes
+            quote_override: override what kind of quote we are assigning to the string. Useful for
+                nested f-strings where quote re-use is not allowed
+
+        Returns:
+            the new source for the string literal
+        '''
+        quote = quote_override or self._get_quote()[0]
+        anti = "'" if quote[0] == '"' else '"'
+        prefix = string_prefix(value)
+        old_quote = string_quote(value)
+        quote_len = max(len(quote), len(old_quote))
+
+        if anti not in old_quote:
+            return value
+
+        # remove start and end quotes
+        text = value[len(old_quote) + len(prefix) : -len(old_quote)]
+        new_quote = quote[0] * quote_len
+
+        if 'r' in prefix:
+            if quote in text:
+                # we can't add/remove escapes from rstrings
+                return value
+            # if the target quote isn't in the rstring then we can do a simple quote swap
+        else:
+            text, escapes, old_style, old_escapes = self._scan_escapes(
+                text, quote[0], anti, quote_len
+            )
+            # if changing quote style would result in more escapes
+            if self.prefer_least_escapes and escapes > old_escapes:
+                # set everything back to the old style
+                text = old_style
+                new_quote = anti * quote_len
+
+        return f'{prefix}{new_quote}{text}{new_quote}'
+
+    def _escape_fstring_text(self, text: str) -> str:
+        '''Escape all quotes in the literal text portion of an f-string'''
+        return QUOTE_RUN_RE.sub(self._escape_quote_sub, text)
+
+    def _get_nested_quote(self, depth: int, meta: dict) -> str:
+        '''
+        Get appropriate quote given the f-string nest depth
+
+        Args:
+            depth: the nest depth of the f-string
+            meta: the info tracked across the f-string tree (max depth and multiline depths)
+        '''
+        quote, anti = self._get_quote()
+
+        if self._reuse_quotes:
+            return quote * 3 if depth in meta['multiline_depths'] else quote
+
+        if meta['multiline_depths']:
+            multiline_order = [quote * 3, anti * 3]
+            single_order = [quote, anti]
+            quote_order = []
+            for i in range(0, meta['max_depth']):
+                if i + 1 in meta['multiline_depths']:
+                    quote_order.append(multiline_order.pop(0))
+                else:
+                    quote_order.append(single_order.pop(0))
+        else:
+            if meta['max_depth'] <= 2:
+                quote_order = [quote, anti]
+            elif meta['max_depth'] == 3:
+                quote_order = [quote * 3, quote, anti]
+            else:
+                quote_order = [quote * 3, anti * 3, quote, anti]
+
+        return quote_order[depth - 1]
@@ -0,0 +1,279 @@
+import io
+import multiprocessing
+import os
+import sys
+import traceback
+from contextlib import redirect_stdout
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from typing import Callable, Dict, List, Optional, Tuple, TypedDict, cast
+
+from . import ProcessResult, _write_file, process_file
+from .cache import Cache
+from .config import Config
+from .limits import LimitExceeded, check_size
+from .profiling import ProfileData, Profiler, activate, stage
+
+# worker processes are restarted after this many files so that any memory held onto by libcst
+# between parses can't grow without bounds over a long run
+MAX_TASKS_PER_CHILD = 100
+# when processing files in the current process, how many files can be read ahead of the one being
+# formatted, and how many results can be waiting to be written
+PIPELINE_DEPTH = 16
+# unless the number of jobs is given, runs with fewer files than this are processed in the current
+# process. Starting workers (and importing libcst in each one) costs more than it saves here
+MIN_PARALLEL_FILES = 32
+
+Job = Tuple[Path, Config, Optional[Path]]
+Processor = Callable[..., ProcessResult]
+
+
+class RunSummary(TypedDict):
+    files: int
+    failed: int
+    # files passed through unchanged because they exceeded a resource limit
+    skipped: int
+    changed: int
+    cache_hits: int
+    cache_misses: int
+
+
+def _file_size(file: Path) -> int:
+    try:
+        return file.stat().st_size
+    except OSError:
+        return 0
+
+
+Outcome = Tuple[
+    int,
+    str,
+    Optional[ProcessResult],
+    Optional[str],
+    Optional[ProfileData],
+    Optional[str],
+]
+Task = Tuple[int, Job, Optional[Cache], Processor, bool]
+
+
+def _error_message(e: Exception) -> str:
+    return ''.join(traceback.format_exception_only(type(e), e)).strip()
+
+
+def _run_job(task: Task, **kwargs) -> Outcome:
+    '''
+    Process a single file, capturing anything it prints so that the output from multiple workers
+    can be re-ordered before it is displayed. Any kwargs are passed to the `process` function
+
+    Returns:
+        tuple of the job index, captured stdout, the processing result, an error message
+        (if processing failed), the profiling data (if profiling) and the reason the file was
+        skipped (if it exceeded a resource limit)
+    '''
+    index, (file, config, base_dir), cache, process, profile = task
+    result = error = skipped = None
+    # each job gets its own profiler, since workers can't share the parent process's one
+    profiler = Profiler() if profile else None
+    with redirect_stdout(io.StringIO()) as stdout, activate(profiler):
+        try:
+            if profiler is None:
+                result = process(file, config, base_dir=base_dir, cache=cache, **kwargs)
+            else:
+                with profiler.file(file):
+                    result = process(
+                        file, config, base_dir=base_dir, cache=cache, **kwargs
+                    )
+        except LimitExceeded as e:
+            skipped = str(e)
+        except Exception as e:
+            error = _error_message(e)
+    return (
+        index,
+        stdout.getvalue(),
+        result,
+        error,
+        profiler.data() if profiler is not None else None,
+        skipped,
+    )
+
+
+def _run_pipeline(tasks: List[Task], report: Callable[[Outcome], None]):
+    '''
+    Process files with `process_file` in the current process, overlapping reads and writes with
+    formatting. A reader thread reads upcoming files ahead of time and a writer thread writes out
+    the results, while the files are formatted in the calling thread. The queues between the
+    stages are bounded, so only a limited number of files are held in memory at once.
+
+    Outcomes are only reported once their files have been written, so that write errors are
+    reported as failures as usual. When profiling, time spent waiting for the other threads is
+    counted towards the read and write stages.
+    '''
+    read_queue: 'Queue[Optional[Tuple[Task, Optional[str]]]]' = Queue(PIPELINE_DEPTH)
+    write_queue: 'Queue[Optional[Tuple[Outcome, List[Tuple[Path, str]]]]]' = Queue(
+        PIPELINE_DEPTH
+    )
+    done_queue: 'Queue[Outcome]' = Queue()
+
+    def reader():
+        for task in tasks:
+            file, config, _ = task[1]
+            try:
+                check_size(os.path.getsize(file), config.get('max_file_size'))
+                with open(file) as f:
+                    code = f.read()
+            except Exception:
+                # let `process_file` deal with it, so the error is reported as usual
+                code = None
+            read_queue.put((task, code))
+        read_queue.put(None)
+
+    def writer():
+        while (item := write_queue.get()) is not None:
+            outcome, writes = item
+            try:
+                for file, content in writes:
+                    _write_file(file, content)
+            except Exception as e:
+                outcome = (*outcome[:2], None, _error_message(e), *outcome[4:])
+            done_queue.put(outcome)
+
+    threads = [Thread(target=reader, daemon=True), Thread(target=writer, daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    while True:
+        with stage('read'):
+            item = read_queue.get()
+        if item is None:
+            break
+        task, code = item
+        writes: List[Tuple[Path, str]] = []
+        outcome = _run_job(
+            task, code=code, write=lambda file, content: writes.append((file, content))
+        )
+        with stage('write'):
+            write_queue.put((outcome, writes))
+        while not done_queue.empty():
+            report(done_queue.get())
+
+    with stage('write'):
+        write_queue.put(None)
+        for thread in threads:
+            thread.join()
+    while not done_queue.empty():
+        report(done_queue.get())
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+def process_files(
+    jobs: List[Job],
+    n_jobs: Optional[int] = None,
+    cache: Optional[Cache] = None,
+    process: Processor = process_file,
+    profiler: Optional[Profiler] = None,
+) -> RunSummary:
+    '''
+    Process a list of files, optionally spread across a pool of worker processes.
+
+    When running in parallel, files are scheduled largest-first so that one big file doesn't end up
+    holding up the tail end of the run. Otherwise, reading and writing files is overlapped with
+    formatting them (see `_run_pipeline`). Output is always displayed in the same order as `jobs`.
+
+    Args:
+        jobs: list of `(file, config, base_dir)` tuples to pass to `process_file`
+        n_jobs: number of worker processes to use. If 1, files are processed in the current
+            process. Defaults to 1 for fewer than `MIN_PARALLEL_FILES` files, otherwise the CPU
+            count
+        cache: cache used to skip files that are already formatted
+        process: function called to process each file. Must have the same signature as
+            `process_file` and be picklable
+        profiler: if given, time each stage of processing every file and collect the results here
+    '''
+    if n_jobs is None and len(jobs) < MIN_PARALLEL_FILES:
+        n_jobs = 1
+    n_jobs = min(n_jobs or default_jobs(), len(jobs))
+    summary: RunSummary = {
+        'files': len(jobs),
+        'failed': 0,
+        'skipped': 0,
+        'changed': 0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+    }
+    # ignore/include are only needed for the walk, so don't waste time pickling them for workers
+    tasks: List[Task] = [
+        (
+            index,
+            (file, cast(Config, {**config, 'ignore': None, 'include': None}), base_dir),
+            cache,
+            process,
+            profiler is not None,
+        )
+        for index, (file, config, base_dir) in enumerate(jobs)
+    ]
+
+    pending: Dict[int, Outcome] = {}
+    next_index = 0
+
+    def report(outcome: Outcome):
+        nonlocal next_index
+        pending[outcome[0]] = outcome
+        # flush results in order, as soon as all preceding files are done
+        while next_index in pending:
+            _, stdout, result, error, profile, skipped = pending.pop(next_index)
+            if profiler is not None and profile is not None:
+                profiler.merge(profile)
+            sys.stdout.write(stdout)
+            if error is not None:
+                summary['failed'] += 1
+                print(
+                    f'Failed to process {jobs[next_index][0]}: {error}', file=sys.stderr
+                )
+            elif skipped is not None:
+                summary['skipped'] += 1
+                print(f'Skipped {jobs[next_index][0]}: {skipped}', file=sys.stderr)
+            elif result is not None:
+                summary['changed'] += result['changed']
+                if result['cache_hit'] is not None:
+                    summary[
+                        'cache_hits' if result['cache_hit'] else 'cache_misses'
+                    ] += 1
+            next_index += 1
+        sys.stdout.flush()
+
+    if n_jobs <= 1:
+        if process is process_file and len(tasks) > 1:
+            with activate(profiler):
+                _run_pipeline(tasks, report)
+        else:
+            for task in tasks:
+                report(_run_job(task))
+    else:
+        tasks.sort(key=lambda task: _file_size(task[1][0]), reverse=True)
+        with multiprocessing.Pool(n_jobs, maxtasksperchild=MAX_TASKS_PER_CHILD) as pool:
+            for outcome in pool.imap_unordered(_run_job, tasks, chunksize=1):
+                report(outcome)
+
+    # entries are only added on a cache miss, so the cache can't have outgrown its limit without any
+    if cache is not None and summary['cache_misses']:
+        cache.prune()
+
+    return summary
+
+
+def print_summary(summary: RunSummary, check: bool = False):
+    changed = 'would change' if check else 'changed'
+    message = f'Processed {summary["files"]} files: {summary["changed"]} {changed}'
+    if summary['failed']:
+        message += f', {summary["failed"]} failed'
+    if summary['skipped']:
+        message += f', {summary["skipped"]} skipped'
+    if summary['cache_hits'] or summary['cache_misses']:
+        message += (
+            f' (cache: {summary["cache_hits"]} hits, {summary["cache_misses"]} misses)'
+        )
+    print(message)
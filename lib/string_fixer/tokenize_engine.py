@@ -0,0 +1,466 @@
+'''
+A lightweight alternative to `QuoteTransformer` that works directly on the token stream.
+
+Rather than parsing the whole module with libcst and re-generating the code, this finds string
+tokens with the stdlib `tokenize` module and only rewrites the source spans of those strings.
+f-strings are parsed by hand so that the same rules as `QuoteTransformer.leave_FormattedString`
+can be applied to them.
+'''
+
+import ast
+import io
+import keyword
+import re
+import tokenize
+from typing import Iterator, List, Optional, Tuple
+
+from .prefilter import iter_string_spans
+from .quotes import QuoteStyle, string_prefix, string_quote
+
+_NAME_RE = re.compile(r'\w+')
+_STRING_PREFIXES = {'r', 'u', 'b', 'br', 'rb', 'f', 'fr', 'rf'}
+_QUOTES = ('"', "'")
+
+# a token within an expression: (kind, start, end). Brackets and their contents are grouped
+# into a single token whose kind is the opening bracket
+Token = Tuple[str, int, int]
+# a replacement span in some text: (start, end, replacement)
+Edit = Tuple[int, int, str]
+
+
+class UnsupportedSyntax(Exception):
+    '''Raised when the tokenize engine can't be sure it would handle some code correctly'''
+
+
+def _string_start(text: str, i: int) -> Optional[int]:
+    '''
+    If a string literal starts at `text[i]`, return the index of its opening quote
+    '''
+    if text[i] in _QUOTES:
+        return i
+    match = _NAME_RE.match(text, i)
+    if (
+        match
+        and match.group().lower() in _STRING_PREFIXES
+        and match.end() < len(text)
+        and text[match.end()] in _QUOTES
+    ):
+        return match.end()
+    return None
+
+
+def _scan_string(text: str, i: int, parts: Optional[list] = None) -> int:
+    '''
+    Find the end of the string literal starting at `text[i]`
+
+    Args:
+        text: the text to scan
+        i: the index of the start of the string's prefix
+        parts: if the string is an f-string, its parts are appended to this list as either
+            `('text', start, end)` or `('field', start, end, expr_start, expr_end)`
+
+    Returns:
+        the index just past the string's closing quote
+    '''
+    quote_start = _string_start(text, i)
+    if quote_start is None:
+        raise UnsupportedSyntax(f'expected string at {i}')
+    prefix = text[i:quote_start].lower()
+    quote = text[quote_start]
+    delimiter = quote * 3 if text.startswith(quote * 3, quote_start) else quote
+    i = quote_start + len(delimiter)
+
+    if 'f' in prefix:
+        return _scan_fstring_body(text, i, delimiter, 'r' in prefix, parts)
+
+    while i < len(text):
+        if text[i] == '\\':
+            i += 2
+        elif text.startswith(delimiter, i):
+            return i + len(delimiter)
+        elif text[i] == '\n' and len(delimiter) == 1:
+            break
+        else:
+            i += 1
+    raise UnsupportedSyntax('unterminated string')
+
+
+def _scan_fstring_body(
+    text: str, i: int, delimiter: str, raw: bool, parts: Optional[list] = None
+) -> int:
+    text_start = i
+    while i < len(text):
+        char = text[i]
+        if text.startswith(delimiter, i):
+            if parts is not None and i > text_start:
+                parts.append(('text', text_start, i))
+            return i + len(delimiter)
+        elif char == '\\':
+            if not raw and text.startswith('N{', i + 1):
+                # named unicode escape, not a replacement field
+                close = text.find('}', i)
+                if close == -1:
+                    break
+                i = close + 1
+            elif text[i + 1 : i + 2] in ('{', '}'):
+                i += 1
+            else:
+                i += 2
+        elif char == '{' or char == '}':
+            if text.startswith(char * 2, i):
+                i += 2
+                continue
+            if char == '}':
+                break
+            if parts is not None and i > text_start:
+                parts.append(('text', text_start, i))
+            field_end, expr_start, expr_end = _scan_field(text, i + 1)
+            if parts is not None:
+                parts.append(('field', i, field_end, expr_start, expr_end))
+            i = text_start = field_end
+        elif char == '\n' and len(delimiter) == 1:
+            break
+        else:
+            i += 1
+    raise UnsupportedSyntax('unterminated f-string')
+
+
+def _scan_field(text: str, i: int) -> Tuple[int, int, int]:
+    '''
+    Scan an f-string replacement field, starting just after the opening brace
+
+    Returns:
+        tuple of the index just past the closing brace, and the start and end of the expression
+    '''
+    expr_start = i
+    depth = 0
+    while i < len(text):
+        char = text[i]
+        if char in '([{':
+            depth += 1
+        elif char in ')]}':
+            if depth == 0:
+                if char != '}':
+                    break
+                return i + 1, expr_start, i
+            depth -= 1
+        elif depth == 0 and (
+            char == ':' or (char == '!' and text[i + 1 : i + 2] != '=')
+        ):
+            expr_end = i
+            i = _scan_format_spec(text, i)
+            return i + 1, expr_start, expr_end
+        elif char in '#\\':
+            break
+        elif _string_start(text, i) is not None:
+            i = _scan_string(text, i)
+            continue
+        elif char.isalnum() or char == '_':
+            i = _NAME_RE.match(text, i).end()  # type: ignore
+            continue
+        i += 1
+    raise UnsupportedSyntax('unterminated replacement field')
+
+
+def _scan_format_spec(text: str, i: int) -> int:
+    '''
+    Scan the conversion and format spec of a replacement field
+
+    Returns:
+        the index of the closing brace of the field
+    '''
+    while i < len(text):
+        char = text[i]
+        if char == '}':
+            return i
+        elif char == '{':
+            i = _scan_field(text, i + 1)[0]
+            continue
+        elif char in '\'"\\\n':
+            break
+        i += 1
+    raise UnsupportedSyntax('unterminated format spec')
+
+
+def _lex(text: str, start: int, end: int) -> List[Token]:
+    '''Split an expression into top-level tokens'''
+    tokens: List[Token] = []
+    brackets: List[Tuple[str, int]] = []
+    i = start
+    while i < end:
+        char = text[i]
+        if char.isspace():
+            i += 1
+            continue
+        if char in '#\\':
+            raise UnsupportedSyntax('comment or line continuation in expression')
+        if char in '([{':
+            brackets.append((char, i))
+            i += 1
+            continue
+        if char in ')]}':
+            if not brackets:
+                raise UnsupportedSyntax('unbalanced brackets')
+            bracket, bracket_start = brackets.pop()
+            i += 1
+            if not brackets:
+                tokens.append((bracket, bracket_start, i))
+            continue
+
+        quote_start = _string_start(text, i)
+        if quote_start is not None:
+            j = _scan_string(text, i)
+            kind = 'fstring' if 'f' in text[i:quote_start].lower() else 'string'
+        elif char.isalnum() or char == '_':
+            j = _NAME_RE.match(text, i).end()  # type: ignore
+            kind = 'number' if char.isdigit() else 'name'
+        else:
+            j = i + 1
+            kind = char
+        if not brackets:
+            tokens.append((kind, i, j))
+        i = j
+    if brackets or i > end:
+        raise UnsupportedSyntax('unbalanced expression')
+    return tokens
+
+
+def _unwrap(text: str, start: int, end: int) -> List[Token]:
+    '''Lex an expression, removing any parentheses that wrap the entire thing'''
+    tokens = _lex(text, start, end)
+    while len(tokens) == 1 and tokens[0][0] == '(':
+        tokens = _lex(text, tokens[0][1] + 1, tokens[0][2] - 1)
+    return tokens
+
+
+def _is_primary(text: str, tokens: List[Token]) -> bool:
+    '''Check if some tokens form an atom followed by any number of trailers, eg: `a.b(c)[d]`'''
+    if not tokens:
+        return False
+    kind, start, end = tokens[0]
+    if kind == 'name':
+        name = text[start:end]
+        if keyword.iskeyword(name) and name not in ('None', 'True', 'False'):
+            return False
+    elif kind not in ('number', 'string', 'fstring', '(', '[', '{'):
+        return False
+
+    i = 1
+    # implicitly concatenated strings
+    while kind in ('string', 'fstring') and i < len(tokens) and tokens[i][0] == kind:
+        i += 1
+    while i < len(tokens):
+        kind = tokens[i][0]
+        if (
+            kind == '.'
+            and i + 1 < len(tokens)
+            and tokens[i + 1][0] in ('name', 'number')
+        ):
+            i += 2
+        elif kind in ('(', '['):
+            i += 1
+        else:
+            return False
+    return True
+
+
+def _splice(text: str, start: int, end: int, edits: List[Edit]) -> str:
+    '''Get `text[start:end]` with some edits applied'''
+    output = []
+    for edit_start, edit_end, replacement in edits:
+        output.append(text[start:edit_start])
+        output.append(replacement)
+        start = edit_end
+    output.append(text[start:end])
+    return ''.join(output)
+
+
+class TokenizeEngine(QuoteStyle):
+    def _transform_fstring(
+        self, text: str, depth=1, meta: Optional[dict] = None
+    ) -> str:
+        '''
+        Args:
+            text: the source of the f-string, including prefix and quotes
+            depth: current recursion depth
+            meta: dict used to keep track of info across recursions (eg: max recursion depth)
+
+        Returns:
+            the new source for the f-string
+        '''
+        self._check_fstring_depth(depth)
+        meta = meta if meta is not None else {}
+        meta['max_depth'] = max(meta.get('max_depth', 1), depth)
+        meta['multiline_depths'] = meta.get('multiline_depths', [])
+
+        prefix = string_prefix(text)
+        parts: List[tuple] = []
+        if _scan_string(text, 0, parts) != len(text):
+            raise UnsupportedSyntax('trailing text after f-string')
+        quote = text[len(prefix)]
+        delimiter = quote * 3 if text.startswith(quote * 3, len(prefix)) else quote
+
+        if len(delimiter) == 3 and '\n' in text:
+            meta['multiline_depths'].append(depth)
+
+        if not self._reuse_quotes and depth > 4:
+            return text
+
+        output = []
+        has_expressions = False
+        for part in parts:
+            if part[0] == 'text':
+                output.append(self._escape_fstring_text(text[part[1] : part[2]]))
+            else:
+                has_expressions = True
+                _, field_start, field_end, expr_start, expr_end = part
+                edits = self._transform_expression(
+                    text, expr_start, expr_end, depth, meta
+                )
+                output.append(_splice(text, field_start, field_end, edits))
+
+        quote = self._get_nested_quote(depth, meta)
+        if not has_expressions:
+            prefix = prefix.replace('f', '')
+        return f'{prefix}{quote}{"".join(output)}{quote}'
+
+    def _transform_string(
+        self, text: str, depth: int, meta: dict, track_multiline: bool
+    ):
+        '''Transform a simple string that is part of an f-string expression'''
+        # bump max_depth because simple string is another layer
+        meta['max_depth'] = max(meta.get('max_depth', 1), depth)
+        if track_multiline and len(string_quote(text)) == 3:
+            meta['multiline_depths'].append(depth)
+        return self._requote(text, self._get_nested_quote(depth, meta))
+
+    def _transform_expression(
+        self, text: str, start: int, end: int, depth: int, meta: dict
+    ) -> List[Edit]:
+        '''
+        Transform any strings within an f-string expression that `QuoteTransformer` would
+
+        Returns:
+            the edits to make to `text`
+        '''
+        # strip the `=` from self-documenting expressions
+        stripped = text[start:end].rstrip()
+        if stripped.endswith('=') and stripped[-2:-1] not in ('=', '!', '<', '>'):
+            end = start + len(stripped) - 1
+
+        tokens = _unwrap(text, start, end)
+        if len(tokens) == 1:
+            kind, token_start, token_end = tokens[0]
+            literal = text[token_start:token_end]
+            if kind == 'fstring':
+                return [
+                    (
+                        token_start,
+                        token_end,
+                        self._transform_fstring(literal, depth + 1, meta),
+                    )
+                ]
+            if kind == 'string':
+                return [
+                    (
+                        token_start,
+                        token_end,
+                        self._transform_string(literal, depth + 1, meta, True),
+                    )
+                ]
+
+        if (
+            len(tokens) < 2
+            or tokens[-1][0] != '['
+            or not _is_primary(text, tokens[:-1])
+        ):
+            return []
+
+        # subscript. Transform any elements that are just strings, ignoring slices
+        edits = []
+        elements: List[List[Token]] = [[]]
+        for token in _lex(text, tokens[-1][1] + 1, tokens[-1][2] - 1):
+            if token[0] == ',':
+                elements.append([])
+            else:
+                elements[-1].append(token)
+        for element in elements:
+            if not element or any(token[0] == ':' for token in element):
+                continue
+            element = _unwrap(text, element[0][1], element[-1][2])
+            if len(element) != 1:
+                continue
+            kind, token_start, token_end = element[0]
+            literal = text[token_start:token_end]
+            if kind == 'string':
+                edits.append(
+                    (
+                        token_start,
+                        token_end,
+                        self._transform_string(literal, depth + 1, meta, False),
+                    )
+                )
+            elif kind == 'fstring':
+                edits.append(
+                    (
+                        token_start,
+                        token_end,
+                        self._transform_fstring(literal, depth + 1, meta),
+                    )
+                )
+        return edits
+
+    def _edits(self, code: str) -> Iterator[Edit]:
+        '''
+        Lazily work out the edits needed to re-quote the strings in some code, in order. Only
+        strings that change are included
+
+        Raises:
+            UnsupportedSyntax: if the code is not valid Python, or contains an f-string that
+                this engine can't safely handle
+        '''
+        # tokenizing doesn't catch most syntax errors, and invalid code should fail the same way
+        # as it does with libcst rather than being re-quoted
+        try:
+            compile(code, '<string>', 'exec', ast.PyCF_ONLY_AST)
+        except (SyntaxError, ValueError) as e:
+            raise UnsupportedSyntax(str(e)) from e
+
+        offsets = [0]
+        for line in io.StringIO(code).readlines():
+            offsets.append(offsets[-1] + len(line))
+
+        def offset(position: Tuple[int, int]) -> int:
+            return offsets[position[0] - 1] + position[1]
+
+        try:
+            for start, end, literal in iter_string_spans(code):
+                if 'f' in string_prefix(literal):
+                    replacement = self._transform_fstring(literal)
+                else:
+                    replacement = self._requote(literal)
+                if replacement != literal:
+                    yield offset(start), offset(end), replacement
+        except (tokenize.TokenError, SyntaxError, ValueError) as e:
+            raise UnsupportedSyntax(str(e)) from e
+
+    def transform(self, code: str) -> str:
+        '''
+        Re-quote all the strings in some code
+
+        Raises:
+            UnsupportedSyntax: if the code is not valid Python, or contains an f-string that
+                this engine can't safely handle
+        '''
+        return _splice(code, 0, len(code), list(self._edits(code)))
+
+    def would_change(self, code: str) -> bool:
+        '''
+        Check whether `transform` would change some code, stopping at the first string that
+        would be changed
+
+        Raises:
+            UnsupportedSyntax: if the code is not valid Python, or the code before the first
+                changed string contains an f-string that this engine can't safely handle
+        '''
+        return next(self._edits(code), None) is not None
@@ -0,0 +1,192 @@
+'''
+Rewriting strings by parsing the whole module with libcst. Importing libcst is slow, so this module
+is only imported once some code actually needs transforming.
+'''
+
+from typing import Optional
+
+import libcst as cst
+from libcst import FormattedString
+
+from .quotes import QuoteStyle
+
+# used to render nodes back into source code
+_EMPTY_MODULE = cst.Module(body=[])
+
+
+def _is_multiline(node: cst.FormattedString) -> bool:
+    '''Check whether an f-string spans multiple lines, excluding any parentheses around it'''
+    for part in node.parts:
+        if isinstance(part, cst.FormattedStringText):
+            text = part.value
+        else:
+            text = _EMPTY_MODULE.code_for_node(part)
+        if '\n' in text:
+            return True
+    return False
+
+
+class QuoteTransformer(QuoteStyle, cst.CSTTransformer):
+    def leave_SimpleString(
+        self,
+        original_node: cst.SimpleString,
+        updated_node: cst.SimpleString,
+        quote_override: Optional[str] = None,
+    ) -> cst.SimpleString:
+        '''
+        Args:
+            original_node: the node being visited
+            updated_node: a deep clone of `original_node` where transformations can be applied
+            quote_override: override what kind of quote we are assigning to the string. Useful for
+                nested f-strings where quote re-use is not allowed
+        '''
+        value = self._requote(updated_node.value, quote_override)
+        if value == updated_node.value:
+            return updated_node
+        return updated_node.with_changes(value=value)
+
+    def visit_FormattedString(self, node: cst.FormattedString) -> bool:
+        # nested f-strings are transformed along with the outermost one, since their quotes depend
+        # on how deeply they are nested. Don't let libcst visit them separately
+        return False
+
+    def leave_FormattedString(
+        self, original_node: cst.FormattedString, updated_node: cst.FormattedString
+    ) -> cst.BaseExpression:
+        self._fstring_meta: dict = {'max_depth': 1, 'multiline_depths': []}
+        return self._transform_fstring(original_node, 1)
+
+    def _transform_fstring(
+        self, original_node: cst.FormattedString, depth: int
+    ) -> cst.BaseExpression:
+        '''
+        Transform an f-string and any strings nested within it. Each node is only transformed once
+
+        Args:
+            original_node: the node being transformed
+            depth: how deeply nested the f-string is
+
+        Info tracked across the whole f-string tree (eg: max depth) is kept in `self._fstring_meta`
+        '''
+        self._check_fstring_depth(depth)
+        meta = self._fstring_meta
+        meta['max_depth'] = max(meta['max_depth'], depth)
+
+        if len(original_node.quote) == 3 and _is_multiline(original_node):
+            meta['multiline_depths'].append(depth)
+
+        if not self._reuse_quotes and depth > 4:
+            # quit after 4 levels on <=3.11 because you can't reuse quotes in f-string expressions.
+            # since there are only 4 kinds of quotes (single, double and triple versions of each)
+            # there can only be 4 levels (see also point 3 in https://peps.python.org/pep-0701/#rationale)
+            return original_node
+
+        new_parts = []
+        has_expressions = False
+        for part in original_node.parts:
+            if isinstance(part, cst.FormattedStringText):
+                new_parts.append(
+                    part.with_changes(value=self._escape_fstring_text(part.value))
+                )
+            elif isinstance(part, cst.FormattedStringExpression):
+                has_expressions = True
+                expression = part.expression
+                if isinstance(expression, FormattedString):
+                    new_parts.append(
+                        part.with_changes(
+                            expression=self._transform_fstring(expression, depth + 1)
+                        )
+                    )
+                elif isinstance(expression, cst.Subscript):
+                    new_slices = []
+                    for slice in expression.slice:
+                        if not isinstance(slice.slice, cst.Index):
+                            new_slices.append(slice)
+                            continue
+
+                        value = slice.slice.value
+                        new_value = value
+                        if isinstance(value, cst.SimpleString):
+                            # bump max_depth because simple string is another layer
+                            meta['max_depth'] = max(meta['max_depth'], depth + 1)
+                            new_value = self.leave_SimpleString(
+                                value, value, self._get_nested_quote(depth + 1, meta)
+                            )
+                        elif isinstance(value, FormattedString):
+                            new_value = self._transform_fstring(value, depth + 1)
+
+                        new_slices.append(
+                            slice.with_changes(
+                                slice=slice.slice.with_changes(value=new_value)
+                            )
+                        )
+                    new_parts.append(
+                        part.with_changes(
+                            expression=expression.with_changes(slice=new_slices)
+                        )
+                    )
+                elif isinstance(expression, cst.SimpleString):
+                    # bump max_depth because simple string is another layer
+                    meta['max_depth'] = max(meta['max_depth'], depth + 1)
+                    if len(expression.quote) == 3:
+                        meta['multiline_depths'].append(depth + 1)
+                    new_parts.append(
+                        part.with_changes(
+                            expression=self.leave_SimpleString(
+                                expression,
+                                expression,
+                                self._get_nested_quote(depth + 1, meta),
+                            )
+                        )
+                    )
+                else:
+                    new_parts.append(part)
+            else:
+                has_expressions = True
+                new_parts.append(part)
+
+        quote = self._get_nested_quote(depth, meta)
+        if not has_expressions:
+            prefix = original_node.prefix.replace('f', '')
+            text = ''.join(part.value for part in new_parts)
+            return cst.SimpleString(
+                f'{prefix}{quote}{text}{quote}',
+                lpar=original_node.lpar,
+                rpar=original_node.rpar,
+            )
+
+        return original_node.with_changes(
+            parts=new_parts, start=f'{original_node.prefix}{quote}', end=quote
+        )
+
+
+class _Changed(Exception):
+    '''Raised to stop traversing the tree as soon as a string would be changed'''
+
+
+class QuoteChecker(QuoteTransformer):
+    '''
+    Checks whether `QuoteTransformer` would change any strings, by raising `_Changed` at the first
+    one that it would
+    '''
+
+    def leave_SimpleString(
+        self,
+        original_node: cst.SimpleString,
+        updated_node: cst.SimpleString,
+        quote_override: Optional[str] = None,
+    ) -> cst.SimpleString:
+        result = super().leave_SimpleString(original_node, updated_node, quote_override)
+        if result.value != original_node.value:
+            raise _Changed()
+        return result
+
+    def leave_FormattedString(
+        self, original_node: cst.FormattedString, updated_node: cst.FormattedString
+    ) -> cst.BaseExpression:
+        result = super().leave_FormattedString(original_node, updated_node)
+        if result is not original_node and _EMPTY_MODULE.code_for_node(
+            result
+        ) != _EMPTY_MODULE.code_for_node(original_node):
+            raise _Changed()
+        return original_node
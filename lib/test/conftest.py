@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+LIB_DIR = Path(__file__).parent / '..'
+
+
+def run(cwd: Path, *args: str, stdin: str = '') -> subprocess.CompletedProcess:
+    '''Run the CLI in a fresh interpreter, with some args and input'''
+    return subprocess.run(
+        [sys.executable, '-m', 'string_fixer', *args],
+        cwd=cwd,
+        input=stdin.encode(),
+        capture_output=True,
+        env={**os.environ, 'PYTHONPATH': str(LIB_DIR.absolute())},
+    )
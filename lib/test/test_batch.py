@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer import Formatter, replace_quotes
+from string_fixer.batch import format_sources
+from string_fixer.config import DEFAULT_CONFIG, parse_config
+
+
+@pytest.mark.parametrize('engine', ['libcst', 'tokenize'])
+def test_formatter_reuse(engine):
+    formatter = Formatter(engine=engine, target_python='3.8')
+    sources = ['x = "a"\n', 'f"{x!r} {f\'{y}\'}"\n', 'x = (\n', "x = 'a'\n"] * 2
+    for source in sources:
+        try:
+            expected = replace_quotes(source, engine=engine, target_python='3.8')
+        except Exception:
+            with pytest.raises(Exception):
+                formatter.format(source)
+            continue
+        assert formatter.format(source) == expected
+        assert formatter.would_change(source) is (expected != source)
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_format_sources(tmp_path: Path, n_jobs):
+    config = parse_config(DEFAULT_CONFIG, tmp_path / 'pyproject.toml')
+    file = tmp_path / 'file.py'
+    file.write_text('y = "b"\n')
+    sources = ['x = "a"\n', file, 'x = (\n', "x = 'a'\n", tmp_path / 'missing.py']
+
+    results = list(format_sources(sources, config, n_jobs=n_jobs))
+
+    assert [r['changed'] for r in results] == [True, True, False, False, False]
+    assert results[0]['output'] == "x = 'a'\n"
+    assert results[0]['file'] is None
+    assert results[1]['output'] == "y = 'b'\n"
+    assert results[1]['file'] == file
+    # files are never written to
+    assert file.read_text() == 'y = "b"\n'
+    assert results[2]['output'] is None and results[2]['error']
+    assert results[3]['output'] == "x = 'a'\n" and results[3]['error'] is None
+    assert 'FileNotFoundError' in (results[4]['error'] or '')
+    assert all(r['seconds'] >= 0 for r in results)
+
+
+def test_format_sources_check():
+    results = list(format_sources(['x = "a"\n', "x = 'a'\n"], check=True))
+    assert [r['changed'] for r in results] == [True, False]
+    assert all(r['output'] is None for r in results)
@@ -0,0 +1,82 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer import process_file
+from string_fixer.cache import Cache
+from string_fixer.config import DEFAULT_CONFIG, parse_config, user_cache_dir
+from string_fixer.runner import process_files
+
+
+def test_process_file_uses_cache(tmp_path: Path):
+    cache = Cache(tmp_path / 'cache')
+    config = parse_config(DEFAULT_CONFIG, tmp_path / 'pyproject.toml')
+    file = tmp_path / 'test.py'
+    file.write_text('x = "abc"\n')
+
+    assert process_file(file, config, cache=cache) == {'changed': True, 'cache_hit': False}
+    # the formatted output is cached, so the second run shouldn't need to do anything
+    assert process_file(file, config, cache=cache) == {'changed': False, 'cache_hit': True}
+    # changing the config should invalidate the entry
+    config['quote_style'] = 'double'
+    assert process_file(file, config, cache=cache) == {'changed': True, 'cache_hit': False}
+    assert file.read_text() == 'x = "abc"\n'
+
+
+def test_cache_prune(tmp_path: Path):
+    cache = Cache(tmp_path, max_entries=3)
+    config = parse_config(DEFAULT_CONFIG, tmp_path / 'pyproject.toml')
+    keys = [cache.key(str(i), config) for i in range(5)]
+    for i, key in enumerate(keys):
+        cache.mark_clean(key)
+        os.utime(cache._entry(key), (i, i))
+    # a cache hit should protect an entry from eviction
+    assert cache.is_clean(keys[0])
+
+    cache.prune()
+
+    assert [cache.is_clean(key) for key in keys] == [True, False, False, True, True]
+
+
+def test_read_only_cache(tmp_path: Path, monkeypatch):
+    cache = Cache(tmp_path)
+    config = parse_config(DEFAULT_CONFIG, tmp_path / 'pyproject.toml')
+    cache.mark_clean(cache.key('a', config))
+
+    def utime(path, times=None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        raise PermissionError(path)
+
+    # entries in a cache that can't be written to are still hits
+    monkeypatch.setattr(os, 'utime', utime)
+    assert cache.is_clean(cache.key('a', config))
+    assert not cache.is_clean(cache.key('b', config))
+
+
+def test_prune_only_after_misses(tmp_path: Path, monkeypatch):
+    pruned = []
+    monkeypatch.setattr(Cache, 'prune', lambda self: pruned.append(True))
+    cache = Cache(tmp_path / 'cache')
+    config = parse_config(DEFAULT_CONFIG, tmp_path / 'pyproject.toml')
+    file = tmp_path / 'test.py'
+    file.write_text('x = "abc"\n')
+
+    process_files([(file, config, None)], 1, cache)
+    assert len(pruned) == 1
+    # nothing was added to the cache, so it can't need pruning
+    process_files([(file, config, None)], 1, cache)
+    assert len(pruned) == 1
+
+
+def test_user_cache_dir(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path))
+    if sys.platform == 'darwin':
+        assert user_cache_dir() == Path.home() / 'Library' / 'Caches' / 'string-fixer'
+    else:
+        assert user_cache_dir() == tmp_path / 'string-fixer'
+    # the project being formatted is left alone
+    assert DEFAULT_CONFIG['cache_dir'].is_absolute()
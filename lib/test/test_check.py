@@ -0,0 +1,33 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer import process_file
+from string_fixer.config import DEFAULT_CONFIG, parse_config
+
+
+def test_check(tmp_path: Path, capsys):
+    config = parse_config(
+        {**DEFAULT_CONFIG, 'check': True}, tmp_path / 'pyproject.toml'
+    )
+    file = tmp_path / 'file.py'
+    file.write_text('x = "abc"\n')
+
+    assert process_file(file, config)['changed']
+    assert f'Would change: {file}' in capsys.readouterr().out
+    assert file.read_text() == 'x = "abc"\n'
+
+    file.write_text("x = 'abc'\n")
+    assert not process_file(file, config)['changed']
+
+
+def test_unchanged_file_not_written(tmp_path: Path):
+    config = parse_config(DEFAULT_CONFIG, tmp_path / 'pyproject.toml')
+    file = tmp_path / 'file.py'
+    file.write_text("x = 'abc'\n")
+    os.utime(file, (0, 0))
+
+    assert not process_file(file, config)['changed']
+    assert file.stat().st_mtime == 0
@@ -0,0 +1,115 @@
+import random
+import sys
+from pathlib import Path
+
+import libcst as cst
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from benchmarks.corpus import large
+from string_fixer import Formatter, replace_quotes
+from string_fixer.batch import format_large_source
+from string_fixer.chunks import split_code
+from string_fixer.config import DEFAULT_CONFIG, Config
+
+CODE = '''\
+import os
+x = "a"
+
+@decorator
+def func():
+    return "b"
+
+if x:
+    pass
+else:
+    y = "c"
+
+try:
+    pass
+# comment
+except Exception:
+    pass
+finally:
+    pass
+
+class A:
+    z = "d"
+
+    def method(self):
+        pass
+w = (
+    "e"
+)
+'''
+
+
+def test_split_code():
+    chunks = split_code(CODE, 1)
+    assert ''.join(chunks) == CODE
+    for chunk in chunks:
+        cst.parse_module(chunk)
+    starts = [chunk.splitlines()[0] for chunk in chunks]
+    # decorators and `else`/`except` clauses stay with their statements
+    assert starts == [
+        'import os',
+        'x = "a"',
+        '@decorator',
+        'if x:',
+        'try:',
+        'class A:',
+        'w = (',
+    ]
+
+
+def test_split_code_unsplittable():
+    assert split_code(CODE, 1000) == [CODE]
+    # code that can't be tokenized is never split
+    assert split_code('x = 1\ny = (\n' * 10, 1) == ['x = 1\ny = (\n' * 10]
+
+
+@pytest.mark.parametrize('engine', ['libcst', 'tokenize'])
+def test_chunked_output_identical(engine):
+    code = large(random.Random(0), 3000) + CODE * 20
+    expected = replace_quotes(code, target_python='3.8', engine=engine)
+    formatter = Formatter(engine=engine, chunk_lines=50, target_python='3.8')
+    assert formatter.format(code) == expected
+    assert formatter.would_change(code)
+
+
+def test_chunked_errors_identical():
+    code = 'x = "a"\n' * 100 + 'x = (\n' + 'y = "b"\n' * 100
+    with pytest.raises(Exception) as whole:
+        replace_quotes(code)
+    with pytest.raises(type(whole.value)):
+        replace_quotes(code, chunk_lines=10)
+
+
+@pytest.mark.parametrize('engine', ['libcst', 'tokenize'])
+@pytest.mark.parametrize(
+    'code',
+    [
+        # the invalid chunk has no strings to change, so the prefilter would skip it
+        'x = "a"\n' + 'y = 1\n' * 5 + 'z = (1 +)\n',
+        'z = (1 +)\n' + 'y = 1\n' * 5 + 'x = "a"\n',
+        # the invalid chunk comes after one that changes
+        'x = "a"\n' + 'y = 1\n' * 5 + 'z = ("b" +)\n',
+    ],
+)
+def test_chunked_syntax_errors(code: str, engine: str):
+    for chunk_lines in (None, 2):
+        formatter = Formatter(engine=engine, chunk_lines=chunk_lines)
+        with pytest.raises(cst.ParserSyntaxError):
+            formatter.format(code)
+        with pytest.raises(cst.ParserSyntaxError):
+            formatter.would_change(code)
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_format_large_source(n_jobs):
+    code = large(random.Random(1), 2000)
+    config = Config(**{**DEFAULT_CONFIG, 'target_version': '3.8'})  # type: ignore
+    assert format_large_source(code, config, 100, n_jobs) == replace_quotes(
+        code, target_python='3.8'
+    )
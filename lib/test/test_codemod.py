@@ -0,0 +1,80 @@
+import sys
+from pathlib import Path
+
+import libcst as cst
+import pytest
+from libcst.codemod import CodemodContext, SkipFile, VisitorBasedCodemodCommand
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer import replace_quotes
+from string_fixer.codemod import FixQuotesCommand
+from string_fixer.config import DEFAULT_CONFIG, parse_config
+
+CASES_DIR = Path(__file__).parent / 'cases'
+CASES = [
+    'basic.py',
+    'f_strings.py',
+    'least_escapes.py',
+    'r_strings.py',
+    'redundant_f_strings.py',
+    'strings_and_escapes.py',
+]
+
+
+class RenameCommand(VisitorBasedCodemodCommand):
+    '''An unrelated codemod, to run alongside string-fixer'''
+
+    def leave_Name(self, original_node: cst.Name, updated_node: cst.Name) -> cst.Name:
+        return updated_node.with_changes(value=updated_node.value.replace('foo', 'bar'))
+
+
+@pytest.mark.parametrize('case', CASES)
+def test_matches_replace_quotes(case: str):
+    code = (CASES_DIR / case).read_text()
+    command = FixQuotesCommand(CodemodContext(), target_version='3.8')
+    assert command.transform_module(cst.parse_module(code)).code == replace_quotes(
+        code, target_python='3.8'
+    )
+
+
+def test_from_config(tmp_path: Path):
+    config = parse_config(
+        {**DEFAULT_CONFIG, 'quote_style': 'double'}, tmp_path / 'pyproject.toml'
+    )
+    command = FixQuotesCommand.from_config(CodemodContext(), config)
+    assert (
+        command.transform_module(cst.parse_module("x = 'abc'\n")).code == 'x = "abc"\n'
+    )
+
+
+def test_config_defaults(tmp_path: Path, monkeypatch):
+    (tmp_path / 'pyproject.toml').write_text(
+        '[tool.string-fixer]\nquote_style = "double"\n'
+    )
+    monkeypatch.chdir(tmp_path)
+    module = cst.parse_module("x = 'abc'\n")
+    assert (
+        FixQuotesCommand(CodemodContext()).transform_module(module).code
+        == 'x = "abc"\n'
+    )
+    # explicit options take precedence over the config
+    command = FixQuotesCommand(CodemodContext(), quote_style='single')
+    assert command.transform_module(module).code == "x = 'abc'\n"
+
+
+def test_composed():
+    '''Several codemods can share one parse and one round of code generation'''
+    context = CodemodContext()
+    module = cst.parse_module('foo = "abc"\n')
+    for command in (RenameCommand(context), FixQuotesCommand(context)):
+        module = command.transform_module(module)
+    assert module.code == "bar = 'abc'\n"
+
+
+def test_limit_skips_file():
+    code = 'x = f"""{f\'\'\'{f"{x}"}\'\'\'}"""\n'
+    command = FixQuotesCommand(CodemodContext(), max_fstring_depth=2)
+    # libcst's tool reports these files as skipped rather than failed
+    with pytest.raises(SkipFile):
+        command.transform_module(cst.parse_module(code))
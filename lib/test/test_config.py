@@ -0,0 +1,78 @@
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer import config as config_module
+from string_fixer.config import (
+    ConfigResolver,
+    load_config_from_dir,
+    merge_with_cli_args,
+    parse_cli_args,
+)
+
+
+def write_config(directory: Path, body: str):
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / 'pyproject.toml').write_text(f'[tool.string-fixer]\n{body}\n')
+
+
+def test_merge_does_not_modify_config(tmp_path: Path):
+    write_config(tmp_path, 'include = ["./a.py"]')
+    (tmp_path / 'a.py').touch()
+    (tmp_path / 'b.py').touch()
+    config = load_config_from_dir(tmp_path)
+    include = list(config['include'] or [])
+
+    args = argparse.Namespace(quote_style='double', include=[str(tmp_path / 'b.py')])
+    for _ in range(3):
+        merged = merge_with_cli_args(config, args)
+        assert merged['quote_style'] == 'double'
+        assert len(merged['include'] or []) == 2
+
+    assert config['quote_style'] == 'single'
+    assert config['include'] == include
+
+
+def test_resolver(tmp_path: Path, monkeypatch):
+    write_config(tmp_path, 'quote_style = "single"')
+    write_config(tmp_path / 'sub', 'quote_style = "double"')
+    (tmp_path / 'other' / 'deep').mkdir(parents=True)
+    (tmp_path / 'sub' / 'deep').mkdir()
+
+    loaded = []
+    load = config_module.load_config_from_file
+
+    def load_config_from_file(file: Path):
+        loaded.append(file)
+        return load(file)
+
+    monkeypatch.setattr(config_module, 'load_config_from_file', load_config_from_file)
+
+    overrides = parse_cli_args(argparse.Namespace(engine='tokenize'))
+    resolver = ConfigResolver(overrides, tmp_path)
+    root = resolver.get(tmp_path)
+    sub = resolver.get(tmp_path / 'sub')
+
+    assert root['quote_style'] == 'single' and root['engine'] == 'tokenize'
+    assert sub['quote_style'] == 'double' and sub['engine'] == 'tokenize'
+    # directories without their own config share their parent's
+    assert resolver.get(tmp_path / 'other' / 'deep') is root
+    assert resolver.get(tmp_path / 'sub' / 'deep') is sub
+
+    # each directory is only checked for a config once
+    count = len(loaded)
+    resolver.get(tmp_path / 'other' / 'deep')
+    resolver.get(tmp_path / 'other')
+    assert len(loaded) == count == len(set(loaded))
+
+
+def test_resolver_default(tmp_path: Path):
+    (tmp_path / 'sub').mkdir()
+    resolver = ConfigResolver(None, tmp_path)
+    config = resolver.get(tmp_path / 'sub')
+
+    # the default config is relative to the limit
+    assert all(rule.base == tmp_path for rule in config['ignore'] or [])  # type: ignore
+    assert config['target'] == tmp_path.resolve()
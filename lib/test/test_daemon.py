@@ -0,0 +1,79 @@
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer.daemon import Daemon
+
+
+def test_daemon_serve(tmp_path: Path):
+    requests = [
+        {'id': 1, 'source': 'x = "abc"\n', 'root': str(tmp_path)},
+        {'id': 2, 'source': "x = 'abc'\n", 'root': str(tmp_path)},
+        {'id': 3, 'source': 'x = (', 'root': str(tmp_path)},
+    ]
+    output = io.StringIO()
+    Daemon().serve(io.StringIO(''.join(json.dumps(r) + '\n' for r in requests)), output)
+    ready, *responses = [json.loads(line) for line in output.getvalue().splitlines()]
+
+    assert ready['ready'] is True
+    assert responses[0] == {'id': 1, 'source': "x = 'abc'\n", 'changed': True}
+    assert responses[1] == {'id': 2, 'source': "x = 'abc'\n", 'changed': False}
+    assert responses[2]['id'] == 3 and 'error' in responses[2]
+
+
+def test_daemon_reloads_config(tmp_path: Path):
+    daemon = Daemon()
+    request = {'source': "x = 'abc'\n", 'root': str(tmp_path)}
+    assert daemon.format(request)['changed'] is False
+
+    pyproject = tmp_path / 'pyproject.toml'
+    pyproject.write_text('[tool.string-fixer]\nquote_style = "double"\n')
+    # make sure the mtime changes, even on filesystems with coarse timestamps
+    os.utime(pyproject, (1, 1))
+    assert daemon.format(request) == {'source': 'x = "abc"\n', 'changed': True}
+
+    nested = tmp_path / 'nested'
+    nested.mkdir()
+    (nested / 'pyproject.toml').write_text('[tool.string-fixer]\nquote_style = "single"\n')
+    request['path'] = str(nested / 'file.py')
+    assert daemon.format(request)['changed'] is False
+
+
+def test_daemon_edits(tmp_path: Path):
+    daemon = Daemon()
+    request = {'source': 'x = "abc"\n', 'root': str(tmp_path), 'edits': True}
+    assert daemon.format(request) == {
+        'edits': [
+            {
+                'start': {'line': 0, 'column': 4},
+                'end': {'line': 0, 'column': 9},
+                'text': "'abc'",
+            }
+        ],
+        'changed': True,
+    }
+    request['source'] = "x = 'abc'\n"
+    assert daemon.format(request) == {'edits': [], 'changed': False}
+
+
+def test_daemon_ignored(tmp_path: Path):
+    daemon = Daemon()
+    (tmp_path / 'pyproject.toml').write_text(
+        '[tool.string-fixer]\nignore = ["./generated/**"]\n'
+    )
+    request = {'source': 'x = "abc"\n', 'root': str(tmp_path)}
+
+    request['path'] = str(tmp_path / 'generated' / 'file.py')
+    assert daemon.format(request) == {'source': 'x = "abc"\n', 'changed': False}
+    assert daemon.format({**request, 'edits': True}) == {'edits': [], 'changed': False}
+
+    request['path'] = str(tmp_path / 'sub' / 'file.py')
+    assert daemon.format(request)['changed'] is True
+
+    # .gitignore files are reloaded when they change
+    (tmp_path / '.gitignore').write_text('sub/\n')
+    assert daemon.format(request)['changed'] is False
@@ -0,0 +1,127 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer import process_file
+from string_fixer.config import DEFAULT_CONFIG, parse_config
+from string_fixer.diff import (
+    apply_edits,
+    count_changed_strings,
+    string_edits,
+    unified_diff,
+)
+
+CODE = '''x = "abc"
+y = 'def'
+z = f"{x!r} {y}"
+'''
+
+
+@pytest.mark.parametrize(
+    'before,after,count',
+    [
+        (CODE, CODE, 0),
+        (CODE, CODE.replace('"abc"', "'abc'"), 1),
+        (CODE, CODE.replace('"', "'"), 2),
+        ('x = (', 'x = (', None),
+    ],
+)
+def test_count_changed_strings(before: str, after: str, count):
+    assert count_changed_strings(before, after) == count
+
+
+def test_unified_diff(tmp_path: Path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    after = CODE.replace('"abc"', "'abc'")
+    diff = unified_diff(tmp_path / 'sub' / 'file.py', CODE, after)
+
+    assert diff.splitlines()[:2] == ['--- a/sub/file.py', '+++ b/sub/file.py']
+    assert '-x = "abc"\n+x = \'abc\'\n' in diff
+    assert unified_diff(tmp_path / 'file.py', CODE, CODE) == ''
+
+
+def test_no_newline_at_eof(tmp_path: Path):
+    diff = unified_diff(tmp_path / 'file.py', 'x = "a"', "x = 'a'")
+    assert diff.endswith("+x = 'a'\n\\ No newline at end of file\n")
+
+
+@pytest.mark.parametrize(
+    'before,after',
+    [
+        (CODE, CODE),
+        (CODE, CODE.replace('"', "'")),
+        # columns are counted in characters, not bytes
+        ('x = ("é", "abc")\n', "x = ('é', 'abc')\n"),
+        ('x = """a\nb""" + "c"\r\ny = "d"', "x = '''a\nb''' + 'c'\r\ny = 'd'"),
+        ('x = f"{f\'{1}\'}"\n', 'x = f\'{f"{1}"}\'\n'),
+    ],
+)
+def test_string_edits(before: str, after: str):
+    edits = string_edits(before, after)
+    assert apply_edits(before, edits) == after
+    # one edit per changed string
+    assert len(edits) == count_changed_strings(before, after)
+
+
+def test_string_edits_positions():
+    edits = string_edits('a = 1\nx = ("é", "abc")\n', "a = 1\nx = ('é', 'abc')\n")
+    assert edits == [
+        {
+            'start': {'line': 1, 'column': 5},
+            'end': {'line': 1, 'column': 8},
+            'text': "'é'",
+        },
+        {
+            'start': {'line': 1, 'column': 10},
+            'end': {'line': 1, 'column': 15},
+            'text': "'abc'",
+        },
+    ]
+
+
+def test_string_edits_fallback():
+    # anything other than strings changing means the whole code is replaced
+    before, after = 'x = "abc"\nprint(x)\n', "x = 'abc'\n"
+    assert string_edits(before, after) == [
+        {
+            'start': {'line': 0, 'column': 0},
+            'end': {'line': 2, 'column': 0},
+            'text': after,
+        }
+    ]
+    assert string_edits('x = (', 'y') == [
+        {
+            'start': {'line': 0, 'column': 0},
+            'end': {'line': 0, 'column': 5},
+            'text': 'y',
+        }
+    ]
+
+
+@pytest.mark.parametrize('mode', ['full', 'summary', 'edits'])
+def test_process_file(tmp_path: Path, capsys, mode):
+    config = parse_config({**DEFAULT_CONFIG, 'diff': mode}, tmp_path / 'pyproject.toml')
+    file = tmp_path / 'file.py'
+    file.write_text(CODE)
+    unchanged = tmp_path / 'unchanged.py'
+    unchanged.write_text("x = 'abc'\n")
+
+    assert process_file(file, config)['changed']
+    assert not process_file(unchanged, config)['changed']
+    out = capsys.readouterr().out
+    # files are never written, and only changed files are reported
+    assert file.read_text() == CODE
+    assert 'Processing' not in out
+    assert str(unchanged.name) not in out
+    if mode == 'full':
+        assert '-x = "abc"\n+x = \'abc\'\n' in out
+    elif mode == 'edits':
+        result = json.loads(out)
+        assert result['file'] == str(file)
+        assert apply_edits(CODE, result['edits']) == CODE.replace('"', "'")
+    else:
+        assert out == f'Would change: {file} (2 strings)\n'
@@ -0,0 +1,179 @@
+'''
+Differential tests checking that the tokenize engine produces exactly the same output as the
+libcst engine.
+
+Runs over the test cases, the string_fixer source, a generated corpus of awkward strings and
+(optionally) any directory of Python files given by the `STRING_FIXER_DIFF_CORPUS` env var.
+'''
+
+import os
+import random
+import sys
+import tokenize
+from pathlib import Path
+from typing import List
+
+import pytest
+from libcst import ParserSyntaxError
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+import string_fixer
+from string_fixer.tokenize_engine import TokenizeEngine, UnsupportedSyntax
+
+CASES_DIR = Path(__file__).parent / 'cases'
+SOURCE_DIR = Path(__file__).parent / '..' / 'string_fixer'
+
+OPTIONS = [
+    {'target_python': target, 'quote_style': style, 'prefer_least_escapes': escapes}
+    for target in ('3.8', '3.12')
+    for style in ('single', 'double')
+    for escapes in (True, False)
+]
+
+
+def generate_corpus(seed: int, size: int) -> str:
+    '''
+    Generate a module full of randomly constructed (but valid) strings, f-strings and
+    nested f-strings
+    '''
+    rng = random.Random(seed)
+    text_atoms = ['abc', ' ', "'", '"', "\\'", '\\"', '\\\\', "''", '""', '\\n', '\n']
+    quotes = ["'", '"', "'''", '"""']
+
+    def text(fstring: bool) -> str:
+        atoms = text_atoms + (['{{', '}}'] if fstring else [])
+        return ''.join(rng.choice(atoms) for _ in range(rng.randint(0, 4)))
+
+    def simple() -> str:
+        quote = rng.choice(quotes)
+        prefix = rng.choice(['', '', 'r', 'b', 'u', 'R', 'rb'])
+        return f'{prefix}{quote}{text(False)}{quote}'
+
+    def fstring(depth: int) -> str:
+        quote = rng.choice(quotes)
+        prefix = rng.choice(['f', 'f', 'F', 'rf'])
+        parts = []
+        for _ in range(rng.randint(0, 3)):
+            if rng.random() < 0.5:
+                parts.append(text(True))
+                continue
+            options = [
+                'x',
+                simple(),
+                f'd[{simple()}]',
+                f'str({simple()})',
+                f'({simple()})',
+            ]
+            if depth < 4:
+                options += [fstring(depth + 1), f'd[{fstring(depth + 1)}]']
+            expression = rng.choice(options)
+            suffix = rng.choice(['', '', '!r', ':>10', '=', ':{x}'])
+            parts.append(f'{{{expression}{suffix}}}')
+        return f'{prefix}{quote}{"".join(parts)}{quote}'
+
+    lines: List[str] = []
+    while len(lines) < size:
+        line = f'v = {fstring(1) if rng.random() < 0.6 else simple()}\n'
+        try:
+            # only keep strings that are valid on the running python version
+            compile(line, '<corpus>', 'exec')
+        except (SyntaxError, ValueError):
+            continue
+        lines.append(line)
+    return ''.join(lines)
+
+
+def corpus() -> List:
+    files = sorted(CASES_DIR.glob('*.py')) + sorted(SOURCE_DIR.glob('*.py'))
+    if extra := os.environ.get('STRING_FIXER_DIFF_CORPUS'):
+        files += sorted(Path(extra).rglob('*.py'))
+    return [pytest.param(file.read_text(), id=file.name) for file in files] + [
+        pytest.param(generate_corpus(seed, 150), id=f'generated-{seed}')
+        for seed in range(3)
+    ]
+
+
+@pytest.mark.parametrize('code', corpus())
+@pytest.mark.parametrize(
+    'options', OPTIONS, ids=lambda o: '-'.join(str(v) for v in o.values())
+)
+def test_engines_match(code: str, options: dict):
+    try:
+        expected = string_fixer.replace_quotes(code, prefilter=False, **options)
+    except Exception:
+        pytest.skip('cannot be formatted by libcst')
+    try:
+        result = TokenizeEngine(**options).transform(code)
+    except UnsupportedSyntax:
+        pytest.skip('not supported by tokenize engine')
+    assert result == expected
+
+
+def test_engine_fallback(monkeypatch):
+    def unsupported(self, code):
+        raise UnsupportedSyntax()
+
+    monkeypatch.setattr(TokenizeEngine, 'transform', unsupported)
+    assert string_fixer.replace_quotes('x = "abc"', engine='tokenize') == "x = 'abc'"
+
+
+@pytest.mark.parametrize('code', corpus())
+@pytest.mark.parametrize('engine', ['libcst', 'tokenize'])
+def test_would_change(code: str, engine: str):
+    options = {'target_python': '3.8', 'engine': engine}
+    # check both the original code and the already formatted code
+    for _ in range(2):
+        try:
+            formatted = string_fixer.replace_quotes(code, **options)
+        except Exception:
+            return
+        assert string_fixer.would_change(code, **options) == (formatted != code)
+        code = formatted
+
+
+@pytest.mark.parametrize(
+    'code', ['x = "a" +\n', 'print "hello"\n', 'def f(:\n    return "a"\n', 'x = "a"\0\n']
+)
+def test_invalid_syntax(code: str):
+    # invalid code is never re-quoted, and fails the same way with either engine
+    with pytest.raises(UnsupportedSyntax):
+        TokenizeEngine().transform(code)
+    with pytest.raises(UnsupportedSyntax):
+        TokenizeEngine().would_change(code)
+    for engine in ('libcst', 'tokenize'):
+        with pytest.raises(ParserSyntaxError):
+            string_fixer.replace_quotes(code, engine=engine)
+        with pytest.raises(ParserSyntaxError):
+            string_fixer.would_change(code, engine=engine)
+
+
+@pytest.mark.parametrize(
+    'code',
+    [
+        'x = (\n    """\\\n└──b\n                """\n)\n',
+        'x = (\n    f"""\\\n└──{b}\n                """\n)\n',
+        'x = ("é", """\né""", "a")\n',
+    ],
+)
+def test_non_ascii_multiline_strings(code: str):
+    # 3.12.1 reports the wrong end column for these strings
+    formatted = string_fixer.replace_quotes(code, engine='tokenize')
+    assert formatted == string_fixer.replace_quotes(code, engine='libcst')
+    compile(formatted, '<string>', 'exec')
+
+
+def test_misplaced_tokens(monkeypatch):
+    generate_tokens = tokenize.generate_tokens
+
+    def shifted(readline):
+        for token in generate_tokens(readline):
+            if token.type == tokenize.STRING:
+                token = token._replace(start=(token.start[0], token.start[1] + 1))
+            yield token
+
+    # if tokenize's positions don't match up with the code, fall back to libcst rather than
+    # writing the replacement to the wrong place
+    monkeypatch.setattr(tokenize, 'generate_tokens', shifted)
+    with pytest.raises(UnsupportedSyntax):
+        TokenizeEngine().transform('x = "a"\n')
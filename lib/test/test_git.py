@@ -0,0 +1,93 @@
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer.config import DEFAULT_CONFIG, parse_config
+from string_fixer.git import changed_files, process_staged_file, staged_files
+from string_fixer.limits import LimitExceeded
+
+pytestmark = pytest.mark.skipif(shutil.which('git') is None, reason='git not installed')
+
+
+def git(repo: Path, *args: str) -> str:
+    return subprocess.run(
+        ['git', *args], cwd=repo, capture_output=True, check=True, text=True
+    ).stdout
+
+
+@pytest.fixture
+def repo(tmp_path: Path):
+    git(tmp_path, 'init', '-q')
+    git(tmp_path, 'config', 'user.email', 'test@example.com')
+    git(tmp_path, 'config', 'user.name', 'test')
+    (tmp_path / 'sub').mkdir()
+    for name in ('a.py', 'b.py', 'sub/c.py'):
+        (tmp_path / name).write_text('x = "abc"\n')
+    git(tmp_path, 'add', '.')
+    git(tmp_path, 'commit', '-q', '-m', 'init')
+    return tmp_path.resolve()
+
+
+def test_changed_files(repo: Path):
+    (repo / 'a.py').write_text('x = "def"\n')
+    (repo / 'sub' / 'new.py').write_text('x = "abc"\n')
+    (repo / 'b.py').unlink()
+    assert changed_files('HEAD', repo) == [repo / 'a.py', repo / 'sub' / 'new.py']
+    assert changed_files('HEAD', repo / 'sub') == [repo / 'sub' / 'new.py']
+
+
+def test_staged_files(repo: Path):
+    (repo / 'a.py').write_text('x = "def"\n')
+    (repo / 'sub' / 'c.py').write_text('x = "def"\n')
+    git(repo, 'add', 'sub/c.py')
+    assert staged_files(repo) == [repo / 'sub' / 'c.py']
+
+
+def test_process_staged_file(repo: Path):
+    config = parse_config(DEFAULT_CONFIG, repo / 'pyproject.toml')
+    (repo / 'a.py').write_text('x = "def"\n')
+    (repo / 'sub' / 'c.py').write_text('x = "def"\n')
+    git(repo, 'add', '.')
+    # unstaged changes must not be overwritten
+    (repo / 'a.py').write_text('x = "ghi"\n')
+
+    assert process_staged_file(repo / 'a.py', config)['changed']
+    assert git(repo, 'show', ':a.py') == "x = 'def'\n"
+    assert (repo / 'a.py').read_text() == 'x = "ghi"\n'
+
+    # working copy is updated along with the index if it matches
+    assert process_staged_file(repo / 'sub' / 'c.py', config)['changed']
+    assert git(repo, 'show', ':sub/c.py') == "x = 'def'\n"
+    assert (repo / 'sub' / 'c.py').read_text() == "x = 'def'\n"
+
+    assert not process_staged_file(repo / 'sub' / 'c.py', config)['changed']
+
+
+def test_process_staged_file_output(repo: Path, tmp_path_factory):
+    output = tmp_path_factory.mktemp('output')
+    config = parse_config(
+        {**DEFAULT_CONFIG, 'output': str(output)}, repo / 'pyproject.toml'
+    )
+    (repo / 'sub' / 'c.py').write_text('x = "def"\n')
+    git(repo, 'add', '.')
+    (repo / 'sub' / 'c.py').write_text('x = "ghi"\n')
+
+    # the staged content is written to the output directory, and the index is left alone
+    assert process_staged_file(repo / 'sub' / 'c.py', config, base_dir=repo)['changed']
+    assert (output / 'sub' / 'c.py').read_text() == "x = 'def'\n"
+    assert git(repo, 'show', ':sub/c.py') == 'x = "def"\n'
+
+
+def test_process_staged_file_size_limit(repo: Path):
+    config = parse_config({**DEFAULT_CONFIG, 'max_file_size': 5}, repo / 'pyproject.toml')
+    # the working copy is small enough, but the staged content isn't
+    (repo / 'a.py').write_text('x = "abcdef"\n')
+    git(repo, 'add', '.')
+    (repo / 'a.py').write_text('')
+    with pytest.raises(LimitExceeded):
+        process_staged_file(repo / 'a.py', config)
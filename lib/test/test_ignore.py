@@ -0,0 +1,181 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer.config import load_config_from_dir
+from string_fixer.ignore import (
+    Pattern,
+    file_is_ignored,
+    load_gitignores,
+    walk,
+    with_gitignores,
+)
+
+
+@pytest.mark.parametrize(
+    'pattern,path,is_dir,result',
+    [
+        ('*.pyc', 'a.pyc', False, True),
+        ('*.pyc', 'a/b/c.pyc', False, True),
+        ('*.pyc', 'a.py', False, False),
+        ('/a.py', 'a.py', False, True),
+        ('/a.py', 'b/a.py', False, False),
+        ('a/b.py', 'x/a/b.py', False, False),
+        ('build/', 'x/build', True, True),
+        ('build/', 'x/build', False, False),
+        ('**/foo', 'a/b/foo', True, True),
+        ('**/foo', 'foo', True, True),
+        ('a/**/b', 'a/b', True, True),
+        ('a/**/b', 'a/x/y/b', True, True),
+        ('a/**', 'a/x/y', False, True),
+        ('a/**', 'a', True, False),
+        ('a*b', 'a/b', False, False),
+        ('file?.py', 'file1.py', False, True),
+        ('file[0-9].py', 'file5.py', False, True),
+        ('file[!0-9].py', 'file5.py', False, False),
+        ('\\#hash', '#hash', False, True),
+        ('.', '', True, True),
+        ('./**/.*', 'a/.venv', True, True),
+    ],
+)
+def test_pattern(tmp_path: Path, pattern: str, path: str, is_dir: bool, result: bool):
+    assert Pattern(pattern, tmp_path).match(tmp_path / path, is_dir) is result
+
+
+def test_pattern_anchored(tmp_path: Path):
+    # config patterns are always relative to their directory, like globs
+    assert not Pattern('a.py', tmp_path, anchored=True).match(tmp_path / 'b' / 'a.py')
+    assert Pattern('a.py', tmp_path, anchored=True).match(tmp_path / 'a.py')
+
+
+def test_invalid_gitignore(tmp_path: Path):
+    (tmp_path / '.gitignore').write_text('[z-a]\n')
+    with pytest.raises(ValueError, match='error when parsing glob from gitignore'):
+        load_gitignores(tmp_path)
+
+
+@pytest.fixture
+def tree(tmp_path: Path):
+    for name in (
+        'a.py',
+        'b.pyc',
+        'sub/c.py',
+        'sub/keep.py',
+        'sub/deep/d.py',
+        'node_modules/pkg/e.py',
+        'generated/f.py',
+        'generated/g.py',
+    ):
+        file = tmp_path / name
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text('')
+    (tmp_path / 'pyproject.toml').write_text(
+        '[tool.string-fixer]\nignore = ["./generated/*.py"]\ninclude = ["./generated/g.py"]\n'
+    )
+    (tmp_path / '.gitignore').write_text('*.pyc\n')
+    # nested .gitignore files only apply within their own directory
+    (tmp_path / 'sub' / '.gitignore').write_text('*.py\n!keep.py\n')
+    return tmp_path
+
+
+def rules_for(root: Path, visited: list):
+    def rules(directory: Path):
+        visited.append(directory)
+        config = load_config_from_dir(directory, root)
+        return with_gitignores(config['ignore'], directory, root), config['include']
+
+    return rules
+
+
+def test_walk(tree: Path):
+    visited = []
+    files = [
+        file for _, files in walk(tree, rules_for(tree, visited)) for file in files
+    ]
+
+    assert sorted(file.relative_to(tree).as_posix() for file in files) == [
+        'a.py',
+        'generated/g.py',
+        'pyproject.toml',
+        'sub/keep.py',
+    ]
+    # ignored directories are never descended into
+    assert tree / 'node_modules' not in visited
+
+
+def test_walk_suffix(tree: Path):
+    files = [f for _, files in walk(tree, rules_for(tree, []), '.py') for f in files]
+    assert all(file.suffix == '.py' for file in files)
+
+
+def test_file_is_ignored_nested(tree: Path):
+    config = load_config_from_dir(tree / 'sub', tree)
+
+    def ignored(name: str) -> bool:
+        file = tree / name
+        ignore = with_gitignores(config['ignore'], file.parent, tree)
+        return file_is_ignored(file, ignore, config['include'])
+
+    assert ignored('sub/c.py')
+    assert not ignored('sub/keep.py')
+    assert ignored('sub/deep/d.py')
+    assert ignored('node_modules/pkg/e.py')
+    assert ignored('generated/f.py')
+    assert not ignored('generated/g.py')
+    assert not ignored('a.py')
+
+
+def test_walk_include_inside_ignored_dir(tmp_path: Path):
+    for name in (
+        'build/keep/a.py',
+        'build/keep/sub/b.py',
+        'build/other/c.py',
+        'build/d.py',
+    ):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text('')
+    (tmp_path / 'pyproject.toml').write_text(
+        '[tool.string-fixer]\ninclude = ["./build/keep/**"]\n'
+    )
+    visited = []
+    files = [
+        file
+        for _, files in walk(tmp_path, rules_for(tmp_path, visited), '.py')
+        for file in files
+    ]
+
+    # the ignored directory is walked since the include pattern could match inside it, but only
+    # the included files are kept
+    assert sorted(file.relative_to(tmp_path).as_posix() for file in files) == [
+        'build/keep/a.py',
+        'build/keep/sub/b.py',
+    ]
+    # other ignored directories are still pruned
+    assert tmp_path / 'build' / 'other' not in visited
+    # walking from inside the ignored directory works the same way
+    files = [
+        file
+        for _, files in walk(tmp_path / 'build', rules_for(tmp_path, []), '.py')
+        for file in files
+    ]
+    assert len(files) == 2
+
+
+@pytest.mark.parametrize(
+    'pattern,directory,result',
+    [
+        ('./build/keep/**', 'build', True),
+        ('./build/keep/**', 'build/keep', True),
+        ('./build/keep/**', 'build/keep/deep', True),
+        ('./build/keep/**', 'build/other', False),
+        ('./build/keep/**', 'other', False),
+        ('./**/keep.py', 'build/other', True),
+        ('./b*/keep.py', 'other', True),
+    ],
+)
+def test_could_match_below(tmp_path: Path, pattern: str, directory: str, result: bool):
+    rule = Pattern(pattern, tmp_path, anchored=True)
+    assert rule.could_match_below(tmp_path / directory) is result
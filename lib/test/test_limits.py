@@ -0,0 +1,96 @@
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer import Formatter, replace_quotes
+from string_fixer.config import DEFAULT_CONFIG, parse_config
+from string_fixer.limits import LimitExceeded, code_size, time_limit
+from string_fixer.runner import process_files
+
+# 4 levels of nested f-strings, which is valid on any python version
+NESTED = 'x = f"""{f\'\'\'{f"{f\'{x}\'}"}\'\'\'}"""\n'
+
+
+@pytest.mark.parametrize(
+    'code,limit,size',
+    [('abc', 2, 3), ('abc', 12, 3), ('é' * 3, 5, 6), ('é' * 3, 100, 3)],
+)
+def test_code_size(code: str, limit: int, size: int):
+    # the exact size is only needed when it's close to the limit
+    assert code_size(code, limit) == size
+
+
+@pytest.mark.skipif(not hasattr(signal, 'setitimer'), reason='requires SIGALRM')
+def test_time_limit():
+    with pytest.raises(LimitExceeded):
+        with time_limit(0.05):
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                pass
+            pytest.fail('time limit was not enforced')
+    # the timer is cancelled once the body finishes
+    with time_limit(0.05):
+        pass
+    time.sleep(0.1)
+
+
+def test_time_limit_other_thread():
+    finished = []
+
+    def run():
+        with time_limit(0.01):
+            time.sleep(0.05)
+        finished.append(True)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    assert finished == [True]
+
+
+@pytest.mark.parametrize('engine', ['libcst', 'tokenize'])
+def test_max_fstring_depth(engine: str):
+    with pytest.raises(LimitExceeded):
+        replace_quotes(NESTED, engine=engine, max_fstring_depth=3)
+    assert replace_quotes(NESTED, engine=engine, max_fstring_depth=4) == replace_quotes(
+        NESTED, engine=engine
+    )
+
+
+def test_max_file_size():
+    formatter = Formatter(max_file_size=10)
+    assert formatter.format('x = "a"\n') == "x = 'a'\n"
+    with pytest.raises(LimitExceeded):
+        formatter.format('x = "abcd"\n')
+    with pytest.raises(LimitExceeded):
+        formatter.would_change('x = "abcd"\n')
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_process_files(tmp_path: Path, capsys, n_jobs: int):
+    config = parse_config(
+        {**DEFAULT_CONFIG, 'max_file_size': 100, 'max_fstring_depth': 3},
+        tmp_path / 'pyproject.toml',
+    )
+    files = [tmp_path / name for name in ('small.py', 'large.py', 'nested.py')]
+    files[0].write_text('x = "a"\n')
+    files[1].write_text('x = "a"\n' * 100)
+    files[2].write_text(NESTED)
+
+    summary = process_files([(file, config, None) for file in files], n_jobs)
+    err = capsys.readouterr().err
+
+    assert summary['skipped'] == 2
+    assert summary['changed'] == 1
+    assert summary['failed'] == 0
+    assert f'Skipped {files[1]}: file is larger than 100 bytes' in err
+    assert f'Skipped {files[2]}: f-strings are nested more than 3 levels deep' in err
+    # skipped files are left untouched
+    assert files[1].read_text() == 'x = "a"\n' * 100
+    assert files[2].read_text() == NESTED
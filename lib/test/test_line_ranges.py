@@ -0,0 +1,141 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from conftest import run
+from libcst import ParserSyntaxError
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer import Formatter, replace_quotes, would_change
+from string_fixer.chunks import select_lines
+from string_fixer.daemon import Daemon
+
+CODE = '''\
+import os
+x = "a"
+
+@decorator
+def func():
+    return "b"
+
+
+class A:
+    y = "c"
+    z = (
+        "d"
+    )
+    w = """e
+f"""
+'''
+
+
+@pytest.mark.parametrize(
+    'line_ranges,selected',
+    [
+        ([(1, 1)], [True, False]),
+        ([(3, 3)], [False, True, False]),
+        ([(6, 6)], [False, True, False]),
+        ([(2, 2), (13, 13)], [False, True, False, True]),
+        ([(100, 200)], [False]),
+    ],
+)
+def test_select_lines(line_ranges, selected):
+    sections = select_lines(CODE, line_ranges)
+    assert ''.join(section for _, section, _ in sections) == CODE
+    assert [s for _, _, s in sections] == selected
+    for first, section, _ in sections:
+        assert (
+            CODE.splitlines(keepends=True)[first - 1]
+            == section.splitlines(keepends=True)[0]
+        )
+
+
+def test_select_lines_untokenizable():
+    assert select_lines('x = (', [(5, 5)]) == [(1, 'x = (', True)]
+
+
+@pytest.mark.parametrize('engine', ['libcst', 'tokenize'])
+@pytest.mark.parametrize(
+    'line_ranges,changed',
+    [
+        ([(2, 2)], ['"a"']),
+        ([(6, 6)], ['"b"']),
+        # only the strings in the range are changed, not the whole statement
+        ([(10, 10)], ['"c"']),
+        ([(12, 12)], ['"d"']),
+        # multiline strings are changed if any of their lines are in the range
+        ([(15, 15)], ['"""e']),
+        ([(1, 1), (8, 9)], []),
+        ([(1, 100)], ['"a"', '"b"', '"c"', '"d"', '"""e']),
+    ],
+)
+def test_replace_quotes(engine: str, line_ranges, changed):
+    expected = CODE
+    for string in changed:
+        expected = expected.replace(string, string.replace('"', "'"))
+    expected = expected.replace('f"""', "f'''") if '"""e' in changed else expected
+
+    assert replace_quotes(CODE, engine=engine, line_ranges=line_ranges) == expected
+    assert would_change(CODE, engine=engine, line_ranges=line_ranges) == bool(changed)
+
+
+def test_chunk_lines():
+    formatter = Formatter(chunk_lines=2, line_ranges=[(2, 6)])
+    assert formatter.format(CODE) == CODE.replace('"a"', "'a'").replace('"b"', "'b'")
+
+
+def test_syntax_errors():
+    # code that can't be split is formatted as a whole, so syntax errors are still reported
+    with pytest.raises(ParserSyntaxError):
+        replace_quotes('x = "a"\ny = (\n', line_ranges=[(1, 1)])
+
+
+def test_cli(tmp_path: Path):
+    file = tmp_path / 'file.py'
+    file.write_text(CODE)
+    result = run(tmp_path, 'file.py', '--line-ranges', '2-2', '--line-ranges', '10-10')
+    assert result.returncode == 0, result.stderr
+    assert file.read_text() == CODE.replace('"a"', "'a'").replace('"c"', "'c'")
+    # partially formatted files aren't cached
+    assert not (tmp_path / '.string_fixer_cache').exists()
+
+    result = run(
+        tmp_path, '--stdin-filename', 'file.py', '--line-ranges', '6-6', stdin=CODE
+    )
+    assert result.stdout.decode() == CODE.replace('"b"', "'b'")
+
+    result = run(
+        tmp_path,
+        '--stdin-filename',
+        'file.py',
+        '--line-ranges',
+        '6-6',
+        '--edits-json',
+        stdin=CODE,
+    )
+    assert [edit['text'] for edit in json.loads(result.stdout)] == ["'b'"]
+
+
+@pytest.mark.parametrize('line_range', ['1', '0-1', '3-2', 'a-b'])
+def test_cli_invalid_range(tmp_path: Path, line_range: str):
+    (tmp_path / 'file.py').write_text(CODE)
+    result = run(tmp_path, 'file.py', '--line-ranges', line_range)
+    assert result.returncode == 2
+    assert b'invalid line range' in result.stderr
+
+
+@pytest.mark.parametrize('args', [['.'], ['a.py', 'b.py'], ['--target', '.']])
+def test_cli_single_file_only(tmp_path: Path, args):
+    (tmp_path / 'a.py').write_text(CODE)
+    (tmp_path / 'b.py').write_text(CODE)
+    result = run(tmp_path, *args, '--line-ranges', '1-2')
+    assert result.returncode == 2
+    assert b'single file' in result.stderr
+    assert (tmp_path / 'a.py').read_text() == CODE
+
+
+def test_daemon(tmp_path: Path):
+    request = {'source': CODE, 'root': str(tmp_path), 'line_ranges': [[2, 2]]}
+    assert Daemon().format(request)['source'] == CODE.replace('"a"', "'a'")
@@ -77,3 +77,16 @@ def test_file_is_ignored(file, ignore, include, result):
         [Path(i) for i in ignore],
         [Path(i) for i in include]
     ) is result
+
+
+@pytest.mark.parametrize(
+    'code,result',
+    [
+        # newline is inside the f-string's expression
+        ('x = f"""{\nx} {f\'{y}\'}"""\n', "x = f'''{\nx} {f'{y}'}'''\n"),
+        # newline is in the parentheses around the f-string, which doesn't count
+        ('x = (f"""{x} {f\'{y}\'}"""\n)\n', 'x = (f\'{x} {f"{y}"}\'\n)\n'),
+    ],
+)
+def test_multiline_fstrings(code: str, result: str):
+    assert string_fixer.replace_quotes(code, target_python='3.8') == result
@@ -0,0 +1,127 @@
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+from conftest import run
+
+# only list the changed files, without writing anything
+FLAGS = ('--no-cache', '--diff=summary')
+
+
+@pytest.fixture
+def tree(tmp_path: Path):
+    for name in ('a/x.py', 'a/b/y.py', 'c/z.py', 'c/ignored.py', 'd/w.py'):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text('x = "abc"\n')
+    (tmp_path / 'c' / 'pyproject.toml').write_text(
+        '[tool.string-fixer]\nquote_style = "double"\nignore = ["./ignored.py"]\n'
+    )
+    return tmp_path
+
+
+def changed(result: subprocess.CompletedProcess):
+    return [
+        line.split()[2]
+        for line in result.stdout.decode().splitlines()
+        if line.startswith('Would change')
+    ]
+
+
+def test_paths(tree: Path):
+    result = run(tree, *FLAGS, 'a', 'a/b', 'a/x.py', 'c', 'd/w.py')
+    assert result.returncode == 0, result.stderr
+    # overlapping paths are de-duplicated, and configs are resolved for each file
+    assert changed(result) == [
+        str(tree / 'a/x.py'),
+        str(tree / 'a/b/y.py'),
+        str(tree / 'd/w.py'),
+    ]
+    assert 'Processed 4 files' in result.stdout.decode()
+
+
+def test_explicit_files_ignored(tree: Path):
+    # listed files are checked against the ignore rules, the same as files found in a walk
+    result = run(tree, *FLAGS, 'c/ignored.py', 'a/x.py', '--quote-style', 'single')
+    assert changed(result) == [str(tree / 'a/x.py')]
+
+    result = run(
+        tree, *FLAGS, '--files-from', '-', '--quote-style', 'single', stdin='c/ignored.py\n'
+    )
+    assert changed(result) == []
+
+    (tree / '.gitignore').write_text('d/\n')
+    result = run(tree, *FLAGS, 'd/w.py')
+    assert changed(result) == []
+
+
+@pytest.mark.parametrize('separator', ['\n', '\r\n', '\0'])
+def test_files_from(tree: Path, separator: str):
+    paths = separator.join(['d/w.py', 'a/x.py', 'd/w.py', ''])
+    result = run(tree, *FLAGS, '--files-from', '-', stdin=paths)
+    assert changed(result) == [str(tree / 'd/w.py'), str(tree / 'a/x.py')]
+
+    with open(tree / 'files.txt', 'w', newline='') as f:
+        f.write(paths)
+    result = run(tree, *FLAGS, 'a/b', '--files-from', 'files.txt')
+    assert changed(result) == [
+        str(tree / 'a/b/y.py'),
+        str(tree / 'd/w.py'),
+        str(tree / 'a/x.py'),
+    ]
+
+
+def test_empty_file_list(tree: Path):
+    result = run(tree, *FLAGS, '--files-from', '-')
+    assert result.returncode == 0
+    assert result.stdout.decode().strip() == 'Processed 0 files: 0 would change'
+
+
+def test_bad_paths(tree: Path):
+    result = run(tree, *FLAGS, 'missing.py')
+    assert result.returncode == 2
+    assert b'path does not exist' in result.stderr
+
+    result = run(tree, *FLAGS, 'a', '--target', 'a')
+    assert result.returncode == 2
+
+
+def test_edits_json(tree: Path):
+    result = run(tree, *FLAGS, 'a/x.py', 'c', '--edits-json')
+    assert result.returncode == 0, result.stderr
+    # one JSON object per changed file, and nothing else
+    assert [json.loads(line) for line in result.stdout.decode().splitlines()] == [
+        {
+            'file': str(tree / 'a/x.py'),
+            'edits': [
+                {
+                    'start': {'line': 0, 'column': 4},
+                    'end': {'line': 0, 'column': 9},
+                    'text': "'abc'",
+                }
+            ],
+        }
+    ]
+    assert (tree / 'a/x.py').read_text() == 'x = "abc"\n'
+
+
+@pytest.mark.parametrize(
+    'args,summary', [([], 'changed'), (['--dry-run'], 'would change')]
+)
+def test_summary(tree: Path, args, summary: str):
+    result = run(tree, '--no-cache', 'a/x.py', *args)
+    assert result.returncode == 0, result.stderr
+    last_line = result.stdout.decode().splitlines()[-1]
+    assert last_line == f'Processed 1 files: 1 {summary}'
+    assert ('"abc"' in (tree / 'a/x.py').read_text()) is bool(args)
+
+
+def test_path_order(tree: Path):
+    (tree / 'c' / 'pyproject.toml').write_text('[tool.string-fixer]\ncheck = true\n')
+    # the run as a whole uses the top-level config, whichever file's config was loaded last
+    results = [
+        run(tree, *FLAGS, 'c/z.py', 'd/w.py'),
+        run(tree, *FLAGS, 'd/w.py', 'c/z.py'),
+    ]
+    assert [result.returncode for result in results] == [0, 0]
+    assert results[0].stdout.splitlines()[-1] == results[1].stdout.splitlines()[-1]
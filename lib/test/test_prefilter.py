@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+import string_fixer
+from string_fixer.prefilter import may_change
+
+CASES_DIR = Path(__file__).parent / 'cases'
+SNAPSHOT_DIR = Path(__file__).parent / 'snapshots'
+
+
+@pytest.mark.parametrize(
+    'code,quote_style,result',
+    [
+        ("x = 'abc'\n", 'single', False),
+        ('x = "abc"\n', 'single', True),
+        ('x = "abc"\n', 'double', False),
+        ("x = '''abc'''\n", 'single', False),
+        ("x = f'{a} {b!r:>{width}} {{c}}'\n", 'single', False),
+        ('x = f"{a}"\n', 'single', True),
+        ("x = F'{a}'\n", 'single', True),
+        # f-strings without placeholders are converted to simple strings
+        ("x = f'abc {{a}}'\n", 'single', True),
+        ("x = f'{a[\"b\"]}'\n", 'single', True),
+        ("x = f'''{a}'''\n", 'single', True),
+        ('# "comment"\n', 'single', False),
+        ('x = (\n', 'single', True),
+    ],
+)
+def test_may_change(code, quote_style, result):
+    assert may_change(code, quote_style) is result
+
+
+@pytest.mark.parametrize(
+    'file', sorted(CASES_DIR.glob('*.py')) + sorted(SNAPSHOT_DIR.glob('*.py'))
+)
+@pytest.mark.parametrize('quote_style', ['single', 'double'])
+def test_prefilter_matches_full_path(file: Path, quote_style):
+    code = file.read_text()
+    try:
+        expected = string_fixer.replace_quotes(
+            code, prefilter=False, quote_style=quote_style
+        )
+    except Exception:
+        pytest.skip(f'{file.name} cannot be formatted with {quote_style} quotes here')
+    assert string_fixer.replace_quotes(code, quote_style=quote_style) == expected
+    if not may_change(code, quote_style):
+        assert expected == code
@@ -0,0 +1,70 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer import profiling
+from string_fixer.config import DEFAULT_CONFIG, parse_config
+from string_fixer.profiling import Profiler, activate, stage
+from string_fixer.runner import process_files
+
+
+def test_stage_inactive():
+    assert profiling._active is None
+    # no profiler means the shared no-op context is used
+    assert stage('anything') is stage('other')
+
+
+def test_stages_are_exclusive():
+    profiler = Profiler()
+    with activate(profiler):
+        with stage('outer'):
+            time.sleep(0.02)
+            with stage('inner'):
+                time.sleep(0.05)
+    assert profiling._active is None
+
+    assert profiler.stages['inner'] >= 0.05
+    # time spent in the inner stage isn't counted towards the outer one
+    assert 0.02 <= profiler.stages['outer'] < profiler.stages['inner']
+
+
+def test_file_attribution(tmp_path: Path):
+    profiler = Profiler()
+    with activate(profiler):
+        with profiler.file(tmp_path / 'a.py'):
+            with stage('parse'):
+                pass
+        with stage('walk'):
+            pass
+
+    data = profiler.data()
+    assert set(data['stages']) == {'parse', 'walk'}
+    assert data['files'][0]['file'] == str(tmp_path / 'a.py')
+    assert list(data['files'][0]['stages']) == ['parse']
+
+    profiler.write_json(tmp_path / 'profile.json')
+    assert json.loads((tmp_path / 'profile.json').read_text()) == data
+    assert 'a.py' in profiler.report()
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_process_files(tmp_path: Path, capsys, n_jobs):
+    config = parse_config(DEFAULT_CONFIG, tmp_path / 'pyproject.toml')
+    files = []
+    for i in range(3):
+        file = tmp_path / f'file{i}.py'
+        file.write_text(f'x = \"{i}\"\n')
+        files.append(file)
+
+    profiler = Profiler()
+    process_files([(f, config, None) for f in files], n_jobs, profiler=profiler)
+
+    data = profiler.data()
+    assert sorted(f['file'] for f in data['files']) == [str(f) for f in files]
+    for name in ('read', 'parse', 'transform', 'write'):
+        assert name in data['stages']
@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer.quotes import QuoteStyle
+
+
+@pytest.mark.parametrize(
+    'value,quote_override,result',
+    [
+        ('"abc"', None, "'abc'"),
+        ('"it\'s"', None, '"it\'s"'),
+        ('"it\'s \\"x\\" \\"y\\""', None, "'it\\'s \"x\" \"y\"'"),
+        ('"\\\\"', None, "'\\\\'"),
+        ('"""a "b" c"""', None, "'''a \"b\" c'''"),
+        ('"""\'\'\'"""', None, '"""\'\'\'"""'),
+        # the quotes join up into a run of 3 once the escape is removed
+        ("'\\'\"\"\\\"'", '"""', "''''\"\"\"'''"),
+    ],
+)
+def test_requote(value: str, quote_override, result: str):
+    assert QuoteStyle()._requote(value, quote_override) == result
@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / '..'))
+
+from string_fixer.config import DEFAULT_CONFIG, parse_config
+from string_fixer.runner import process_files
+
+
+@pytest.fixture
+def files(tmp_path: Path):
+    files = []
+    for i in range(6):
+        file = tmp_path / f'file{i}.py'
+        # vary the sizes so that largest-first scheduling differs from the input order
+        file.write_text(f'x = "{"a" * i * 100}"\n')
+        files.append(file)
+    (tmp_path / 'file3.py').write_text('x = (\n')
+    return files
+
+
+@pytest.mark.parametrize('n_jobs', [1, 3])
+def test_process_files(files, capsys, n_jobs):
+    config = parse_config(DEFAULT_CONFIG, files[0].parent / 'pyproject.toml')
+    summary = process_files([(f, config, None) for f in files], n_jobs)
+    captured = capsys.readouterr()
+
+    assert summary['failed'] == 1
+    assert summary['changed'] == 5
+    assert captured.out.splitlines() == [f'Processing: {f}' for f in files]
+    assert f'Failed to process {files[3]}' in captured.err
+    assert files[5].read_text() == f'x = \'{"a" * 500}\'\n'
+
+
+def test_pipeline_errors(files, capsys, monkeypatch):
+    '''errors when reading or writing files on the pipeline's threads are reported as failures'''
+    from string_fixer import runner
+
+    files[1].write_bytes(b'x = "\xff"\n')
+
+    def write_file(file: Path, content: str):
+        if file == files[4]:
+            raise OSError('disk full')
+        file.write_text(content)
+
+    monkeypatch.setattr(runner, '_write_file', write_file)
+    config = parse_config(DEFAULT_CONFIG, files[0].parent / 'pyproject.toml')
+    summary = process_files([(f, config, None) for f in files], 1)
+    captured = capsys.readouterr()
+
+    assert summary['failed'] == 3
+    assert summary['changed'] == 3
+    assert captured.out.splitlines() == [f'Processing: {f}' for f in files]
+    assert f'Failed to process {files[1]}: UnicodeDecodeError' in captured.err
+    assert f'Failed to process {files[4]}: OSError: disk full' in captured.err
+    assert files[5].read_text() == f'x = \'{"a" * 500}\'\n'
+
+
+@pytest.mark.parametrize('n_jobs,parallel', [(None, False), (1, False), (2, True)])
+def test_small_runs_in_process(files, monkeypatch, n_jobs, parallel):
+    from string_fixer import runner
+
+    def pool(*args, **kwargs):
+        raise RuntimeError('pool started')
+
+    monkeypatch.setattr(runner, 'default_jobs', lambda: 4)
+    monkeypatch.setattr(runner.multiprocessing, 'Pool', pool)
+    config = parse_config(DEFAULT_CONFIG, files[0].parent / 'pyproject.toml')
+    jobs = [(f, config, None) for f in files]
+    # a worker pool costs more to start than it saves on a handful of files, unless asked for
+    if parallel:
+        with pytest.raises(RuntimeError, match='pool started'):
+            process_files(jobs, n_jobs)
+    else:
+        assert process_files(jobs, n_jobs)['changed'] == 5
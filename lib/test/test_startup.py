@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+LIB_DIR = Path(__file__).parent / '..'
+
+
+def imported_modules(code: str) -> set:
+    '''Run some code in a fresh interpreter and get the modules that it imported'''
+    result = subprocess.run(
+        [sys.executable, '-c', f'{code}\nimport sys\nprint(*sys.modules)'],
+        capture_output=True,
+        check=True,
+        env={**os.environ, 'PYTHONPATH': str(LIB_DIR.absolute())},
+    )
+    return set(result.stdout.decode().split())
+
+
+@pytest.mark.parametrize(
+    'code',
+    [
+        'import string_fixer.__main__',
+        'import string_fixer.batch, string_fixer.daemon',
+        # code without any strings to change skips parsing entirely
+        'import string_fixer; string_fixer.replace_quotes("x = 1")',
+        'import string_fixer; string_fixer.replace_quotes("x = \'a\'", engine="tokenize")',
+    ],
+)
+def test_libcst_not_imported(code: str):
+    assert 'libcst' not in imported_modules(code)
+
+
+def test_libcst_imported_when_needed():
+    assert 'libcst' in imported_modules(
+        'import string_fixer; string_fixer.replace_quotes("x = \\"a\\"")'
+    )
+    assert 'libcst' in imported_modules('from string_fixer import QuoteTransformer')
@@ -0,0 +1,108 @@
+import json
+import os
+from pathlib import Path
+
+from conftest import run
+
+
+def test_stdin(tmp_path: Path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'pyproject.toml').write_text(
+        '[tool.string-fixer]\nquote_style = "double"\n'
+    )
+
+    result = run(
+        tmp_path, '--stdin-filename', 'file.py', stdin='x = "abc"\r\ny = \'abc\'\n'
+    )
+    assert result.returncode == 0
+    assert result.stdout == b"x = 'abc'\r\ny = 'abc'\n"
+
+    # config is resolved relative to the given path, which doesn't need to exist
+    result = run(tmp_path, '--stdin-filename', 'sub/new.py', stdin="x = 'abc'\n")
+    assert result.stdout == b'x = "abc"\n'
+
+    # nothing is written to disk
+    assert sorted(os.listdir(tmp_path)) == ['sub']
+    assert os.listdir(tmp_path / 'sub') == ['pyproject.toml']
+
+
+def test_stdin_ignored(tmp_path: Path):
+    (tmp_path / 'pyproject.toml').write_text(
+        '[tool.string-fixer]\nignore = ["./ignored/**"]\n'
+    )
+    result = run(tmp_path, '--stdin-filename', 'ignored/file.py', stdin='x = "abc"\n')
+    assert result.returncode == 0
+    assert result.stdout == b'x = "abc"\n'
+
+
+def test_stdin_error(tmp_path: Path):
+    result = run(tmp_path, '--stdin-filename', 'file.py', stdin='x = (')
+    assert result.returncode == 1
+    assert result.stdout == b''
+    assert b'Failed to process' in result.stderr
+
+
+def test_stdin_edits(tmp_path: Path):
+    result = run(
+        tmp_path,
+        '--stdin-filename',
+        'file.py',
+        '--edits-json',
+        stdin='x = "abc"\ny = "é"\n',
+    )
+    assert result.returncode == 0
+    assert json.loads(result.stdout) == [
+        {
+            'start': {'line': 0, 'column': 4},
+            'end': {'line': 0, 'column': 9},
+            'text': "'abc'",
+        },
+        {
+            'start': {'line': 1, 'column': 4},
+            'end': {'line': 1, 'column': 7},
+            'text': "'é'",
+        },
+    ]
+
+    result = run(
+        tmp_path, '--stdin-filename', 'file.py', '--edits-json', stdin="x = 'abc'\n"
+    )
+    assert json.loads(result.stdout) == []
+
+
+def test_stdin_diff(tmp_path: Path):
+    result = run(tmp_path, '--stdin-filename', 'file.py', '--diff', stdin='x = "abc"\n')
+    assert result.returncode == 0
+    assert result.stdout.decode().splitlines() == [
+        '--- a/file.py',
+        '+++ b/file.py',
+        '@@ -1 +1 @@',
+        '-x = "abc"',
+        "+x = 'abc'",
+    ]
+
+    result = run(
+        tmp_path,
+        '--stdin-filename',
+        'file.py',
+        '--diff',
+        'summary',
+        stdin='x = "abc"\n',
+    )
+    assert (
+        result.stdout.decode() == f'Would change: {tmp_path / "file.py"} (1 string)\n'
+    )
+
+    # unchanged code prints nothing, and --check still sets the exit status
+    result = run(tmp_path, '--stdin-filename', 'file.py', '--diff', stdin="x = 'abc'\n")
+    assert result.stdout == b''
+    result = run(
+        tmp_path,
+        '--stdin-filename',
+        'file.py',
+        '--diff',
+        '--check',
+        stdin='x = "abc"\n',
+    )
+    assert result.returncode == 1
+    assert b"+x = 'abc'" in result.stdout